@@ -0,0 +1,6 @@
+"""
+Benchmarks offline del pipeline.
+
+Todos los scripts usan un modelo falso (`benchmarks.fake_llm`) para medir el
+costo del framework sin gastar cuota de Vertex/Gemini.
+"""
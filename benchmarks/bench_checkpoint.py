@@ -0,0 +1,108 @@
+"""
+Tamaño y tiempo de escritura de los checkpoints: inline vs. por referencia.
+
+Corre el mismo contrato sintético dos veces con un checkpointer SQLite:
+
+- inline:        serializador por defecto de LangGraph y el PDF en base64
+                 dentro del state (como antes de `pipeline_ai.checkpoint`).
+- por_referencia: `crear_checkpointer`, con el PDF, los historiales y los
+                 prompts guardados una sola vez en el almacén de blobs.
+
+Uso:
+    python -m benchmarks.bench_checkpoint --paginas 200
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from benchmarks.fake_llm import build_fake_llm
+from benchmarks.synthetic import pdf_sintetico_base64
+from pipeline_ai.agents_factory import build_agents
+from pipeline_ai.checkpoint import crear_checkpointer
+from pipeline_ai.graph import build_graph
+from pipeline_ai.state import build_initial_state
+from utils.pdf_utils import PdfDocument
+
+
+class _Cronometro:
+    """Acumula el tiempo de `put` / `put_writes` de un checkpointer."""
+
+    def __init__(self, checkpointer):
+        self.segundos = 0.0
+        for nombre in ("put", "put_writes"):
+            original = getattr(checkpointer, nombre)
+            setattr(checkpointer, nombre, self._medido(original))
+
+    def _medido(self, fn):
+        def _envuelto(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.segundos += time.perf_counter() - inicio
+        return _envuelto
+
+
+def _bytes_sqlite(ruta: str) -> dict:
+    conn = sqlite3.connect(ruta)
+    try:
+        checkpoints = conn.execute("SELECT COALESCE(SUM(LENGTH(checkpoint)), 0), COUNT(*) FROM checkpoints").fetchone()
+        writes = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()[0]
+        try:
+            blobs = conn.execute("SELECT COALESCE(SUM(LENGTH(datos)), 0) FROM blobs").fetchone()[0]
+        except sqlite3.OperationalError:
+            blobs = 0
+    finally:
+        conn.close()
+    return {"checkpoints": checkpoints[1], "bytes_checkpoints": checkpoints[0], "bytes_writes": writes, "bytes_blobs": blobs}
+
+
+def _correr(checkpointer, pdf, max_attempts: int) -> float:
+    cronometro = _Cronometro(checkpointer)
+    graph = build_graph(build_agents(build_fake_llm(prob_corregir=0.5, semilla=7)), checkpointer=checkpointer)
+    graph.invoke(
+        build_initial_state(pdf=pdf, max_attempts=max_attempts),
+        {"configurable": {"thread_id": "bench"}},
+    )
+    return cronometro.segundos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paginas", type=int, default=200)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf_b64 = pdf_sintetico_base64(args.paginas)
+    resultados = {"paginas": args.paginas, "bytes_pdf_base64": len(pdf_b64)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "inline.sqlite")
+        conn = sqlite3.connect(ruta, check_same_thread=False)
+        segundos = _correr(SqliteSaver(conn), pdf_b64, args.max_attempts)
+        conn.close()
+        resultados["inline"] = {**_bytes_sqlite(ruta), "ms_escritura": round(segundos * 1000, 2)}
+
+        ruta = os.path.join(tmp, "referencia.sqlite")
+        checkpointer = crear_checkpointer(ruta)
+        segundos = _correr(checkpointer, PdfDocument.from_base64(pdf_b64), args.max_attempts)
+        checkpointer.conn.close()
+        checkpointer.serde.blobs.close()
+        resultados["por_referencia"] = {**_bytes_sqlite(ruta), "ms_escritura": round(segundos * 1000, 2)}
+
+    inline, ref = resultados["inline"], resultados["por_referencia"]
+    resultados["reduccion_bytes_checkpoints"] = round(
+        (inline["bytes_checkpoints"] + inline["bytes_writes"])
+        / max(ref["bytes_checkpoints"] + ref["bytes_writes"], 1), 1
+    )
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
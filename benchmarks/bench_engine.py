@@ -0,0 +1,61 @@
+"""
+Overhead por documento: reconstruir componentes vs. motor reutilizable.
+
+Compara el flujo anterior de `run_pipeline` (build_llm + build_agents +
+build_graph en cada documento) contra `ContractPipeline.run`, ambos con un
+modelo falso sin latencia, de modo que la diferencia es solo el costo de
+preparación.
+
+Uso:
+    python -m benchmarks.bench_engine --docs 200
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.fake_llm import build_fake_llm
+from benchmarks.synthetic import pdf_sintetico_base64
+from pipeline_ai.agents_factory import build_agents
+from pipeline_ai.engine import ContractPipeline
+from pipeline_ai.graph import build_graph
+from pipeline_ai.state import build_initial_state
+
+
+def _run_reconstruyendo(pdf: str) -> dict:
+    """Réplica del `run_pipeline` anterior: todo se construye por documento."""
+    llm = build_fake_llm()
+    graph = build_graph(build_agents(llm))
+    return graph.invoke(build_initial_state(pdf=pdf))
+
+
+def _medir(fn, pdf: str, docs: int) -> float:
+    """Segundos promedio por documento."""
+    inicio = time.perf_counter()
+    for _ in range(docs):
+        fn(pdf)
+    return (time.perf_counter() - inicio) / docs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=100)
+    args = parser.parse_args()
+
+    pdf = pdf_sintetico_base64(3)
+    engine = ContractPipeline(llm_factory=build_fake_llm)
+    engine.run(pdf)  # calentamiento: construye el caché
+
+    antes = _medir(_run_reconstruyendo, pdf, args.docs)
+    despues = _medir(engine.run, pdf, args.docs)
+
+    print(json.dumps({
+        "docs": args.docs,
+        "ms_por_doc_reconstruyendo": round(antes * 1000, 3),
+        "ms_por_doc_engine": round(despues * 1000, 3),
+        "ahorro_ms_por_doc": round((antes - despues) * 1000, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
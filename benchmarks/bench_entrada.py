@@ -0,0 +1,103 @@
+"""
+Pico de memoria por documento según la forma de entrada.
+
+Corre un contrato "escaneado" grande (imágenes incompresibles) con el modelo
+falso, cada modo en un proceso nuevo, y reporta cuánto crece el pico de RSS
+del proceso respecto de su línea base (después de construir el motor):
+
+- base64: `file_to_base64` + `run_pipeline` (el flujo anterior).
+- ruta:   `run_pipeline_from_path` (archivo mapeado en memoria).
+- stream: `run_pipeline_from_stream` con un stream que no es un archivo
+          (se copia por bloques a un temporal y se mapea).
+
+Con `--presupuesto` solo se envían al extractor las páginas relevantes, así
+que en los modos ruta/stream el pico queda acotado por lo enviado y no por
+el tamaño del archivo.
+
+Uso:
+    python -m benchmarks.bench_entrada --paginas 200 --kb-por-pagina 256 --presupuesto 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+
+
+class _StreamRed:
+    """Stream de solo lectura sin `fileno()` (como un body HTTP)."""
+
+    def __init__(self, ruta: str):
+        self._f = open(ruta, "rb")
+
+    def read(self, n: int = -1) -> bytes:
+        return self._f.read(n)
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def _medir_modo(modo: str, ruta: str, opciones: dict, cola) -> None:
+    from benchmarks.fake_llm import build_fake_llm
+    from benchmarks.memoria import rss_pico_mb
+    from benchmarks.synthetic import pdf_sintetico_base64
+    from pipeline_ai.engine import ContractPipeline
+    from utils.pdf_utils import PdfDocument, file_to_base64
+
+    engine = ContractPipeline(llm_factory=build_fake_llm, limitar_cuota=False)
+    engine.run(pdf_sintetico_base64(3), **opciones)  # calentamiento
+    base = rss_pico_mb()
+
+    if modo == "base64":
+        result = engine.run(file_to_base64(ruta), **opciones)
+    elif modo == "ruta":
+        result = engine.run(PdfDocument.from_path(ruta), **opciones)
+    else:
+        stream = _StreamRed(ruta)
+        try:
+            result = engine.run(PdfDocument.from_stream(stream), **opciones)
+        finally:
+            stream.close()
+
+    cola.put({
+        "modo": modo,
+        "tipo_archivo": result.get("tipo_archivo"),
+        "bytes_enviados_extractor": result["payload_extractor"][0] if result["payload_extractor"] else 0,
+        "mb_rss_base": round(base, 1),
+        "mb_rss_pico_sobre_base": round(rss_pico_mb() - base, 1),
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paginas", type=int, default=200)
+    parser.add_argument("--kb-por-pagina", type=int, default=256)
+    parser.add_argument("--presupuesto", type=int, default=8,
+                        help="Páginas enviadas al extractor (0 = documento completo).")
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import pdf_sintetico_escaneado_bytes
+
+    opciones = {"presupuesto_paginas": {"CONTRATO": args.presupuesto, "OTROSI": args.presupuesto}} \
+        if args.presupuesto else {}
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "contrato.pdf")
+        with open(ruta, "wb") as f:
+            f.write(pdf_sintetico_escaneado_bytes(args.paginas, args.kb_por_pagina))
+
+        resultados = {"paginas": args.paginas, "mb_archivo": round(os.path.getsize(ruta) / 1e6, 1), "modos": []}
+        for modo in ("base64", "ruta", "stream"):
+            cola = ctx.Queue()
+            proceso = ctx.Process(target=_medir_modo, args=(modo, ruta, opciones, cola))
+            proceso.start()
+            resultados["modos"].append(cola.get())
+            proceso.join()
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Costo por paso de copiar y serializar el state: antes vs. después del registro de prompts.
+
+Corre un documento con correcciones (varias rondas extractor → validador)
+y, por cada paso del grafo, mide bytes y tiempo de `JsonPlusSerializer` y el
+tiempo de `copy.deepcopy` de:
+
+- snapshot: el state completo después del paso.
+- escritura: lo que retorna el nodo (lo que LangGraph aplica a los canales).
+
+La forma "antes" se reconstruye a partir de la misma ejecución: los tres
+textos estáticos dentro del state y los historiales como dicts que cada nodo
+reescribe completos (junto con `payload_extractor` y `metricas_nodos`).
+El PDF del state se reemplaza por su hash en ambas formas; el que viaja en el
+primer mensaje del historial se mantiene.
+
+Uso:
+    python -m benchmarks.bench_estado --paginas 20 --max-attempts 3
+"""
+
+import argparse
+import copy
+import json
+import time
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from benchmarks.fake_llm import build_fake_llm
+from benchmarks.synthetic import pdf_sintetico_base64
+from configuraciones_IA.prompts import prompt_cont, context_cont, context_otrosi
+from pipeline_ai.agents_factory import build_agents
+from pipeline_ai.graph import build_graph
+from pipeline_ai.state import build_initial_state
+from utils.pdf_utils import PdfDocument
+
+# Canales de solo-agregado (antes: listas/dicts reescritos completos en cada paso).
+_CANALES_AGREGADO = ("hist_msg_extration", "hist_msg_validation", "payload_extractor", "metricas_nodos")
+_HISTORIALES = ("hist_msg_extration", "hist_msg_validation")
+
+
+def _sin_pdf(state: dict) -> dict:
+    pdf = state.get("pdf")
+    if isinstance(pdf, PdfDocument):
+        return {**state, "pdf": pdf.sha256()}
+    return state
+
+
+def _forma_antes(state: dict) -> dict:
+    """State con los textos estáticos y los historiales como dicts."""
+    antes = {k: v for k, v in state.items() if k != "version_prompts"}
+    antes.update(prompt_cont=prompt_cont, context_cont=context_cont, context_otrosi=context_otrosi)
+    for canal in _HISTORIALES:
+        antes[canal] = {"messages": list(state.get(canal, []))}
+    return antes
+
+
+def _escritura_antes(delta: dict, state: dict) -> dict:
+    """Escritura del nodo si cada canal de agregado se reescribiera completo."""
+    escritura = dict(delta)
+    for canal in _CANALES_AGREGADO:
+        if canal in delta:
+            valor = list(state[canal])
+            escritura[canal] = {"messages": valor} if canal in _HISTORIALES else valor
+    return escritura
+
+
+def _pasos(paginas: int, max_attempts: int) -> list[tuple[dict, dict]]:
+    """(escritura del nodo, state después del paso) por cada paso del grafo."""
+    graph = build_graph(build_agents(build_fake_llm(prob_corregir=1.0, semilla=7)))
+    estado = build_initial_state(PdfDocument.from_base64(pdf_sintetico_base64(paginas)), max_attempts=max_attempts)
+
+    pasos, pendiente = [], None
+    for modo, chunk in graph.stream(estado, stream_mode=["updates", "values"]):
+        if modo == "updates":
+            (pendiente,) = chunk.values()
+        elif pendiente is not None:
+            pasos.append((pendiente, _sin_pdf(chunk)))
+            pendiente = None
+    return pasos
+
+
+def _medir(objetos: list[dict], serde: JsonPlusSerializer, repeticiones: int) -> dict:
+    bytes_total = sum(len(serde.dumps_typed(o)[1]) for o in objetos)
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for o in objetos:
+            serde.dumps_typed(o)
+    serializar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for o in objetos:
+            copy.deepcopy(o)
+    copiar = time.perf_counter() - inicio
+
+    n = len(objetos) * repeticiones
+    return {
+        "bytes_por_paso": round(bytes_total / len(objetos)),
+        "us_serializar_por_paso": round(serializar * 1e6 / n, 1),
+        "us_copiar_por_paso": round(copiar * 1e6 / n, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    serde = JsonPlusSerializer()
+    pasos = _pasos(args.paginas, args.max_attempts)
+
+    formas = {
+        "antes": (
+            [_forma_antes(s) for _, s in pasos],
+            [_escritura_antes(d, s) for d, s in pasos],
+        ),
+        "despues": ([s for _, s in pasos], [d for d, _ in pasos]),
+    }
+    resultados = {"paginas": args.paginas, "pasos": len(pasos)}
+    for nombre, (snapshots, escrituras) in formas.items():
+        resultados[nombre] = {
+            "snapshot": _medir(snapshots, serde, args.repeticiones),
+            "escritura": _medir(escrituras, serde, args.repeticiones),
+        }
+
+    antes, despues = resultados["antes"], resultados["despues"]
+    resultados["reduccion"] = {
+        parte: {
+            metrica: round(antes[parte][metrica] / max(despues[parte][metrica], 1e-9), 1)
+            for metrica in antes[parte]
+        }
+        for parte in ("snapshot", "escritura")
+    }
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Limitador de cuota frente a un proveedor que responde 429.
+
+El modelo falso acepta como máximo `--capacidad` solicitudes simultáneas y
+responde 429 al resto (más una tasa aleatoria de 429). Se corre el mismo lote
+con y sin limitador: sin él, cada 429 tumba el documento; con él, la
+concurrencia AIMD converge bajo la capacidad y los 429 se reintentan con
+backoff, de modo que todos los documentos terminan.
+
+Uso:
+    python -m benchmarks.bench_rate_limit --docs 200 --capacidad 12
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.fake_llm import build_fake_llm
+from benchmarks.synthetic import pdf_sintetico_base64
+from pipeline_ai.engine import ContractPipeline
+from pipeline_ai.rate_limit import configurar_limites
+
+
+async def _lote(engine: ContractPipeline, pdf: str, docs: int, concurrency: int, llm_kwargs: dict) -> dict:
+    semaforo = asyncio.Semaphore(concurrency)
+    fallidos = 0
+
+    async def _uno() -> None:
+        nonlocal fallidos
+        async with semaforo:
+            try:
+                await engine.arun(pdf, llm_kwargs=llm_kwargs)
+            except Exception:
+                fallidos += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_uno() for _ in range(docs)))
+    segundos = time.perf_counter() - inicio
+    return {"segundos": round(segundos, 3), "docs_por_s": round(docs / segundos, 2), "fallidos": fallidos}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--capacidad", type=int, default=12)
+    parser.add_argument("--tasa-429", type=float, default=0.02)
+    parser.add_argument("--latencia", type=float, default=0.02)
+    args = parser.parse_args()
+
+    pdf = pdf_sintetico_base64(3)
+    llm_kwargs = {
+        "model": "fake-429",
+        "latencia": args.latencia,
+        "capacidad": args.capacidad,
+        "tasa_429": args.tasa_429,
+    }
+    limitador = configurar_limites(
+        "fake-429", rpm=60_000, tpm=100_000_000, concurrencia_inicial=args.concurrency,
+    )
+    limitador.backoff_base = 0.05
+
+    sin = asyncio.run(_lote(
+        ContractPipeline(llm_factory=build_fake_llm, limitar_cuota=False),
+        pdf, args.docs, args.concurrency, llm_kwargs,
+    ))
+    con = asyncio.run(_lote(
+        ContractPipeline(llm_factory=build_fake_llm),
+        pdf, args.docs, args.concurrency, llm_kwargs,
+    ))
+
+    print(json.dumps({"sin_limitador": sin, "con_limitador": con, "limitador": limitador.snapshot()}, indent=2))
+    assert con["fallidos"] == 0, "con limitador todos los documentos deben terminar"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Prueba de resistencia del preprocesamiento: la memoria de un worker no debe crecer.
+
+Pasa miles de documentos sintéticos (PDF con texto, PDF escaneado y TIFF
+multipágina, de tamaños variados) por el camino de preprocesamiento de un
+worker del lote, en un solo proceso:
+
+    preprocesar_documento → documento_preprocesado → texto de las primeras
+    páginas (clasificador local) → seleccionar_paginas → close
+
+y muestrea el RSS actual cada `--muestra` documentos. Después del
+calentamiento (llenado de cachés y del store de MuPDF hasta su límite), el
+RSS debe quedar plano: si crece más de `--tolerancia-mb` sobre el valor al
+final del calentamiento, el benchmark termina con código 1.
+
+Uso:
+    python -m benchmarks.bench_soak --documentos 10000
+    python -m benchmarks.bench_soak --documentos 10000 --store-mupdf-mb 0
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.memoria import rss_mb
+from benchmarks.synthetic import pdf_sintetico_bytes, pdf_sintetico_escaneado_bytes, tiff_sintetico_bytes
+from pipeline_ai.batch import configurar_worker, documento_preprocesado, preprocesar_documento
+from pipeline_ai.seleccion_paginas import seleccionar_paginas
+from utils.pdf_utils import configurar_cache_conversion
+
+_PRESUPUESTO = {"CONTRATO": 4, "OTROSI": 4}
+
+
+def _generar_documentos(directorio: str, distintos: int) -> list[str]:
+    """`distintos` documentos de cada tipo, con cantidad de páginas variada."""
+    rutas = []
+    for i in range(distintos):
+        documentos = {
+            f"texto_{i}.pdf": pdf_sintetico_bytes(1 + i % 40),
+            f"escaneado_{i}.pdf": pdf_sintetico_escaneado_bytes(1 + i % 12, kb_por_pagina=128),
+            f"lote_{i}.tif": tiff_sintetico_bytes(1 + i % 4, ancho=620, alto=877),
+        }
+        for nombre, datos in documentos.items():
+            ruta = os.path.join(directorio, nombre)
+            with open(ruta, "wb") as f:
+                f.write(datos)
+            rutas.append(ruta)
+    return rutas
+
+
+def _preprocesar(ruta: str) -> None:
+    pre = preprocesar_documento(ruta)
+    with documento_preprocesado(ruta, pre) as doc:
+        doc.texto_primeras_paginas(2)
+        seleccionar_paginas(doc, "CONTRATO", _PRESUPUESTO)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documentos", type=int, default=10_000)
+    parser.add_argument("--distintos", type=int, default=30,
+                        help="Documentos distintos por tipo (se recorren en ciclo).")
+    parser.add_argument("--calentamiento", type=float, default=0.1,
+                        help="Fracción inicial de documentos que no cuenta para la comparación.")
+    parser.add_argument("--muestra", type=int, default=250, help="Documentos entre mediciones de RSS.")
+    parser.add_argument("--tolerancia-mb", type=float, default=16.0)
+    parser.add_argument("--store-mupdf-mb", type=int, default=None,
+                        help="Límite del store de MuPDF (por defecto el de utils.pdf_utils).")
+    parser.add_argument("--cache-conversion-mb", type=int, default=0,
+                        help="Caché de conversiones en memoria (0 = se convierte cada TIFF).")
+    args = parser.parse_args()
+
+    configurar_worker(store_mupdf=args.store_mupdf_mb * 1024 * 1024 if args.store_mupdf_mb is not None else None)
+    configurar_cache_conversion(max_bytes=args.cache_conversion_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rutas = _generar_documentos(tmp, args.distintos)
+        fin_calentamiento = int(args.documentos * args.calentamiento)
+        muestras, rss_calentamiento = [], None
+
+        inicio = time.perf_counter()
+        for n in range(args.documentos):
+            _preprocesar(rutas[n % len(rutas)])
+            if (n + 1) % args.muestra == 0 or n + 1 == args.documentos:
+                muestras.append({"documentos": n + 1, "mb_rss": round(rss_mb(), 1)})
+            if n + 1 == fin_calentamiento:
+                rss_calentamiento = rss_mb()
+        segundos = time.perf_counter() - inicio
+
+    rss_calentamiento = rss_calentamiento if rss_calentamiento is not None else muestras[0]["mb_rss"]
+    posteriores = [m["mb_rss"] for m in muestras if m["documentos"] > fin_calentamiento] or [rss_calentamiento]
+    crecimiento = max(posteriores) - rss_calentamiento
+    resultados = {
+        "documentos": args.documentos,
+        "docs_por_s": round(args.documentos / segundos, 1),
+        "mb_rss_calentamiento": round(rss_calentamiento, 1),
+        "mb_rss_final": muestras[-1]["mb_rss"],
+        "mb_crecimiento": round(crecimiento, 1),
+        "plano": crecimiento <= args.tolerancia_mb,
+        "muestras": muestras,
+    }
+    print(json.dumps(resultados, indent=2))
+    if not resultados["plano"]:
+        sys.exit(f"El RSS creció {crecimiento:.1f} MB después del calentamiento (tolerancia {args.tolerancia_mb} MB)")
+
+
+if __name__ == "__main__":
+    main()
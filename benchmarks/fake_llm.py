@@ -0,0 +1,206 @@
+"""
+Modelo de chat falso y determinista para benchmarks.
+
+Se comporta como `ChatGoogleGenerativeAI` frente a `create_agent`: acepta
+`bind_tools` y responde siempre con una llamada a la herramienta de salida
+estructurada solicitada, con un payload válido para el schema correspondiente.
+Latencia, tasa de fallos, 429 y probabilidad de CORREGIR son configurables, y
+con `semilla` la secuencia de fallos es reproducible.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import uuid
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from configuraciones_IA import schemas
+
+
+# Respuestas canónicas indexadas por el `title` de cada schema.
+RESPUESTAS_POR_SCHEMA = {
+    "ClasificadorInformacion": {"tipo_arch": "CONTRATO", "confianza": 0.95},
+    "EstructuracionInformacion": {
+        "contrato_id": "CW2370068",
+        "valor": 125000000,
+        "objeto_contrato": "Prestación de servicios de mantenimiento de equipos biomédicos.",
+        "fechas": {
+            "fecha_suscripcion": "2024-01-15",
+            "fecha_inicio": "2024-02-01",
+            "fecha_fin": "2025-01-31",
+        },
+        "contratista": {
+            "tipo_persona": "PERSONA JURÍDICA",
+            "tipo_documento": "NIT",
+            "numero_documento": 900123456,
+            "digito_verificación": 8,
+            "nombre_persona": "Servicios Biomédicos S.A.S.",
+        },
+        "plazo_contrato": 365,
+        "clase_contrato": "MANTENIMIENTO y/o REPARACIÓN",
+    },
+    "EstrucruracionInfoOtrosi": {
+        "ident": {"contrato_base_id": "CW2370068", "otrosi_id": "CW2370068-1"},
+        "adiciones": {"tipo": "ADICIÓN EN TIEMPO", "fecha_fin": "2025-12-31", "valor": None},
+    },
+    "ValidacionInformacion": {"validacion": "CORRECTO", "feedback": "OK"},
+}
+# Schemas parciales de la extracción por ventanas (`pipeline_ai.ventanas`).
+RESPUESTAS_POR_SCHEMA["EstructuracionInformacionParcial"] = RESPUESTAS_POR_SCHEMA["EstructuracionInformacion"]
+RESPUESTAS_POR_SCHEMA["EstrucruracionInfoOtrosiParcial"] = RESPUESTAS_POR_SCHEMA["EstrucruracionInfoOtrosi"]
+_RESPUESTA_CORREGIR = {
+    "validacion": "CORREGIR",
+    "feedback": "El plazo_contrato no coincide con las fechas; revisa fecha_fin.",
+}
+
+
+def verificar_respuestas() -> None:
+    """
+    Comprueba que haya una respuesta canónica por cada schema de
+    `configuraciones_IA.schemas` y que traiga sus campos requeridos.
+    """
+    for nombre in dir(schemas):
+        schema = getattr(schemas, nombre)
+        if not nombre.startswith("SCHEMA_OUTPUT_") or not isinstance(schema, dict):
+            continue
+        respuesta = RESPUESTAS_POR_SCHEMA.get(schema["title"])
+        if respuesta is None:
+            raise AssertionError(f"Falta la respuesta falsa para {schema['title']}")
+        faltantes = set(schema.get("required", ())) - set(respuesta)
+        if faltantes:
+            raise AssertionError(f"{schema['title']}: faltan campos requeridos {sorted(faltantes)}")
+
+
+class ErrorModeloSimulado(Exception):
+    """Falla genérica del proveedor (500, red caída, respuesta inválida)."""
+
+
+class ErrorCuotaSimulada(Exception):
+    """429 simulado, con la misma forma que el error del proveedor."""
+
+    code = 429
+
+    def __init__(self, mensaje: str = "429 RESOURCE_EXHAUSTED: Quota exceeded (simulado)"):
+        super().__init__(mensaje)
+
+
+# Solicitudes en vuelo contra el "servidor" falso, compartidas por todas las instancias.
+_EN_VUELO = {"n": 0}
+_EN_VUELO_LOCK = threading.Lock()
+
+
+class FakeGeminiChatModel(BaseChatModel):
+    """
+    Modelo falso compatible con `build_agents`.
+
+    Args:
+        latencia: Segundos que tarda cada llamada (simula la espera de red).
+        tipo_arch: Clasificación que devuelve el agente clasificador.
+        tasa_429:  Probabilidad de responder 429 en cada llamada.
+        capacidad: Solicitudes simultáneas que acepta el "servidor" antes de
+                   responder 429 (0 = sin límite).
+        tasa_fallo: Probabilidad de lanzar `ErrorModeloSimulado` en cada llamada.
+        prob_corregir: Probabilidad de que el validador responda CORREGIR.
+        semilla:   Semilla del generador aleatorio (None = no determinista).
+    """
+
+    latencia: float = 0.0
+    tipo_arch: str = "CONTRATO"
+    tasa_429: float = 0.0
+    capacidad: int = 0
+    tasa_fallo: float = 0.0
+    prob_corregir: float = 0.0
+    semilla: int | None = None
+
+    _rng: random.Random = PrivateAttr(default_factory=random.Random)
+    _rng_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.semilla)
+
+    def _sortear(self, probabilidad: float) -> bool:
+        if not probabilidad:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < probabilidad
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _responder(self, tools: list[dict] | None, messages=()) -> AIMessage:
+        # Uso aproximado (~4 bytes por token), con la forma de `usage_metadata` de Gemini.
+        tokens_entrada = sum(len(str(m.content)) for m in messages) // 4
+        if not tools:
+            return AIMessage(content="OK")
+
+        nombre = tools[0]["function"]["name"]
+        args = dict(RESPUESTAS_POR_SCHEMA.get(nombre, {}))
+        if nombre == "ClasificadorInformacion":
+            args["tipo_arch"] = self.tipo_arch
+        elif nombre == "ValidacionInformacion" and self._sortear(self.prob_corregir):
+            args = dict(_RESPUESTA_CORREGIR)
+
+        tokens_salida = len(str(args)) // 4
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": nombre, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}],
+            usage_metadata={
+                "input_tokens": tokens_entrada,
+                "output_tokens": tokens_salida,
+                "total_tokens": tokens_entrada + tokens_salida,
+            },
+        )
+
+    def _entrar(self) -> None:
+        """Cuenta la solicitud en vuelo o lanza un 429 simulado."""
+        if self._sortear(self.tasa_fallo):
+            raise ErrorModeloSimulado("500 INTERNAL: fallo simulado del modelo")
+        with _EN_VUELO_LOCK:
+            saturado = self.capacidad and _EN_VUELO["n"] >= self.capacidad
+            if saturado or self._sortear(self.tasa_429):
+                raise ErrorCuotaSimulada()
+            _EN_VUELO["n"] += 1
+
+    def _salir(self) -> None:
+        with _EN_VUELO_LOCK:
+            _EN_VUELO["n"] -= 1
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._entrar()
+        try:
+            if self.latencia:
+                time.sleep(self.latencia)
+        finally:
+            self._salir()
+        mensaje = self._responder(kwargs.get("tools"), messages)
+        return ChatResult(generations=[ChatGeneration(message=mensaje)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._entrar()
+        try:
+            if self.latencia:
+                await asyncio.sleep(self.latencia)
+        finally:
+            self._salir()
+        mensaje = self._responder(kwargs.get("tools"), messages)
+        return ChatResult(generations=[ChatGeneration(message=mensaje)])
+
+
+def build_fake_llm(**llm_kwargs) -> FakeGeminiChatModel:
+    """
+    Reemplazo de `build_llm` para benchmarks.
+    Ignora los parámetros de Gemini y conserva los propios del modelo falso.
+    """
+    propios = {k: v for k, v in llm_kwargs.items() if k in FakeGeminiChatModel.model_fields}
+    return FakeGeminiChatModel(**propios)
@@ -0,0 +1,50 @@
+"""
+Memoria residente del proceso para los benchmarks, con psutil (también en Windows).
+
+- `rss_mb()`:      RSS actual.
+- `rss_pico_mb()`: pico de RSS. En Windows lo lleva el sistema (`peak_wset`);
+  en Linux y macOS psutil no lo expone, así que se muestrea el RSS en un hilo
+  desde la primera llamada (un pico más corto que el intervalo puede no verse).
+"""
+
+import threading
+
+import psutil
+
+_MB = 1024 * 1024
+_INTERVALO_MUESTREO = 0.005
+
+_proceso = psutil.Process()
+_pico = 0
+_lock = threading.Lock()
+_muestreador: threading.Thread | None = None
+
+
+def rss_mb() -> float:
+    """RSS actual del proceso en MB."""
+    return _proceso.memory_info().rss / _MB
+
+
+def _muestrear() -> None:
+    global _pico
+    evento = threading.Event()
+    while not evento.wait(_INTERVALO_MUESTREO):
+        rss = _proceso.memory_info().rss
+        with _lock:
+            _pico = max(_pico, rss)
+
+
+def rss_pico_mb() -> float:
+    """Pico de RSS del proceso en MB (desde la primera llamada si no es Windows)."""
+    global _muestreador, _pico
+    info = _proceso.memory_info()
+    pico_sistema = getattr(info, "peak_wset", None)
+    if pico_sistema is not None:
+        return pico_sistema / _MB
+
+    with _lock:
+        _pico = max(_pico, info.rss)
+        if _muestreador is None:
+            _muestreador = threading.Thread(target=_muestrear, name="rss-pico", daemon=True)
+            _muestreador.start()
+        return _pico / _MB
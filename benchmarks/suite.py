@@ -0,0 +1,219 @@
+"""
+Suite de benchmarks offline (sin llamadas a Vertex).
+
+Usa el modelo falso de `benchmarks.fake_llm` y PDFs sintéticos para medir:
+
+- throughput: documentos por segundo según la concurrencia (`arun`), con
+  latencia, tasa de fallos y probabilidad de CORREGIR configurables.
+- overhead:   milisegundos por documento del framework (modelo sin latencia).
+- rss:        pico de memoria residente del proceso después de cada fase.
+- preprocesamiento: costo de PyMuPDF (apertura, recorte del clasificador,
+  texto por página, selección de páginas, contenido en modo "auto") para
+  PDFs de 1 a 500 páginas.
+
+Los resultados se escriben en JSON junto con el commit, y `--comparar`
+muestra la variación contra un archivo de una corrida anterior.
+
+Uso:
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --output bench_nuevo.json --comparar bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_llm import build_fake_llm, verificar_respuestas
+from benchmarks.memoria import rss_pico_mb
+from benchmarks.synthetic import pdf_sintetico_base64, pdf_sintetico_bytes
+from pipeline_ai.engine import ContractPipeline
+from pipeline_ai.entrada import construir_contenido
+from pipeline_ai.seleccion_paginas import seleccionar_paginas
+from utils.pdf_utils import PdfDocument
+
+
+def _rss_pico_mb() -> float:
+    """Pico de memoria residente del proceso."""
+    return round(rss_pico_mb(), 1)
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Fases
+# ---------------------------------------------------------------------------
+
+async def _lote(engine: ContractPipeline, pdf: str, docs: int, concurrency: int, llm_kwargs: dict) -> dict:
+    semaforo = asyncio.Semaphore(concurrency)
+    fallidos = 0
+    intentos = 0
+
+    async def _uno() -> None:
+        nonlocal fallidos, intentos
+        async with semaforo:
+            try:
+                result = await engine.arun(pdf, llm_kwargs=llm_kwargs)
+                intentos += result.get("attempts", 0)
+            except Exception:
+                fallidos += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_uno() for _ in range(docs)))
+    segundos = time.perf_counter() - inicio
+    return {
+        "concurrency": concurrency,
+        "docs_por_s": round(docs / segundos, 2),
+        "segundos": round(segundos, 3),
+        "fallidos": fallidos,
+        "intentos_promedio": round(intentos / max(docs - fallidos, 1), 3),
+    }
+
+
+def medir_throughput(args) -> list[dict]:
+    engine = ContractPipeline(llm_factory=build_fake_llm, limitar_cuota=False)
+    pdf = pdf_sintetico_base64(3)
+    llm_kwargs = {
+        "latencia": args.latencia,
+        "tasa_fallo": args.tasa_fallo,
+        "prob_corregir": args.prob_corregir,
+        "semilla": args.semilla,
+    }
+    return [
+        asyncio.run(_lote(engine, pdf, args.docs, concurrency, llm_kwargs))
+        for concurrency in args.concurrencias
+    ]
+
+
+def medir_overhead(args) -> dict:
+    engine = ContractPipeline(llm_factory=build_fake_llm, limitar_cuota=False)
+    pdf = pdf_sintetico_base64(3)
+    engine.run(pdf)  # calentamiento: construye LLM, agentes y grafo
+
+    inicio = time.perf_counter()
+    for _ in range(args.docs):
+        engine.run(pdf)
+    ms_sync = (time.perf_counter() - inicio) * 1000 / args.docs
+
+    async def _secuencial() -> float:
+        inicio = time.perf_counter()
+        for _ in range(args.docs):
+            await engine.arun(pdf)
+        return (time.perf_counter() - inicio) * 1000 / args.docs
+
+    return {"ms_por_doc_sync": round(ms_sync, 3), "ms_por_doc_async": round(asyncio.run(_secuencial()), 3)}
+
+
+def medir_preprocesamiento(args) -> list[dict]:
+    resultados = []
+    for paginas in args.paginas:
+        datos = pdf_sintetico_bytes(paginas)
+        tiempos = {"abrir": 0.0, "recorte_clasificador": 0.0, "texto": 0.0, "seleccion": 0.0, "contenido_auto": 0.0}
+        for _ in range(args.repeticiones):
+            t0 = time.perf_counter()
+            doc = PdfDocument.from_bytes(datos)
+            len(doc)
+            t1 = time.perf_counter()
+            doc.primeras_paginas(3).to_base64()
+            t2 = time.perf_counter()
+            for i in range(len(doc)):
+                doc.texto_pagina(i)
+            t3 = time.perf_counter()
+            seleccionar_paginas(doc, "CONTRATO")
+            t4 = time.perf_counter()
+            construir_contenido(doc, "auto")
+            t5 = time.perf_counter()
+            doc.close()
+
+            for clave, delta in zip(tiempos, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+                tiempos[clave] += delta
+
+        resultados.append({
+            "paginas": paginas,
+            "bytes": len(datos),
+            **{f"ms_{k}": round(v * 1000 / args.repeticiones, 3) for k, v in tiempos.items()},
+        })
+    return resultados
+
+
+# ---------------------------------------------------------------------------
+# Comparación
+# ---------------------------------------------------------------------------
+
+def comparar(actual: dict, anterior: dict) -> dict:
+    """Variación porcentual de las métricas principales contra una corrida anterior."""
+    def _delta(nuevo: float, viejo: float) -> float | None:
+        return round((nuevo - viejo) * 100 / viejo, 1) if viejo else None
+
+    anteriores_tp = {r["concurrency"]: r for r in anterior.get("throughput", [])}
+    anteriores_pre = {r["paginas"]: r for r in anterior.get("preprocesamiento", [])}
+    return {
+        "commit_anterior": anterior.get("commit"),
+        "throughput_pct": {
+            r["concurrency"]: _delta(r["docs_por_s"], anteriores_tp[r["concurrency"]]["docs_por_s"])
+            for r in actual["throughput"] if r["concurrency"] in anteriores_tp
+        },
+        "overhead_sync_pct": _delta(
+            actual["overhead"]["ms_por_doc_sync"], anterior["overhead"]["ms_por_doc_sync"]
+        ) if "overhead" in anterior else None,
+        "preprocesamiento_contenido_auto_pct": {
+            r["paginas"]: _delta(r["ms_contenido_auto"], anteriores_pre[r["paginas"]]["ms_contenido_auto"])
+            for r in actual["preprocesamiento"] if r["paginas"] in anteriores_pre
+        },
+        "rss_pico_pct": _delta(actual["rss_pico_mb"]["final"], anterior["rss_pico_mb"]["final"])
+        if "rss_pico_mb" in anterior else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default="benchmarks/resultados.json")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior.")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--concurrencias", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latencia", type=float, default=0.02)
+    parser.add_argument("--tasa-fallo", type=float, default=0.0)
+    parser.add_argument("--prob-corregir", type=float, default=0.2)
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[1, 10, 50, 100, 500])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    verificar_respuestas()
+
+    resultados = {
+        "commit": _commit(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": vars(args),
+        "rss_pico_mb": {"inicio": _rss_pico_mb()},
+    }
+    resultados["preprocesamiento"] = medir_preprocesamiento(args)
+    resultados["rss_pico_mb"]["preprocesamiento"] = _rss_pico_mb()
+    resultados["overhead"] = medir_overhead(args)
+    resultados["rss_pico_mb"]["overhead"] = _rss_pico_mb()
+    resultados["throughput"] = medir_throughput(args)
+    resultados["rss_pico_mb"]["final"] = _rss_pico_mb()
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            resultados["comparacion"] = comparar(resultados, json.load(f))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
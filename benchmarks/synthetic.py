@@ -0,0 +1,73 @@
+"""
+Generación de PDFs sintéticos para benchmarks.
+"""
+
+import base64
+import random
+import struct
+
+import fitz  # PyMuPDF
+
+_TEXTO_PAGINA = (
+    "CONTRATO No. CW2370068\n"
+    "Entre EPS SURAMERICANA S.A. y SERVICIOS BIOMÉDICOS S.A.S. con NIT 900123456-8\n"
+    "CLÁUSULA {n}. El valor total del contrato es de $125.000.000 y su plazo es de 365 días.\n"
+)
+
+
+def pdf_sintetico_bytes(num_paginas: int = 3) -> bytes:
+    """Genera un PDF con texto en cada página y retorna sus bytes."""
+    with fitz.open() as doc:
+        for n in range(num_paginas):
+            page = doc.new_page()
+            page.insert_text((72, 72), _TEXTO_PAGINA.format(n=n + 1), fontsize=10)
+        return doc.tobytes()
+
+
+def pdf_sintetico_base64(num_paginas: int = 3) -> str:
+    """Genera un PDF sintético y lo retorna en base64."""
+    return base64.b64encode(pdf_sintetico_bytes(num_paginas)).decode("utf-8")
+
+
+def pdf_sintetico_escaneado_bytes(num_paginas: int = 3, kb_por_pagina: int = 256) -> bytes:
+    """
+    PDF con una imagen de ruido (incompresible) de ~`kb_por_pagina` por página,
+    además del texto: el tamaño del archivo se parece al de un contrato escaneado.
+    """
+    lado = int((kb_por_pagina * 1024) ** 0.5)
+    with fitz.open() as doc:
+        for n in range(num_paginas):
+            page = doc.new_page()
+            ruido = fitz.Pixmap(fitz.csGRAY, lado, lado, random.randbytes(lado * lado), 0)
+            page.insert_image(fitz.Rect(72, 100, 540, 568), pixmap=ruido)
+            page.insert_text((72, 72), _TEXTO_PAGINA.format(n=n + 1), fontsize=10)
+        return doc.tobytes()
+
+
+def tiff_sintetico_bytes(num_paginas: int = 3, ancho: int = 1240, alto: int = 1754) -> bytes:
+    """
+    TIFF multipágina en escala de grises sin comprimir (A4 a 150 DPI por
+    defecto), con ruido en cada página: como el lote de un escáner.
+    """
+    # Entradas del IFD: (tag, tipo SHORT=3 / LONG=4, valor).
+    tamano_pagina = ancho * alto
+    cabecera = 8
+    tamano_ifd = 2 + 9 * 12 + 4
+    partes = [b"II*\x00" + struct.pack("<I", cabecera)]
+    desplazamiento = cabecera
+    for n in range(num_paginas):
+        datos_en = desplazamiento + tamano_ifd
+        siguiente = datos_en + tamano_pagina if n < num_paginas - 1 else 0
+        entradas = [
+            (256, 4, ancho), (257, 4, alto), (258, 3, 8), (259, 3, 1), (262, 3, 1),
+            (273, 4, datos_en), (277, 3, 1), (278, 4, alto), (279, 4, tamano_pagina),
+        ]
+        ifd = struct.pack("<H", len(entradas))
+        for tag, tipo, valor in entradas:
+            ifd += struct.pack("<HHI", tag, tipo, 1) + (
+                struct.pack("<HH", valor, 0) if tipo == 3 else struct.pack("<I", valor)
+            )
+        partes.append(ifd + struct.pack("<I", siguiente))
+        partes.append(random.randbytes(tamano_pagina))
+        desplazamiento = siguiente
+    return b"".join(partes)
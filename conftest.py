@@ -0,0 +1 @@
+# Raíz del repositorio en sys.path para que `tests/` importe `pipeline_ai` y `utils`.
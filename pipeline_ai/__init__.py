@@ -3,32 +3,68 @@ API pública del pipeline.
 
 Expone una única función `run_pipeline()` que orquesta todo internamente.
 El consumidor (main.py, un endpoint, un job, etc.) solo necesita importar esto.
+
+Para procesar muchos documentos en el mismo proceso, `ContractPipeline`
+reutiliza LLM, agentes y grafo compilado entre ejecuciones. `arun_pipeline()`
+y `arun_batch()` son las variantes asíncronas sobre un solo event loop.
+`run_pipeline_from_path()` / `run_pipeline_from_stream()` reciben el archivo
+directamente, sin pasar el documento completo a base64.
 """
 
+import asyncio
 import logging
+import os
+from typing import BinaryIO, Iterable
 
-from pipeline_ai.agents_factory import build_agents, build_llm
-from pipeline_ai.graph import build_graph
-from pipeline_ai.state import build_initial_state, StateEstructure
-
-from configuraciones_IA.prompts import prompt_cont, context_cont, context_otrosi
+from pipeline_ai.cache import ResultCache
+from pipeline_ai.clasificador_local import CONTADORES as CONTADORES_CLASIFICADOR
+from pipeline_ai.duplicados import IndiceDuplicados
+from pipeline_ai.engine import ContractPipeline
+from pipeline_ai.especulacion import PoliticaEspeculacion
+from pipeline_ai.metrics import METRICAS
+from pipeline_ai.rate_limit import configurar_limites, snapshot_limitadores
+from utils.pdf_utils import PdfDocument
 
 logger = logging.getLogger(__name__)
 
+# Motor compartido: construye los componentes una vez por cada `llm_kwargs`.
+_engine = ContractPipeline()
+
 
 def run_pipeline(
-    pdf_base64: str,
+    pdf_base64: PdfDocument | str,
     max_attempts: int = 3,
     llm_kwargs: dict | None = None,
+    **opciones,
 ) -> dict:
     """
     Ejecuta el pipeline completo de clasificación → extracción → validación.
 
     Args:
-        pdf_base64:   PDF codificado en base64.
+        pdf_base64:   PDF codificado en base64, o un `PdfDocument` (evita el
+                      paso por base64 hasta el momento de enviar el mensaje).
         max_attempts: Máximo de ciclos extractor ↔ validador antes de forzar END.
         llm_kwargs:   Parámetros opcionales para sobreescribir la config del LLM
         (ej. {"model": "gemini-2.0-flash", "temperature": 0.2}).
+        **opciones:   Opciones por documento que se guardan en el state
+                      (ver `build_initial_state`), p. ej.:
+                      - umbral_clasificador_local: confianza mínima del
+                        clasificador local para no llamar al LLM.
+                      - validador_llm: False para que las reglas deterministas
+                        reemplacen por completo al validador LLM.
+                      - presupuesto_paginas: páginas relevantes por tipo que se
+                        envían al extractor (ver `seleccion_paginas.PRESUPUESTO_PAGINAS`).
+                      - modo_entrada: "archivo" (por defecto) | "auto" para enviar
+                        como texto las páginas con buena capa de texto.
+                      - presupuesto_segundos: tiempo máximo para el documento;
+                        al agotarse se retorna la mejor extracción disponible.
+                      - version_prompts: versión de `REGISTRO_PROMPTS` con los
+                        prompts/contextos a usar (ver `pipeline_ai.prompts_registro`).
+                      - documento_largo: extracción por ventanas en paralelo para
+                        documentos sobre un umbral de páginas (ver `pipeline_ai.ventanas`).
+                      - optimizar_pdf: parámetros de `utils.pdf_utils.optimizar_pdf`
+                        ({} = por defecto) para reducir imágenes y metadatos antes
+                        de enviar el documento; el caché usa el hash del original.
 
     Returns:
         El StateEstructure final con todos los campos poblados:
@@ -36,28 +72,145 @@ def run_pipeline(
             - extracted_data: dict con la información extraída
             - validation:     dict con la validación final
             - attempts:       cantidad de intentos realizados
+            - payload_extractor: bytes enviados al modelo en cada turno del extractor
+            - clasificacion:  tipo, confianza y origen ('local' | 'llm') de la clasificación
+            - seleccion_paginas: páginas y bytes enviados/ahorrados (si hay presupuesto)
+            - entrada:        modo de entrada y páginas/bytes enviados como texto o archivo
+            - extraccion_ventanas: ventanas usadas y de cuál salió cada campo
+                              (solo con `documento_largo` y documentos sobre el umbral)
+            - optimizacion:   bytes antes/después de `optimizar_pdf` (solo con esa opción)
+            - especulacion:   si se lanzó la extracción especulativa y si acertó
+                              (solo con `ContractPipeline(especulacion=...)`)
+            - plazo:          tiempo restante y si el documento terminó por tiempo
+                              (solo con `presupuesto_segundos`)
+            - metricas:       tiempo, tokens, bytes e intento por nodo y la ruta
+                              tomada después de cada uno (ver `pipeline_ai.metrics`)
+            - duplicado:      documento del que se reutilizó la extracción, similitud,
+                              si pasó por el validador y si se aceptó (solo con
+                              `ContractPipeline(duplicados=...)` y un casi-duplicado)
     """
-    logger.info("[Pipeline] Iniciando ejecución")
+    return _engine.run(pdf_base64, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones)
 
-    llm    = build_llm(**(llm_kwargs or {}))
-    agents = build_agents(llm)
-    graph  = build_graph(agents)
 
-    initial_state: StateEstructure = build_initial_state(
-        pdf=pdf_base64,
-        prompt_cont=prompt_cont,
-        context_cont=context_cont,
-        context_otrosi=context_otrosi,
-        max_attempts=max_attempts,
+async def arun_pipeline(
+    pdf_base64: PdfDocument | str,
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    **opciones,
+) -> dict:
+    """
+    Versión asíncrona de `run_pipeline()`: los agentes se invocan con `ainvoke`
+    y el event loop queda libre mientras se espera la respuesta del modelo.
+    """
+    return await _engine.arun(
+        pdf_base64, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones
     )
 
-    result = graph.invoke(initial_state)
 
-    logger.info(
-        "✅ [Pipeline] Finalizado — tipo: %s — intentos: %d",
-        result.get("tipo_archivo"),
-        result.get("attempts", 0),
-        # result.get("validation", {}).get("validacion"),
+def run_pipeline_from_path(
+    path: str | os.PathLike,
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    **opciones,
+) -> dict:
+    """
+    `run_pipeline()` sobre un archivo en disco, sin leerlo a un string.
+
+    El archivo se mapea en memoria y PyMuPDF lo abre desde ese mapa; solo las
+    partes que se envían al modelo (primeras páginas del clasificador, páginas
+    seleccionadas o el documento completo en modo "archivo") se recortan y se
+    codifican en base64, al momento de armar cada mensaje. Los formatos que no
+    son PDF (TIFF, PNG, JPG, XPS, EPUB) se convierten primero.
+    """
+    documento = PdfDocument.from_path(os.fspath(path))
+    return _engine.run(documento, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones)
+
+
+def run_pipeline_from_stream(
+    stream: BinaryIO,
+    extension: str = "pdf",
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    **opciones,
+) -> dict:
+    """
+    `run_pipeline()` sobre un archivo abierto o un stream binario.
+
+    Un archivo regular se mapea directo; otros streams se copian por bloques a
+    un archivo temporal que luego se mapea (ver `PdfDocument.from_stream`).
+
+    Args:
+        stream:    Objeto con `read()` en modo binario.
+        extension: Formato del contenido ("pdf", "tif", "png", ...).
+    """
+    documento = PdfDocument.from_stream(stream, extension)
+    return _engine.run(documento, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones)
+
+
+async def arun_pipeline_from_path(
+    path: str | os.PathLike,
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    **opciones,
+) -> dict:
+    """Versión asíncrona de `run_pipeline_from_path()`."""
+    documento = await asyncio.to_thread(PdfDocument.from_path, os.fspath(path))
+    return await _engine.arun(documento, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones)
+
+
+async def arun_pipeline_from_stream(
+    stream: BinaryIO,
+    extension: str = "pdf",
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    **opciones,
+) -> dict:
+    """Versión asíncrona de `run_pipeline_from_stream()` (la copia del stream corre en un hilo)."""
+    documento = await asyncio.to_thread(PdfDocument.from_stream, stream, extension)
+    return await _engine.arun(documento, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones)
+
+
+async def arun_batch(
+    pdfs: Iterable[PdfDocument | str],
+    concurrency: int = 16,
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    **opciones,
+) -> list[dict]:
+    """
+    Procesa varios documentos concurrentemente sobre un solo event loop.
+
+    Args:
+        pdfs:        PDFs codificados en base64 o `PdfDocument`.
+        concurrency: Máximo de documentos en vuelo al mismo tiempo.
+
+    Returns:
+        Lista de estados finales en el mismo orden que `pdfs`.
+    """
+    return await _engine.arun_many(
+        pdfs,
+        max_attempts=max_attempts,
+        llm_kwargs=llm_kwargs,
+        concurrency=concurrency,
+        **opciones,
     )
 
-    return result
\ No newline at end of file
+
+__all__ = [
+    "CONTADORES_CLASIFICADOR",
+    "ContractPipeline",
+    "IndiceDuplicados",
+    "METRICAS",
+    "PdfDocument",
+    "PoliticaEspeculacion",
+    "ResultCache",
+    "arun_batch",
+    "arun_pipeline",
+    "arun_pipeline_from_path",
+    "arun_pipeline_from_stream",
+    "configurar_limites",
+    "run_pipeline",
+    "run_pipeline_from_path",
+    "run_pipeline_from_stream",
+    "snapshot_limitadores",
+]
@@ -23,6 +23,10 @@ from configuraciones_IA.prompts import (
     SYSTEM_PROMPT_EXTRACTOR_OTROSI,
     SYSTEM_PROMPT_VALIDATION,
 )
+from pipeline_ai.rate_limit import AgenteLimitado, LimitadorModelo
+from pipeline_ai.ventanas import SCHEMA_PARCIAL_EXTRACTOR, SCHEMA_PARCIAL_EXTRACTOR_OTROSI
+
+MODELO_POR_DEFECTO = "gemini-2.5-flash"
 
 
 # ---------------------------------------------------------------------------
@@ -30,23 +34,31 @@ from configuraciones_IA.prompts import (
 # ---------------------------------------------------------------------------
 
 def build_llm(
-    model: str = "gemini-2.5-flash",
+    model: str = MODELO_POR_DEFECTO,
     project: str = "gcp-sura-auditoria-eps",
     temperature: float = 0,
     max_tokens: int = 4300,
     thinking_budget: int = 0,
+    max_retries: int = 2,
+    timeout: float | None = 120,
 ) -> ChatGoogleGenerativeAI:
     """
     Instancia el LLM con la configuración estándar.
     Externaliza los parámetros para facilitar cambios por entorno.
+
+    `timeout` acota cada llamada (segundos): una llamada colgada no bloquea
+    al worker indefinidamente.
+
+    Con un limitador de cuota (`pipeline_ai.rate_limit`) conviene
+    `max_retries=0`: los 429 los reintenta el limitador con backoff compartido.
     """
     return ChatGoogleGenerativeAI(
         model=model,
         project=project,
         temperature=temperature,
         max_tokens=max_tokens,
-        timeout=None,
-        max_retries=2,
+        timeout=timeout,
+        max_retries=max_retries,
         thinking_budget=thinking_budget,
         safety_settings={
             HarmCategory.HARM_CATEGORY_UNSPECIFIED: HarmBlockThreshold.BLOCK_NONE,
@@ -62,34 +74,59 @@ def build_llm(
 # Agentes
 # ---------------------------------------------------------------------------
 
-def build_agents(llm: ChatGoogleGenerativeAI) -> dict:
+def build_agents(llm: ChatGoogleGenerativeAI, limitador: LimitadorModelo | None = None) -> dict:
     """
     Crea todos los agentes del pipeline y los retorna en un diccionario.
+    Si se entrega `limitador`, todos los agentes comparten esa cuota.
+
+    Cada agente es una llamada de un solo turno: no hereda el checkpointer del
+    grafo (`checkpointer=False`), así sus mensajes internos, con el PDF
+    adjunto, no se guardan en cada checkpoint.
 
     Uso:
         llm    = build_llm()
         agents = build_agents(llm)
         # agents["clasificador"], agents["extractor"], etc.
     """
-    return {
+    agents = {
         "clasificador": create_agent(
             llm,
             system_prompt=SYSTEM_PROMPT_CLASIFICADOR,
             response_format=ToolStrategy(SCHEMA_OUTPUT_CLASIFICADOR),
+            checkpointer=False,
         ),
         "extractor": create_agent(
             llm,
             system_prompt=SYSTEM_PROMPT_EXTRACTOR,
             response_format=ToolStrategy(SCHEMA_OUTPUT_EXTRACTOR),
+            checkpointer=False,
         ),
         "extractor_otrosi": create_agent(
             llm,
             system_prompt=SYSTEM_PROMPT_EXTRACTOR_OTROSI,
             response_format=ToolStrategy(SCHEMA_OUTPUT_EXTRACTOR_OTROSI),
+            checkpointer=False,
+        ),
+        # Extractores por ventana de los documentos largos (`pipeline_ai.ventanas`).
+        "extractor_ventana": create_agent(
+            llm,
+            system_prompt=SYSTEM_PROMPT_EXTRACTOR,
+            response_format=ToolStrategy(SCHEMA_PARCIAL_EXTRACTOR),
+            checkpointer=False,
+        ),
+        "extractor_otrosi_ventana": create_agent(
+            llm,
+            system_prompt=SYSTEM_PROMPT_EXTRACTOR_OTROSI,
+            response_format=ToolStrategy(SCHEMA_PARCIAL_EXTRACTOR_OTROSI),
+            checkpointer=False,
         ),
         "validador": create_agent(
             llm,
             system_prompt=SYSTEM_PROMPT_VALIDATION,
             response_format=ToolStrategy(SCHEMA_OUTPUT_VALIDATION),
+            checkpointer=False,
         ),
-    }
\ No newline at end of file
+    }
+    if limitador is None:
+        return agents
+    return {nombre: AgenteLimitado(agente, limitador) for nombre, agente in agents.items()}
\ No newline at end of file
@@ -0,0 +1,403 @@
+"""
+Procesamiento por lotes de un directorio de contratos.
+
+El trabajo CPU de PyMuPDF (conversión a PDF y recorte de páginas para el
+clasificador) se hace en un pool de procesos, mientras las llamadas al LLM
+corren concurrentemente sobre un solo event loop. Con `--cache-conversion`
+los TIFF/imágenes convertidos por los workers quedan en disco y el proceso
+principal los mapea desde ahí en vez de recibir sus bytes. Cada documento produce un
+registro JSONL apenas termina, así que una corrida interrumpida conserva lo
+procesado y al relanzarla se saltan los documentos del checkpoint. Los
+fallidos van a un dead-letter para reprocesarlos con `--reprocesar`. Con
+`--indice-contratos` cada contrato u otrosí válido se vincula en un índice
+SQLite con la vigencia efectiva de su contrato (ver `pipeline_ai.indice_contratos`).
+
+Uso:
+    python -m pipeline_ai.batch contratos/ --workers 4 --concurrency 32
+    python -m pipeline_ai.batch contratos/ --reprocesar resultados.dead.jsonl
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pipeline_ai.engine import ContractPipeline
+from pipeline_ai.entrada import MODOS_ENTRADA
+from pipeline_ai.indice_contratos import IndiceContratos
+from pipeline_ai.salida import SalidaLote
+from utils import pdf_utils
+from utils.pdf_utils import PdfDocument, configurar_cache_conversion, configurar_store_mupdf
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES_SOPORTADAS = {".pdf", ".tif", ".tiff", ".png", ".jpg", ".jpeg", ".xps", ".epub"}
+
+
+# ---------------------------------------------------------------------------
+# Preprocesamiento (se ejecuta en el pool de procesos)
+# ---------------------------------------------------------------------------
+
+def listar_documentos(directorio: str | Path) -> list[Path]:
+    """Archivos soportados del directorio, en orden estable."""
+    return sorted(
+        p for p in Path(directorio).iterdir()
+        if p.is_file() and p.suffix.lower() in EXTENSIONES_SOPORTADAS
+    )
+
+
+def preprocesar_documento(ruta: str | Path, num_paginas: int = 3) -> dict:
+    """
+    Lee el archivo, lo convierte a PDF si hace falta y recorta las páginas
+    del clasificador. Debe ser una función de módulo para poder enviarse al pool.
+
+    Los PDF no cruzan al proceso principal: allí se vuelven a mapear desde
+    disco (`documento_preprocesado`). Los archivos convertidos tampoco, si el
+    caché de conversiones está en disco: el proceso principal encuentra ahí
+    la conversión hecha por el worker.
+
+    Returns:
+        {"pdf": <bytes del PDF convertido, o None si se puede mapear desde disco>,
+         "pdf_corto": <primeras páginas en base64>}
+    """
+    en_disco = Path(ruta).suffix.lower() == ".pdf" or pdf_utils.CACHE_CONVERSION.directorio is not None
+    with PdfDocument.from_path(str(ruta)) as doc:
+        return {
+            "pdf": None if en_disco else bytes(doc.datos),
+            "pdf_corto": doc.primeras_paginas(num_paginas).to_base64(),
+        }
+
+
+def configurar_worker(cache_conversion: str | None = None, store_mupdf: int | None = None) -> None:
+    """Configuración de PyMuPDF de un proceso del lote (`initializer` del pool)."""
+    if cache_conversion is not None:
+        configurar_cache_conversion(cache_conversion)
+    if store_mupdf is not None:
+        configurar_store_mupdf(store_mupdf)
+
+
+def documento_preprocesado(ruta: str | Path, pre: dict) -> PdfDocument:
+    """`PdfDocument` del resultado de `preprocesar_documento` (mapeado desde disco si se puede)."""
+    if pre["pdf"] is None:
+        return PdfDocument.from_path(str(ruta))
+    return PdfDocument.from_bytes(pre["pdf"])
+
+
+def huella_archivo(ruta: str | Path) -> str:
+    """sha256 del archivo, leído por bloques (clave del checkpoint)."""
+    with open(ruta, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _registro(
+    ruta: Path,
+    result: dict | None = None,
+    error: Exception | None = None,
+    huella: str | None = None,
+) -> dict:
+    """Registro JSONL de un documento procesado (o fallido)."""
+    result = result or {}
+    return {
+        "archivo": ruta.name,
+        "ruta": str(ruta),
+        "sha256": huella,
+        "tipo_archivo": result.get("tipo_archivo"),
+        "extracted_data": result.get("extracted_data"),
+        "validation": result.get("validation"),
+        "attempts": result.get("attempts", 0),
+        "clasificacion": result.get("clasificacion"),
+        "entrada": result.get("entrada"),
+        "plazo": result.get("plazo"),
+        "metricas": result.get("metricas"),
+        "error": repr(error) if error is not None else None,
+    }
+
+
+def motivo_fallo(registro: dict) -> str | None:
+    """
+    Motivo por el que un registro va al dead-letter, o None si es un resultado válido.
+
+    - "excepcion":               el pipeline lanzó una excepción.
+    - "plazo_agotado":           se cortó por `presupuesto_segundos` antes de
+                                 clasificar o de validar como CORRECTO.
+    - "sin_structured_response": el modelo no devolvió la respuesta estructurada
+                                 (sin tipo o sin datos extraídos).
+    - "max_intentos":            se agotaron los intentos sin validación CORRECTO.
+    """
+    if registro["error"] is not None:
+        return "excepcion"
+
+    if (registro.get("plazo") or {}).get("agotado"):
+        return "plazo_agotado"
+
+    tipo = registro["tipo_archivo"]
+    if tipo is None or (tipo in ("CONTRATO", "OTROSI") and not registro["extracted_data"]):
+        return "sin_structured_response"
+
+    validacion = (registro["validation"] or {}).get("validacion")
+    if tipo in ("CONTRATO", "OTROSI") and validacion != "CORRECTO":
+        return "max_intentos"
+    return None
+
+
+def leer_dead_letter(ruta: str | Path) -> list[Path]:
+    """Rutas de los documentos de un dead-letter, para reprocesarlos."""
+    rutas: dict[str, None] = {}
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                rutas[json.loads(linea)["ruta"]] = None
+    return [Path(r) for r in rutas]
+
+
+# ---------------------------------------------------------------------------
+# Orquestación
+# ---------------------------------------------------------------------------
+
+async def procesar_en_flujo(
+    rutas: Iterable[Path],
+    salida: SalidaLote | None = None,
+    workers: int | None = None,
+    concurrency: int = 16,
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    engine: ContractPipeline | None = None,
+    cache_conversion: str | None = None,
+    store_mupdf: int | None = None,
+    indice_contratos: IndiceContratos | None = None,
+    **opciones,
+) -> AsyncIterator[dict]:
+    """
+    Procesa `rutas` y entrega cada registro apenas termina su documento.
+
+    Nunca hay más de `concurrency` documentos en vuelo ni se acumulan
+    resultados, así que la memoria no crece con el tamaño del lote. Si se
+    entrega `salida`, los documentos del checkpoint se saltan y cada registro
+    se escribe (resultados o dead-letter) antes de entregarse.
+
+    Args:
+        rutas:       Documentos a procesar (puede ser un iterador perezoso).
+        salida:      Sumidero con checkpoint y dead-letter (opcional).
+        workers:     Procesos para el hash y el preprocesamiento con PyMuPDF.
+        concurrency: Máximo de documentos en vuelo (preprocesamiento + LLM).
+        cache_conversion: Directorio del caché de conversiones a PDF, compartido
+                     por los workers y el proceso principal (por defecto cada
+                     proceso usa su caché en memoria).
+        store_mupdf: Bytes de documentos entre vaciados del store de MuPDF en
+                     cada proceso (ver `utils.pdf_utils.configurar_store_mupdf`).
+        indice_contratos: Índice donde se vincula cada contrato/otrosí válido
+                     apenas termina (opcional).
+        **opciones:  Opciones por documento (ver `run_pipeline`).
+
+    Yields:
+        Registros como los de `_registro`, con `motivo_fallo` (None si fue exitoso).
+    """
+    engine = engine or ContractPipeline()
+    loop = asyncio.get_running_loop()
+    configurar_worker(cache_conversion, store_mupdf)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=configurar_worker,
+        initargs=(cache_conversion, store_mupdf),
+    ) as pool:
+
+        async def _uno(ruta: Path) -> dict | None:
+            huella = None
+            try:
+                huella = await loop.run_in_executor(pool, huella_archivo, ruta)
+                if salida is not None and huella in salida:
+                    return None
+                pre = await loop.run_in_executor(pool, preprocesar_documento, ruta)
+                documento = await asyncio.to_thread(documento_preprocesado, ruta, pre)
+                result = await engine.arun(
+                    documento,
+                    max_attempts=max_attempts,
+                    llm_kwargs=llm_kwargs,
+                    pdf_corto=pre["pdf_corto"],
+                    **opciones,
+                )
+                registro = _registro(ruta, result, huella=huella)
+            except Exception as exc:
+                logger.exception("[Batch] Error procesando %s", ruta.name)
+                registro = _registro(ruta, error=exc, huella=huella)
+
+            registro["motivo_fallo"] = motivo_fallo(registro)
+            if indice_contratos is not None and registro["motivo_fallo"] is None:
+                await asyncio.to_thread(indice_contratos.registrar, registro)
+            if salida is not None:
+                salida.registrar(registro, huella, fallido=registro["motivo_fallo"] is not None)
+            return registro
+
+        pendientes = iter(rutas)
+        en_vuelo: set[asyncio.Task] = set()
+        try:
+            while True:
+                # Se rellena la ventana sin materializar el resto del lote.
+                for ruta in pendientes:
+                    en_vuelo.add(asyncio.create_task(_uno(ruta)))
+                    if len(en_vuelo) >= concurrency:
+                        break
+                if not en_vuelo:
+                    break
+
+                listas, en_vuelo = await asyncio.wait(en_vuelo, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in listas:
+                    registro = tarea.result()
+                    if registro is not None:
+                        yield registro
+        finally:
+            for tarea in en_vuelo:
+                tarea.cancel()
+
+
+async def procesar_directorio(
+    directorio: str | Path,
+    salida: str | Path,
+    workers: int | None = None,
+    concurrency: int = 16,
+    max_attempts: int = 3,
+    llm_kwargs: dict | None = None,
+    engine: ContractPipeline | None = None,
+    reprocesar: str | Path | None = None,
+    cache_conversion: str | None = None,
+    store_mupdf: int | None = None,
+    indice_contratos: str | Path | None = None,
+    **opciones,
+) -> dict:
+    """
+    Procesa todos los documentos de `directorio` y agrega un registro por
+    documento a `salida` (JSONL). Es reanudable: los documentos registrados en
+    el checkpoint (`<salida>.ckpt`) se saltan, y los fallidos van a
+    `<salida>.dead.jsonl`.
+
+    Args:
+        workers:     Procesos para el preprocesamiento con PyMuPDF.
+        concurrency: Máximo de documentos en vuelo (preprocesamiento + LLM).
+        reprocesar:  Dead-letter de una corrida anterior: solo se procesan sus
+                     documentos, ignorando el checkpoint.
+        cache_conversion: Directorio del caché de conversiones a PDF (ver
+                     `procesar_en_flujo`).
+        store_mupdf: Límite del store de MuPDF por proceso (ver `procesar_en_flujo`).
+        indice_contratos: Archivo SQLite del índice de contratos y otrosíes
+                     (ver `pipeline_ai.indice_contratos`).
+        **opciones:  Opciones por documento (ver `run_pipeline`).
+
+    Returns:
+        {"procesados": int, "fallidos": int, "saltados": int}
+    """
+    salida = Path(salida)
+    if reprocesar is not None:
+        rutas = leer_dead_letter(reprocesar)
+        checkpoint = salida.with_suffix(".reproceso.ckpt")
+        dead_letter = salida.with_suffix(".reproceso.dead.jsonl")
+    else:
+        rutas = listar_documentos(directorio)
+        checkpoint = dead_letter = None
+    logger.info("[Batch] %d documentos en %s", len(rutas), reprocesar or directorio)
+
+    conteo = {"procesados": 0, "fallidos": 0}
+    indice = IndiceContratos(str(indice_contratos)) if indice_contratos is not None else None
+    try:
+        with SalidaLote(salida, dead_letter=dead_letter, checkpoint=checkpoint) as sumidero:
+            previos = len(sumidero.checkpoint)
+            async for registro in procesar_en_flujo(
+                rutas,
+                salida=sumidero,
+                workers=workers,
+                concurrency=concurrency,
+                max_attempts=max_attempts,
+                llm_kwargs=llm_kwargs,
+                engine=engine,
+                cache_conversion=cache_conversion,
+                store_mupdf=store_mupdf,
+                indice_contratos=indice,
+                **opciones,
+            ):
+                conteo["procesados"] += 1
+                conteo["fallidos"] += registro["motivo_fallo"] is not None
+    finally:
+        if indice is not None:
+            logger.info("[Batch] Índice de contratos: %s", indice.stats())
+            indice.close()
+
+    conteo["saltados"] = len(rutas) - conteo["procesados"]
+    logger.info(
+        "✅ [Batch] Finalizado — %d procesados, %d fallidos, %d saltados (checkpoint previo: %d). "
+        "Resultados en %s",
+        conteo["procesados"], conteo["fallidos"], conteo["saltados"], previos, salida,
+    )
+    return conteo
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Procesa un directorio de contratos y otrosíes.")
+    parser.add_argument("directorio", help="Directorio con los documentos a procesar.")
+    parser.add_argument("--output", default="resultados.jsonl", help="Archivo JSONL de salida.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Procesos para el preprocesamiento con PyMuPDF.")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Máximo de documentos en vuelo contra el LLM.")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--model", default=None, help="Modelo de Gemini (por defecto el de build_llm).")
+    parser.add_argument("--umbral-clasificador-local", type=float, default=None,
+                        help="Confianza mínima para clasificar sin LLM (por defecto desactivado).")
+    parser.add_argument("--modo-entrada", choices=MODOS_ENTRADA, default="archivo",
+                        help="'auto' envía como texto las páginas con buena capa de texto.")
+    parser.add_argument("--presupuesto-segundos", type=float, default=None,
+                        help="Tiempo máximo por documento (por defecto sin límite).")
+    parser.add_argument("--optimizar-dpi", type=int, default=None,
+                        help="Reduce las imágenes a estos DPI y limpia el PDF antes de enviarlo.")
+    parser.add_argument("--cache-conversion", default=None,
+                        help="Directorio para cachear los TIFF/imágenes convertidos a PDF entre corridas.")
+    parser.add_argument("--store-mupdf-mb", type=int, default=None,
+                        help="MB de documentos entre vaciados del store de MuPDF (0 = tras cada documento).")
+    parser.add_argument("--indice-contratos", default=None,
+                        help="Archivo SQLite donde vincular contratos y otrosíes con su vigencia efectiva.")
+    parser.add_argument("--reprocesar", default=None,
+                        help="Dead-letter de una corrida anterior: procesa solo esos documentos.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format="%(asctime)s - %(levelname)s - %(name)s: %(message)s",
+    )
+    for noisy in ["httpx", "google", "grpc", "urllib3", "absl"]:
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    llm_kwargs = {"model": args.model} if args.model else None
+    opciones = {"optimizar_pdf": {"dpi_objetivo": args.optimizar_dpi}} if args.optimizar_dpi else {}
+
+    asyncio.run(
+        procesar_directorio(
+            args.directorio,
+            args.output,
+            workers=args.workers,
+            concurrency=args.concurrency,
+            max_attempts=args.max_attempts,
+            llm_kwargs=llm_kwargs,
+            reprocesar=args.reprocesar,
+            cache_conversion=args.cache_conversion,
+            store_mupdf=args.store_mupdf_mb * 1024 * 1024 if args.store_mupdf_mb is not None else None,
+            indice_contratos=args.indice_contratos,
+            umbral_clasificador_local=args.umbral_clasificador_local,
+            modo_entrada=args.modo_entrada,
+            presupuesto_segundos=args.presupuesto_segundos,
+            **opciones,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Caché persistente de resultados, direccionado por contenido.
+
+La clave de cada entrada es el SHA-256 de los bytes del PDF más una huella
+de `llm_kwargs`. Además cada entrada guarda la huella de los prompts y schemas
+que produjeron su tipo de documento, de la versión de las reglas del
+validador (`reglas.VERSION_REGLAS`) y, con `documento_largo`, de los schemas
+parciales y la política de combinación de ventanas
+(`ventanas.VERSION_COMBINACION`): si alguno cambia, la entrada deja de ser
+válida y se descarta al leerla (o con `purge_stale()`), sin tocar el resto.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from configuraciones_IA import prompts, schemas
+from pipeline_ai import reglas, ventanas
+
+logger = logging.getLogger(__name__)
+
+# Campos del estado final que se guardan (el PDF y los historiales no).
+CAMPOS_CACHEABLES = (
+    "tipo_archivo",
+    "extracted_data",
+    "validation",
+    "attempts",
+    "max_attempts",
+    "payload_extractor",
+)
+
+# Prompts y schemas de los que depende el resultado de cada tipo de documento.
+_DEPENDENCIAS_POR_TIPO = {
+    "CONTRATO": (
+        "SYSTEM_PROMPT_CLASIFICADOR", "SCHEMA_OUTPUT_CLASIFICADOR",
+        "SYSTEM_PROMPT_EXTRACTOR", "SCHEMA_OUTPUT_EXTRACTOR",
+        "SYSTEM_PROMPT_VALIDATION", "SCHEMA_OUTPUT_VALIDATION",
+        "prompt_cont", "context_cont",
+    ),
+    "OTROSI": (
+        "SYSTEM_PROMPT_CLASIFICADOR", "SCHEMA_OUTPUT_CLASIFICADOR",
+        "SYSTEM_PROMPT_EXTRACTOR_OTROSI", "SCHEMA_OUTPUT_EXTRACTOR_OTROSI",
+        "SYSTEM_PROMPT_VALIDATION", "SCHEMA_OUTPUT_VALIDATION",
+        "context_cont", "context_otrosi",
+    ),
+}
+_DEPENDENCIAS_OTRO = ("SYSTEM_PROMPT_CLASIFICADOR", "SCHEMA_OUTPUT_CLASIFICADOR")
+# Dependencias adicionales de la extracción por ventanas (`documento_largo`).
+_DEPENDENCIAS_VENTANAS = {
+    "CONTRATO": ("SCHEMA_PARCIAL_EXTRACTOR",),
+    "OTROSI": ("SCHEMA_PARCIAL_EXTRACTOR_OTROSI",),
+}
+
+
+def _sha256_json(obj) -> str:
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, ensure_ascii=False, default=repr).encode("utf-8")
+    ).hexdigest()
+
+
+def huella_llm(llm_kwargs: dict | None) -> str:
+    """Huella de la configuración del LLM."""
+    return _sha256_json(llm_kwargs or {})
+
+
+def huella_configuracion(tipo_archivo: str | None, documento_largo: bool = False) -> str:
+    """
+    Huella de los prompts, schemas y versiones de código de los que depende
+    `tipo_archivo` (más los de la extracción por ventanas si `documento_largo`).
+    """
+    nombres = _DEPENDENCIAS_POR_TIPO.get(tipo_archivo, _DEPENDENCIAS_OTRO)
+    valores = {
+        nombre: getattr(prompts, nombre, None) or getattr(schemas, nombre, None)
+        for nombre in nombres
+    }
+    if tipo_archivo in _DEPENDENCIAS_POR_TIPO:
+        valores["VERSION_REGLAS"] = reglas.VERSION_REGLAS
+        if documento_largo:
+            valores.update({n: getattr(ventanas, n) for n in _DEPENDENCIAS_VENTANAS[tipo_archivo]})
+            valores["VERSION_COMBINACION"] = ventanas.VERSION_COMBINACION
+    return _sha256_json(valores)
+
+
+def _documento_largo(llm_kwargs: dict | None) -> bool:
+    """True si la configuración del caché activa `documento_largo` (ver `engine._config_cache`)."""
+    opciones = (llm_kwargs or {}).get("opciones") or {}
+    return opciones.get("documento_largo") is not None
+
+
+class ResultCache:
+    """
+    Caché de resultados en SQLite con desalojo LRU por cantidad y por tamaño.
+
+    Uso:
+        cache  = ResultCache("cache_resultados.sqlite", max_entries=50_000)
+        engine = ContractPipeline(cache=cache)
+    """
+
+    def __init__(
+        self,
+        path: str = "cache_resultados.sqlite",
+        max_entries: int = 50_000,
+        max_bytes: int | None = None,
+    ):
+        """
+        Args:
+            path:        Archivo SQLite (":memory:" para un caché volátil).
+            max_entries: Máximo de entradas antes de desalojar las menos usadas.
+            max_bytes:   Tamaño máximo acumulado de los resultados (None = sin límite).
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resultados (
+                pdf_hash      TEXT NOT NULL,
+                llm_hash      TEXT NOT NULL,
+                tipo_archivo  TEXT,
+                config_hash   TEXT NOT NULL,
+                valor         TEXT NOT NULL,
+                bytes         INTEGER NOT NULL,
+                ultimo_acceso REAL NOT NULL,
+                PRIMARY KEY (pdf_hash, llm_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_resultados_acceso ON resultados (ultimo_acceso)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------------------------
+
+    def get(self, pdf_hash: str, llm_kwargs: dict | None) -> dict | None:
+        """Resultado guardado, o None si no existe o quedó obsoleto."""
+        llm_hash = huella_llm(llm_kwargs)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tipo_archivo, config_hash, valor FROM resultados "
+                "WHERE pdf_hash = ? AND llm_hash = ?",
+                (pdf_hash, llm_hash),
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            tipo_archivo, config_hash, valor = row
+            if config_hash != huella_configuracion(tipo_archivo, _documento_largo(llm_kwargs)):
+                # Cambió algún prompt/schema del que depende este resultado.
+                self._conn.execute(
+                    "DELETE FROM resultados WHERE pdf_hash = ? AND llm_hash = ?",
+                    (pdf_hash, llm_hash),
+                )
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE resultados SET ultimo_acceso = ? WHERE pdf_hash = ? AND llm_hash = ?",
+                (time.time(), pdf_hash, llm_hash),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        logger.info("[Cache] Hit %s", pdf_hash[:12])
+        return json.loads(valor)
+
+    def put(self, pdf_hash: str, llm_kwargs: dict | None, result: dict) -> None:
+        """Guarda los campos cacheables del estado final y aplica el desalojo."""
+        tipo_archivo = result.get("tipo_archivo")
+        valor = json.dumps(
+            {campo: result.get(campo) for campo in CAMPOS_CACHEABLES},
+            ensure_ascii=False,
+        )
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    pdf_hash,
+                    huella_llm(llm_kwargs),
+                    tipo_archivo,
+                    huella_configuracion(tipo_archivo, _documento_largo(llm_kwargs)),
+                    valor,
+                    len(valor),
+                    time.time(),
+                ),
+            )
+            self._desalojar()
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+
+    def _desalojar(self) -> None:
+        """Elimina las entradas menos usadas hasta cumplir los límites."""
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM resultados"
+        ).fetchone()
+
+        sobrantes = max(0, count - self._max_entries)
+        if sobrantes:
+            self._conn.execute(
+                "DELETE FROM resultados WHERE rowid IN ("
+                "SELECT rowid FROM resultados ORDER BY ultimo_acceso LIMIT ?)",
+                (sobrantes,),
+            )
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM resultados"
+            ).fetchone()[0]
+
+        if self._max_bytes is None or total <= self._max_bytes:
+            return
+
+        liberar = total - self._max_bytes
+        for rowid, size in self._conn.execute(
+            "SELECT rowid, bytes FROM resultados ORDER BY ultimo_acceso"
+        ).fetchall():
+            self._conn.execute("DELETE FROM resultados WHERE rowid = ?", (rowid,))
+            liberar -= size
+            if liberar <= 0:
+                break
+
+    def purge_stale(self) -> int:
+        """
+        Elimina las entradas cuyos prompts/schemas/versiones cambiaron. Retorna cuántas.
+        La configuración de cada entrada no se guarda (solo su huella), así que
+        una entrada es vigente si coincide con la huella con o sin `documento_largo`.
+        """
+        huellas: dict[str | None, tuple[str, str]] = {}
+        with self._lock:
+            obsoletas = []
+            for pdf_hash, llm_hash, tipo, config_hash in self._conn.execute(
+                "SELECT pdf_hash, llm_hash, tipo_archivo, config_hash FROM resultados"
+            ).fetchall():
+                if tipo not in huellas:
+                    huellas[tipo] = (huella_configuracion(tipo), huella_configuracion(tipo, True))
+                if config_hash not in huellas[tipo]:
+                    obsoletas.append((pdf_hash, llm_hash))
+
+            self._conn.executemany(
+                "DELETE FROM resultados WHERE pdf_hash = ? AND llm_hash = ?", obsoletas
+            )
+            self._conn.commit()
+
+        logger.info("[Cache] %d entradas obsoletas eliminadas", len(obsoletas))
+        return len(obsoletas)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM resultados"
+            ).fetchone()
+        return {"entradas": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
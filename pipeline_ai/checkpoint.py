@@ -0,0 +1,235 @@
+"""
+Checkpoints livianos del grafo.
+
+Cada checkpoint de `StateEstructure` serializaba el PDF completo, los prompts
+y ambos historiales (que vuelven a incluir el PDF en base64). Aquí:
+
+- `AlmacenBlobs`: tabla SQLite direccionada por contenido (sha256). Cada blob
+  se guarda una sola vez, sin importar en cuántos checkpoints aparezca.
+- `SerializadorConBlobs`: envuelve al serializador de LangGraph y, antes de
+  serializar, reemplaza el `PdfDocument` y todo string/bytes grande (PDF en
+  base64 de los historiales, prompts y contextos) por su hash. Los textos
+  estáticos quedan así referenciados por versión (su hash de contenido) en
+  lugar de copiarse en cada checkpoint.
+- `CheckpointerSqlite`: `SqliteSaver` con ese serializador y soporte async
+  (delegando en un hilo), para usar el mismo checkpointer en ambos grafos.
+
+Uso:
+    checkpointer = crear_checkpointer("checkpoints.sqlite")
+    engine = ContractPipeline(checkpointer=checkpointer)
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from configuraciones_IA import prompts
+from utils.pdf_utils import PdfDocument
+
+# Strings o bytes a partir de este tamaño se guardan en el almacén de blobs.
+UMBRAL_BLOB = 2048
+
+_MARCA_TEXTO = "__blob__"
+_MARCA_BYTES = "__blob_bytes__"
+_MARCA_PDF = "__pdf__"
+
+# Textos estáticos (prompts y contextos): van siempre por referencia, sin
+# importar su tamaño.
+TEXTOS_ESTATICOS = frozenset(
+    valor for nombre, valor in vars(prompts).items()
+    if not nombre.startswith("_") and isinstance(valor, str)
+)
+
+
+# ---------------------------------------------------------------------------
+# Almacén de blobs
+# ---------------------------------------------------------------------------
+
+class AlmacenBlobs:
+    """Blobs direccionados por contenido en SQLite (una fila por sha256)."""
+
+    def __init__(self, ruta: str):
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, datos BLOB NOT NULL)"
+            )
+            self._conn.commit()
+            # Hashes ya presentes: evita reescribir (y releer) el mismo blob.
+            self._conocidos = {h for (h,) in self._conn.execute("SELECT hash FROM blobs")}
+
+    def guardar(self, datos: bytes | memoryview, huella: str | None = None) -> str:
+        """
+        Guarda `datos` si su hash no está. Con `huella` conocida no se lee ni
+        se copia nada: el PDF (un `memoryview`, quizá sobre un mmap) se pasa
+        tal cual y SQLite solo lo lee la primera vez.
+        """
+        huella = huella or hashlib.sha256(datos).hexdigest()
+        with self._lock:
+            if huella not in self._conocidos:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, datos) VALUES (?, ?)", (huella, datos)
+                )
+                self._conn.commit()
+                self._conocidos.add(huella)
+        return huella
+
+    def leer(self, huella: str) -> bytes:
+        with self._lock:
+            fila = self._conn.execute("SELECT datos FROM blobs WHERE hash = ?", (huella,)).fetchone()
+        if fila is None:
+            raise KeyError(f"Blob {huella} no encontrado")
+        return fila[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            cantidad, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(datos)), 0) FROM blobs"
+            ).fetchone()
+        return {"blobs": cantidad, "bytes": total}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Serializador
+# ---------------------------------------------------------------------------
+
+def _reconstruir(original: list | tuple, valores: list):
+    """Misma clase de secuencia que `original` (incluye namedtuples)."""
+    if isinstance(original, list):
+        return valores
+    if hasattr(original, "_fields"):
+        return type(original)(*valores)
+    return type(original)(valores)
+
+
+class SerializadorConBlobs:
+    """
+    Serializador de checkpoints que deja en el checkpoint solo los hashes de
+    los valores grandes. Implementa el `SerializerProtocol` de LangGraph.
+    """
+
+    def __init__(
+        self,
+        blobs: AlmacenBlobs,
+        umbral: int = UMBRAL_BLOB,
+        interno=None,
+        estaticos: frozenset[str] = TEXTOS_ESTATICOS,
+    ):
+        self.blobs = blobs
+        self.umbral = umbral
+        self.estaticos = estaticos
+        self.interno = interno or JsonPlusSerializer()
+        # Los mismos objetos str se repiten en cada checkpoint (historiales,
+        # prompts): se recuerda su hash por identidad para no recalcularlo.
+        self._hashes: OrderedDict[int, tuple[str, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def dumps_typed(self, obj) -> tuple[str, bytes]:
+        return self.interno.dumps_typed(self._reducir(obj))
+
+    def loads_typed(self, data: tuple[str, bytes]):
+        return self._restaurar(self.interno.loads_typed(data))
+
+    # ── Reemplazo ──────────────────────────────────────────────────────────
+
+    def _hash_texto(self, texto: str) -> str:
+        with self._lock:
+            previo = self._hashes.get(id(texto))
+            if previo is not None and previo[0] is texto:
+                self._hashes.move_to_end(id(texto))
+                return previo[1]
+
+        huella = self.blobs.guardar(texto.encode("utf-8"))
+        with self._lock:
+            self._hashes[id(texto)] = (texto, huella)
+            if len(self._hashes) > 512:
+                self._hashes.popitem(last=False)
+        return huella
+
+    def _reducir(self, obj):
+        if isinstance(obj, PdfDocument):
+            # Se serializa en cada superstep: sin copiar los bytes del PDF.
+            return {_MARCA_PDF: self.blobs.guardar(obj.datos, obj.sha256())}
+        if isinstance(obj, str):
+            if len(obj) >= self.umbral or obj in self.estaticos:
+                return {_MARCA_TEXTO: self._hash_texto(obj)}
+            return obj
+        if isinstance(obj, (bytes, bytearray)):
+            return {_MARCA_BYTES: self.blobs.guardar(bytes(obj))} if len(obj) >= self.umbral else obj
+        if isinstance(obj, dict):
+            return {k: self._reducir(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return _reconstruir(obj, [self._reducir(v) for v in obj])
+        if isinstance(obj, BaseMessage):
+            return obj.model_copy(update={"content": self._reducir(obj.content)})
+        return obj
+
+    def _restaurar(self, obj):
+        if isinstance(obj, dict):
+            if len(obj) == 1:
+                if _MARCA_TEXTO in obj:
+                    return self.blobs.leer(obj[_MARCA_TEXTO]).decode("utf-8")
+                if _MARCA_BYTES in obj:
+                    return self.blobs.leer(obj[_MARCA_BYTES])
+                if _MARCA_PDF in obj:
+                    return PdfDocument.from_bytes(self.blobs.leer(obj[_MARCA_PDF]))
+            return {k: self._restaurar(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return _reconstruir(obj, [self._restaurar(v) for v in obj])
+        if isinstance(obj, BaseMessage):
+            return obj.model_copy(update={"content": self._restaurar(obj.content)})
+        return obj
+
+
+# ---------------------------------------------------------------------------
+# Checkpointer
+# ---------------------------------------------------------------------------
+
+class CheckpointerSqlite(SqliteSaver):
+    """
+    `SqliteSaver` utilizable también desde el grafo async: los métodos `a*`
+    ejecutan los síncronos en un hilo (la conexión ya está protegida por lock).
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        tuplas = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for tupla in tuplas:
+            yield tupla
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def crear_checkpointer(ruta: str, umbral: int = UMBRAL_BLOB) -> CheckpointerSqlite:
+    """
+    Checkpointer SQLite con almacén de blobs en el mismo archivo.
+
+    Args:
+        ruta:   Archivo SQLite (se crea si no existe).
+        umbral: Tamaño desde el cual un string/bytes va al almacén de blobs.
+    """
+    conn = sqlite3.connect(ruta, check_same_thread=False)
+    return CheckpointerSqlite(conn, serde=SerializadorConBlobs(AlmacenBlobs(ruta), umbral))
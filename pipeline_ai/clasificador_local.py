@@ -0,0 +1,111 @@
+"""
+Clasificador local sobre la capa de texto del PDF.
+
+Puntúa las primeras páginas con palabras clave y expresiones regulares y
+retorna la misma forma que el agente clasificador (`tipo_arch`, `confianza`).
+`nodo_clasificador` solo llama al LLM cuando la confianza local queda por
+debajo del umbral configurado.
+"""
+
+import re
+import threading
+
+from pipeline_ai.valores import normalizar_texto
+
+# Patrones sobre texto normalizado (minúsculas, sin tildes). Cada patrón suma
+# su peso una sola vez, sin importar cuántas veces aparezca.
+_PATRONES_OTROSI = (
+    (re.compile(r"\botro\s?si\b"), 2.0),
+    (re.compile(r"\bmodificacion\s+(?:no\.?\s*\d+\s+)?(?:al|del)\s+contrato\b"), 1.5),
+    (re.compile(r"\bprorroga\b"), 1.0),
+    (re.compile(r"\badicion\s+(?:en\s+)?(?:tiempo|valor|al\s+contrato)\b"), 1.5),
+)
+_PATRONES_CONTRATO = (
+    (re.compile(r"\bcontrato\s+(?:no\.?|numero|n[°º])?\s*cw\s?-?\d+"), 2.0),
+    (re.compile(r"\bcontrato\s+de\s+(?:prestacion|suministro|compraventa|arrendamiento|"
+                r"consultoria|mantenimiento|obra|comodato|transporte)"), 2.0),
+    (re.compile(r"\bclausula\s+(?:primera|1)\b"), 1.5),
+    (re.compile(r"\bobjeto\s+del\s+contrato\b"), 1.0),
+    (re.compile(r"\bcontratante\b"), 0.5),
+    (re.compile(r"\bcontratista\b"), 0.5),
+)
+
+# Un "OTROSÍ" en el encabezado de la primera página es casi concluyente.
+_CARACTERES_ENCABEZADO = 600
+_PESO_OTROSI_ENCABEZADO = 4.0
+
+
+def _puntaje(texto: str, patrones) -> float:
+    return sum(peso for patron, peso in patrones if patron.search(texto))
+
+
+def clasificar_localmente(textos: list[str]) -> dict:
+    """
+    Clasifica el documento a partir del texto de sus primeras páginas.
+
+    Args:
+        textos: Texto de cada página (p. ej. `PdfDocument.texto_primeras_paginas()`).
+
+    Returns:
+        {"tipo_arch": 'CONTRATO' | 'OTROSI' | 'OTRO' | None, "confianza": float}
+        `tipo_arch` es None (confianza 0) cuando no hay capa de texto.
+    """
+    texto = normalizar_texto(" ".join(textos))
+    if len(texto.strip()) < 50:
+        return {"tipo_arch": None, "confianza": 0.0}
+
+    encabezado = normalizar_texto(textos[0])[:_CARACTERES_ENCABEZADO] if textos else ""
+
+    otrosi = _puntaje(texto, _PATRONES_OTROSI)
+    if re.search(r"\botro\s?si\b", encabezado):
+        otrosi += _PESO_OTROSI_ENCABEZADO
+    contrato = _puntaje(texto, _PATRONES_CONTRATO)
+
+    if otrosi == 0 and contrato == 0:
+        # Hay texto pero ninguna señal: probablemente OTRO, con poca certeza.
+        return {"tipo_arch": "OTRO", "confianza": 0.4}
+
+    # Todo otrosí cita su contrato base: las señales de contrato pesan menos
+    # cuando el encabezado ya dice OTROSÍ.
+    if otrosi >= _PESO_OTROSI_ENCABEZADO:
+        return {"tipo_arch": "OTROSI", "confianza": round(min(0.97, 0.6 + 0.05 * otrosi), 2)}
+
+    if otrosi == 0:
+        return {"tipo_arch": "CONTRATO", "confianza": round(min(0.97, 0.5 + 0.07 * contrato), 2)}
+
+    tipo = "OTROSI" if otrosi > contrato else "CONTRATO"
+    mayor, menor = max(otrosi, contrato), min(otrosi, contrato)
+    return {"tipo_arch": tipo, "confianza": round(mayor / (mayor + menor + 2.0), 2)}
+
+
+# ---------------------------------------------------------------------------
+# Contadores
+# ---------------------------------------------------------------------------
+
+class ContadoresClasificador:
+    """Cuenta cuántas clasificaciones se resolvieron localmente y cuántas con el LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.locales = 0
+        self.llm = 0
+
+    def registrar(self, origen: str) -> None:
+        with self._lock:
+            if origen == "local":
+                self.locales += 1
+            else:
+                self.llm += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.locales + self.llm
+            return {
+                "llamadas_evitadas": self.locales,
+                "llamadas_llm": self.llm,
+                "tasa_evitadas": round(self.locales / total, 4) if total else 0.0,
+            }
+
+
+# Contadores del proceso (compartidos por todos los grafos).
+CONTADORES = ContadoresClasificador()
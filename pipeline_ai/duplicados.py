@@ -0,0 +1,431 @@
+"""
+Detección de casi-duplicados para reutilizar extracciones.
+
+El mismo contrato llega escaneado dos veces, firmado y sin firmar, o
+re-exportado con otros metadatos: el sha256 cambia y `ResultCache` no lo
+reconoce. Antes del clasificador, el motor calcula una huella barata del
+documento y la busca en `IndiceDuplicados`:
+
+- Texto: MinHash de una permutación (`NUM_BINS` mínimos) sobre los 5-gramas
+  de palabras del texto normalizado (minúsculas, sin tildes), con LSH por
+  bandas para encontrar candidatos sin recorrer el índice.
+- Números: los tokens con dígitos (identificadores, NIT, valores, fechas) de
+  *todas* las páginas se comparan aparte. Dos contratos de la misma
+  plantilla comparten casi todo el texto, pero no sus números: se exige que
+  uno de los dos documentos contenga todos los números del otro (una copia
+  firmada solo agrega números, como la fecha de firma; otro contrato los
+  reemplaza).
+- Imagen (opcional, `por_imagen=True`): dHash de un render reducido de las
+  primeras páginas, para escaneos sin capa de texto. No distingue dos
+  contratos de la misma plantilla, así que sus coincidencias siempre pasan
+  por el validador.
+
+El MinHash solo lee las primeras `PAGINAS_INICIO` y últimas `PAGINAS_FIN`
+páginas, y de un documento con más de `MAX_NUMEROS` números distintos se
+guarda una muestra: dos versiones de un contrato largo que difieren en el
+texto de las páginas del medio pueden coincidir. Esas huellas no son
+`completa`s y sus coincidencias pasan por el validador (salvo `validar="nunca"`).
+
+El índice vive en memoria y se respalda en SQLite: al abrirlo se cargan las
+huellas guardadas. El resultado a reutilizar se lee de `ResultCache` con el
+sha256 del documento parecido, así que hereda su invalidación por cambios de
+prompts/schemas y de configuración.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+
+from utils.pdf_utils import PdfDocument
+
+logger = logging.getLogger(__name__)
+
+# MinHash de una permutación: cantidad de mínimos y filas por banda del LSH.
+NUM_BINS = 64
+FILAS_BANDA = 4
+PALABRAS_SHINGLE = 5
+# Máximo de hashes de números que se guardan (los menores).
+MAX_NUMEROS = 4096
+# Páginas cuyo texto entra al MinHash: las primeras y las últimas.
+PAGINAS_INICIO = 30
+PAGINAS_FIN = 10
+# Mínimo de palabras para que la huella de texto sea confiable.
+MIN_PALABRAS = 200
+
+# Huella de imagen: dHash de las primeras páginas, `LADO_DHASH` x `LADO_DHASH` bits.
+PAGINAS_IMAGEN = 3
+LADO_DHASH = 16
+BANDAS_IMAGEN = 8
+
+# Cuándo pasar una extracción reutilizada por el validador.
+VALIDACION_DUPLICADOS = ("nunca", "imagen", "siempre")
+
+_VACIO = 2 ** 64 - 1
+_TOKEN = re.compile(r"\w+")
+_DIGITO = re.compile(r"\d")
+
+
+@dataclass(frozen=True)
+class Huella:
+    """Huella de un documento: texto (MinHash), números e imagen (dHash por página)."""
+    paginas: int
+    texto: tuple[int, ...] | None
+    numeros: tuple[int, ...]
+    imagen: tuple[int, ...] | None
+
+    @property
+    def completa(self) -> bool:
+        """True si el MinHash y los números cubren todo el documento, sin muestreo."""
+        return self.paginas <= PAGINAS_INICIO + PAGINAS_FIN and len(self.numeros) < MAX_NUMEROS
+
+
+@dataclass(frozen=True)
+class Coincidencia:
+    """Documento del índice parecido al buscado."""
+    pdf_hash: str
+    similitud: float
+    origen: str  # "texto" | "imagen"
+    completa: bool = True  # ambas huellas sin muestreo (ver `Huella.completa`)
+
+
+# ---------------------------------------------------------------------------
+# Huella
+# ---------------------------------------------------------------------------
+
+def _hash64(texto: str) -> int:
+    return int.from_bytes(hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def normalizar(texto: str) -> list[str]:
+    """Palabras en minúscula y sin tildes."""
+    sin_tildes = unicodedata.normalize("NFKD", texto.lower())
+    sin_tildes = "".join(c for c in sin_tildes if not unicodedata.combining(c))
+    return _TOKEN.findall(sin_tildes)
+
+
+def _firma_texto(palabras: list[str]) -> tuple[int, ...] | None:
+    """Mínimo hash por bin de los 5-gramas (None si hay muy poco texto)."""
+    if len(palabras) < MIN_PALABRAS:
+        return None
+    minimos = [_VACIO] * NUM_BINS
+    for i in range(len(palabras) - PALABRAS_SHINGLE + 1):
+        h = _hash64(" ".join(palabras[i:i + PALABRAS_SHINGLE]))
+        bin_, valor = h % NUM_BINS, h // NUM_BINS
+        if valor < minimos[bin_]:
+            minimos[bin_] = valor
+    return tuple(minimos)
+
+
+def _firma_numeros(palabras: list[str]) -> tuple[int, ...]:
+    numeros = {_hash64(p) for p in set(palabras) if _DIGITO.search(p)}
+    return tuple(sorted(numeros)[:MAX_NUMEROS])
+
+
+def _dhash(pixeles: bytes, lado: int) -> int:
+    """Diferencia horizontal de brillo: un bit por par de píxeles vecinos."""
+    bits = 0
+    ancho = lado + 1
+    for y in range(lado):
+        fila = pixeles[y * ancho:(y + 1) * ancho]
+        for x in range(lado):
+            bits = (bits << 1) | (fila[x] > fila[x + 1])
+    return bits
+
+
+def _paginas_texto(total: int) -> list[int]:
+    if total <= PAGINAS_INICIO + PAGINAS_FIN:
+        return list(range(total))
+    return [*range(PAGINAS_INICIO), *range(total - PAGINAS_FIN, total)]
+
+
+def calcular_huella(doc: PdfDocument, por_imagen: bool = False) -> Huella:
+    """
+    Huella de `doc`. El texto de cada página queda cacheado en el documento,
+    así que el clasificador y la selección de páginas no lo vuelven a extraer.
+    Los números salen de todas las páginas; el MinHash, de las primeras y últimas.
+    """
+    total = len(doc)
+    paginas = [normalizar(doc.texto_pagina(i)) for i in range(total)]
+    texto = _firma_texto([p for i in _paginas_texto(total) for p in paginas[i]])
+
+    imagen = None
+    if por_imagen and texto is None:
+        imagen = tuple(
+            _dhash(doc.miniatura(i, LADO_DHASH + 1, LADO_DHASH), LADO_DHASH)
+            for i in range(min(PAGINAS_IMAGEN, total))
+        )
+    return Huella(
+        paginas=total,
+        texto=texto,
+        numeros=_firma_numeros([p for pagina in paginas for p in pagina]),
+        imagen=imagen,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Similitud
+# ---------------------------------------------------------------------------
+
+def similitud_texto(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Jaccard estimado entre dos firmas de texto."""
+    usados = iguales = 0
+    for x, y in zip(a, b):
+        if x == _VACIO and y == _VACIO:
+            continue
+        usados += 1
+        iguales += x == y
+    return iguales / usados if usados else 0.0
+
+
+def numeros_distintos(a: tuple[int, ...], b: tuple[int, ...]) -> int:
+    """Números que le faltan al documento que contiene más de los del otro (0 = uno contiene al otro)."""
+    a, b = set(a), set(b)
+    return min(len(a - b), len(b - a))
+
+
+def similitud_imagen(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Promedio por página de la fracción de bits iguales del dHash."""
+    if len(a) != len(b) or not a:
+        return 0.0
+    bits = LADO_DHASH * LADO_DHASH
+    return sum(1 - (x ^ y).bit_count() / bits for x, y in zip(a, b)) / len(a)
+
+
+def _bandas(huella: Huella) -> list[int]:
+    """Claves LSH de una huella (texto por bandas de bins; imagen por tramos de la 1.ª página)."""
+    if huella.texto is not None:
+        return [
+            _hash64(f"t{i}:" + ",".join(map(str, huella.texto[i:i + FILAS_BANDA])))
+            for i in range(0, NUM_BINS, FILAS_BANDA)
+            if any(v != _VACIO for v in huella.texto[i:i + FILAS_BANDA])
+        ]
+    if huella.imagen:
+        ancho = LADO_DHASH * LADO_DHASH // BANDAS_IMAGEN
+        mascara = (1 << ancho) - 1
+        return [
+            _hash64(f"i{i}:{(huella.imagen[0] >> (i * ancho)) & mascara}")
+            for i in range(BANDAS_IMAGEN)
+        ]
+    return []
+
+
+# ---------------------------------------------------------------------------
+# Índice
+# ---------------------------------------------------------------------------
+
+def _empacar(valores: tuple[int, ...] | None, formato: str) -> bytes | None:
+    if valores is None:
+        return None
+    return struct.pack(f"<{len(valores)}{formato}", *valores)
+
+
+def _desempacar(datos: bytes | None, formato: str) -> tuple[int, ...] | None:
+    if datos is None:
+        return None
+    return struct.unpack(f"<{len(datos) // struct.calcsize(formato)}{formato}", datos)
+
+
+def _empacar_imagen(valores: tuple[int, ...] | None) -> bytes | None:
+    if valores is None:
+        return None
+    tamano = LADO_DHASH * LADO_DHASH // 8
+    return b"".join(v.to_bytes(tamano, "little") for v in valores)
+
+
+def _desempacar_imagen(datos: bytes | None) -> tuple[int, ...] | None:
+    if datos is None:
+        return None
+    tamano = LADO_DHASH * LADO_DHASH // 8
+    return tuple(int.from_bytes(datos[i:i + tamano], "little") for i in range(0, len(datos), tamano))
+
+
+class IndiceDuplicados:
+    """
+    Huellas de los documentos ya procesados, en memoria y en SQLite.
+
+    Limitación: en documentos de más de `PAGINAS_INICIO + PAGINAS_FIN` páginas
+    (o con más de `MAX_NUMEROS` números distintos) la huella es una muestra,
+    y dos versiones que solo difieren en el texto de las páginas del medio
+    pueden coincidir. Con `validar="imagen"` (por defecto) esas coincidencias
+    pasan por el validador; con `validar="nunca"` se reutilizan directo.
+
+    Uso:
+        indice = IndiceDuplicados("duplicados.sqlite", umbral=0.9)
+        engine = ContractPipeline(cache=ResultCache(...), duplicados=indice)
+    """
+
+    def __init__(
+        self,
+        path: str = "duplicados.sqlite",
+        umbral: float = 0.9,
+        max_numeros_distintos: int = 0,
+        por_imagen: bool = False,
+        umbral_imagen: float = 0.97,
+        validar: str = "imagen",
+        max_entries: int = 50_000,
+    ):
+        """
+        Args:
+            path:           Archivo SQLite (":memory:" para un índice volátil).
+            umbral:         Similitud de texto mínima (Jaccard estimado de los 5-gramas).
+            max_numeros_distintos: Números tolerados que no estén en ambos
+                            documentos (ver `numeros_distintos`; 0 = ninguno).
+            por_imagen:     Huella por render para documentos sin capa de texto.
+            umbral_imagen:  Similitud mínima del dHash (fracción de bits iguales).
+            validar:        Cuándo pasar la extracción reutilizada por el validador:
+                            "nunca" | "imagen" (coincidencias por imagen o entre
+                            huellas muestreadas, ver `Huella.completa`) | "siempre".
+            max_entries:    Máximo de huellas; se descartan las más antiguas.
+        """
+        if validar not in VALIDACION_DUPLICADOS:
+            raise ValueError(f"validar inválido: {validar!r}. Opciones: {VALIDACION_DUPLICADOS}")
+        self.umbral = umbral
+        self.max_numeros_distintos = max_numeros_distintos
+        self.por_imagen = por_imagen
+        self.umbral_imagen = umbral_imagen
+        self.validar = validar
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._huellas: dict[str, Huella] = {}
+        self._bandas: dict[int, set[str]] = {}
+        self.coincidencias = 0
+        self.busquedas = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS huellas (
+                pdf_hash TEXT PRIMARY KEY,
+                paginas  INTEGER NOT NULL,
+                texto    BLOB,
+                numeros  BLOB NOT NULL,
+                imagen   BLOB,
+                creado   REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_huellas_creado ON huellas (creado)")
+        self._conn.commit()
+        for pdf_hash, paginas, texto, numeros, imagen in self._conn.execute(
+            "SELECT pdf_hash, paginas, texto, numeros, imagen FROM huellas ORDER BY creado"
+        ):
+            self._indexar(pdf_hash, Huella(
+                paginas=paginas,
+                texto=_desempacar(texto, "Q"),
+                numeros=_desempacar(numeros, "Q"),
+                imagen=_desempacar_imagen(imagen),
+            ))
+
+    # ------------------------------------------------------------------
+    # Huella / búsqueda
+    # ------------------------------------------------------------------
+
+    def huella(self, doc: PdfDocument) -> Huella:
+        return calcular_huella(doc, por_imagen=self.por_imagen)
+
+    def buscar(self, huella: Huella, excluir: str | None = None) -> list[Coincidencia]:
+        """Documentos sobre los umbrales, del más al menos parecido."""
+        with self._lock:
+            self.busquedas += 1
+            candidatos = {h for clave in _bandas(huella) for h in self._bandas.get(clave, ())}
+            candidatos.discard(excluir)
+            previas = [(h, self._huellas[h]) for h in candidatos]
+
+        coincidencias = []
+        for pdf_hash, previa in previas:
+            # Una copia firmada puede traer una página más (certificado de firma).
+            if abs(previa.paginas - huella.paginas) > 1:
+                continue
+            if numeros_distintos(huella.numeros, previa.numeros) > self.max_numeros_distintos:
+                continue
+            if huella.texto is not None and previa.texto is not None:
+                similitud, origen, umbral = similitud_texto(huella.texto, previa.texto), "texto", self.umbral
+            elif huella.imagen is not None and previa.imagen is not None:
+                similitud, origen, umbral = similitud_imagen(huella.imagen, previa.imagen), "imagen", self.umbral_imagen
+            else:
+                continue
+            if similitud >= umbral:
+                coincidencias.append(Coincidencia(
+                    pdf_hash, round(similitud, 4), origen, huella.completa and previa.completa,
+                ))
+
+        if coincidencias:
+            with self._lock:
+                self.coincidencias += 1
+        return sorted(coincidencias, key=lambda c: c.similitud, reverse=True)
+
+    def requiere_validacion(self, coincidencia: Coincidencia) -> bool:
+        if self.validar != "imagen":
+            return self.validar == "siempre"
+        return coincidencia.origen == "imagen" or not coincidencia.completa
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    def registrar(self, pdf_hash: str, huella: Huella) -> None:
+        """Agrega (o reemplaza) la huella de un documento procesado."""
+        if huella.texto is None and huella.imagen is None:
+            return
+        with self._lock:
+            self._olvidar(pdf_hash)
+            self._indexar(pdf_hash, huella)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO huellas VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    pdf_hash,
+                    huella.paginas,
+                    _empacar(huella.texto, "Q"),
+                    _empacar(huella.numeros, "Q"),
+                    _empacar_imagen(huella.imagen),
+                    time.time(),
+                ),
+            )
+            sobrantes = len(self._huellas) - self._max_entries
+            if sobrantes > 0:
+                antiguas = [h for (h,) in self._conn.execute(
+                    "SELECT pdf_hash FROM huellas ORDER BY creado LIMIT ?", (sobrantes,)
+                )]
+                for h in antiguas:
+                    self._olvidar(h)
+                self._conn.executemany("DELETE FROM huellas WHERE pdf_hash = ?", [(h,) for h in antiguas])
+            self._conn.commit()
+
+    def _indexar(self, pdf_hash: str, huella: Huella) -> None:
+        self._huellas[pdf_hash] = huella
+        for clave in _bandas(huella):
+            self._bandas.setdefault(clave, set()).add(pdf_hash)
+
+    def _olvidar(self, pdf_hash: str) -> None:
+        huella = self._huellas.pop(pdf_hash, None)
+        if huella is None:
+            return
+        for clave in _bandas(huella):
+            grupo = self._bandas.get(clave)
+            if grupo is not None:
+                grupo.discard(pdf_hash)
+                if not grupo:
+                    del self._bandas[clave]
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "huellas": len(self._huellas),
+                "busquedas": self.busquedas,
+                "coincidencias": self.coincidencias,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
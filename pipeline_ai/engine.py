@@ -0,0 +1,561 @@
+"""
+Motor reutilizable del pipeline.
+
+`ContractPipeline` construye LLM, agentes y grafo compilado una sola vez por
+cada configuración de `llm_kwargs` y los reutiliza entre documentos, de modo
+que un job de miles de contratos no pague ese costo (ni descarte el cliente
+HTTP) en cada ejecución.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from pipeline_ai.agents_factory import MODELO_POR_DEFECTO, build_agents, build_llm
+from pipeline_ai.cache import ResultCache
+from pipeline_ai.duplicados import Huella, IndiceDuplicados
+from pipeline_ai.especulacion import PoliticaEspeculacion
+from pipeline_ai.graph import build_graph
+from pipeline_ai.metrics import METRICAS, resumen_documento
+from pipeline_ai.plazos import resumen_plazo
+from pipeline_ai.rate_limit import limitador_para
+from pipeline_ai.state import build_initial_state, StateEstructure
+from utils.pdf_utils import OPTIMIZACION_POR_DEFECTO, PdfDocument
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _Componentes:
+    """LLM, agentes y grafos compilados asociados a un juego de `llm_kwargs`."""
+    llm: object
+    agents: dict
+    graph: object
+    async_graph: object
+
+
+def _clave_llm(llm_kwargs: dict | None) -> str:
+    """Clave estable (independiente del orden) para un juego de `llm_kwargs`."""
+    return json.dumps(llm_kwargs or {}, sort_keys=True, default=repr)
+
+
+# Opciones que limitan la ejecución pero no cambian el resultado esperado.
+_OPCIONES_FUERA_DE_CACHE = ("presupuesto_segundos",)
+
+# Valor por defecto de cada opción del state (ver `build_initial_state`).
+_OPCIONES_POR_DEFECTO = {
+    nombre: parametro.default
+    for nombre, parametro in inspect.signature(build_initial_state).parameters.items()
+    if parametro.default is not inspect.Parameter.empty
+}
+
+
+def _config_cache(llm_kwargs: dict | None, opciones: dict) -> dict | None:
+    """
+    Configuración que identifica un resultado en el caché (LLM + opciones de ejecución).
+
+    Se normaliza para que la misma configuración efectiva dé la misma clave,
+    la arme quien la arme (el CLI del lote pasa todas sus opciones, aunque
+    estén en su valor por defecto): se omiten las opciones en su valor por
+    defecto y `optimizar_pdf` se completa con los parámetros por defecto.
+    """
+    opciones = {
+        k: v for k, v in opciones.items()
+        if k not in _OPCIONES_FUERA_DE_CACHE and (k not in _OPCIONES_POR_DEFECTO or v != _OPCIONES_POR_DEFECTO[k])
+    }
+    if opciones.get("optimizar_pdf") is not None:
+        opciones["optimizar_pdf"] = {**OPTIMIZACION_POR_DEFECTO, **opciones["optimizar_pdf"]}
+    else:
+        opciones.pop("optimizar_pdf", None)
+    if not opciones:
+        return llm_kwargs
+    return {"llm_kwargs": llm_kwargs or {}, "opciones": opciones}
+
+
+def _cacheable(result: dict) -> bool:
+    """Un resultado cortado por tiempo no se guarda: otra ejecución podría completarlo."""
+    return not (result.get("plazo") or {}).get("agotado")
+
+
+def _reutilizable(result: dict) -> bool:
+    """Solo una extracción validada como CORRECTO se ofrece a sus casi-duplicados."""
+    return (
+        result.get("tipo_archivo") in ("CONTRATO", "OTROSI")
+        and bool(result.get("extracted_data"))
+        and (result.get("validation") or {}).get("validacion") == "CORRECTO"
+    )
+
+
+class ContractPipeline:
+    """
+    Motor de larga vida para procesar muchos documentos.
+
+    Mantiene un caché LRU pequeño de componentes por `llm_kwargs`. El grafo
+    compilado no guarda estado entre invocaciones, por lo que `run()` y
+    `run_many()` pueden llamarse desde varios hilos a la vez, y `arun()` /
+    `arun_many()` desde muchas corrutinas sobre un mismo event loop.
+
+    Uso:
+        engine = ContractPipeline()
+        r  = engine.run(pdf_base64)
+        rs = engine.run_many([pdf_1, pdf_2], max_workers=8)
+        rs = await engine.arun_many([pdf_1, pdf_2], concurrency=32)
+
+    Con `cache=ResultCache(...)` un documento ya procesado (mismo PDF, misma
+    config de LLM y mismos prompts/schemas) se responde sin tocar el grafo.
+    Con `duplicados=IndiceDuplicados(...)` además se reutiliza la extracción
+    de un documento casi idéntico (otra copia escaneada, firmada, re-exportada).
+    """
+
+    def __init__(
+        self,
+        llm_factory: Callable[..., object] = build_llm,
+        max_cache: int = 4,
+        cache: ResultCache | None = None,
+        especulacion: PoliticaEspeculacion | None = None,
+        limitar_cuota: bool = True,
+        checkpointer=None,
+        duplicados: IndiceDuplicados | None = None,
+    ):
+        """
+        Args:
+            llm_factory: Función que construye el LLM a partir de `llm_kwargs`
+                (por defecto `build_llm`; en benchmarks, un modelo falso).
+            max_cache:   Cantidad máxima de configuraciones distintas en caché.
+            cache:       Caché persistente de resultados (opcional).
+            especulacion: Política para extraer como CONTRATO en paralelo con
+                el clasificador (opcional; ver `pipeline_ai.especulacion`).
+            limitar_cuota: Pasa las llamadas de todos los agentes por el
+                limitador compartido del modelo (`pipeline_ai.rate_limit`).
+            checkpointer: Checkpointer de LangGraph (opcional). Con
+                `pipeline_ai.checkpoint.crear_checkpointer` el PDF y los textos
+                grandes se guardan una sola vez y por referencia. El hilo de
+                cada ejecución es el sha256 del documento más un sufijo único:
+                los historiales son canales de solo-agregado y no deben
+                acumularse entre ejecuciones del mismo documento.
+            duplicados:  Índice de casi-duplicados (opcional; requiere `cache`,
+                de donde se lee el resultado a reutilizar). Ver `pipeline_ai.duplicados`.
+        """
+        if duplicados is not None and cache is None:
+            raise ValueError("duplicados requiere cache: el resultado a reutilizar se lee de ResultCache")
+        self._llm_factory = llm_factory
+        self._max_cache = max_cache
+        self._result_cache = cache
+        self._especulacion = especulacion
+        self._limitar_cuota = limitar_cuota
+        self._checkpointer = checkpointer
+        self._duplicados = duplicados
+        self._cache: OrderedDict[str, _Componentes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Caché de componentes
+    # ------------------------------------------------------------------
+
+    def _componentes(self, llm_kwargs: dict | None) -> _Componentes:
+        """Retorna los componentes para `llm_kwargs`, construyéndolos si hace falta."""
+        clave = _clave_llm(llm_kwargs)
+
+        with self._lock:
+            componentes = self._cache.get(clave)
+            if componentes is not None:
+                self._cache.move_to_end(clave)
+                return componentes
+
+            logger.info("[Engine] Construyendo LLM, agentes y grafo para %s", clave)
+            kwargs = dict(llm_kwargs or {})
+            limitador = None
+            if self._limitar_cuota:
+                limitador = limitador_para(kwargs.get("model", MODELO_POR_DEFECTO))
+                if self._llm_factory is build_llm:
+                    # Los 429 los reintenta el limitador; el cliente no debe sumar los suyos.
+                    kwargs.setdefault("max_retries", 0)
+            llm = self._llm_factory(**kwargs)
+            agents = build_agents(llm, limitador)
+            componentes = _Componentes(
+                llm=llm,
+                agents=agents,
+                graph=build_graph(
+                    agents, especulacion=self._especulacion, checkpointer=self._checkpointer,
+                ),
+                async_graph=build_graph(
+                    agents, is_async=True, especulacion=self._especulacion,
+                    checkpointer=self._checkpointer,
+                ),
+            )
+
+            self._cache[clave] = componentes
+            if len(self._cache) > self._max_cache:
+                self._cache.popitem(last=False)
+            return componentes
+
+    def graph(self, llm_kwargs: dict | None = None):
+        """Grafo compilado (cacheado) para `llm_kwargs`."""
+        return self._componentes(llm_kwargs).graph
+
+    def async_graph(self, llm_kwargs: dict | None = None):
+        """Grafo compilado con nodos asíncronos (cacheado) para `llm_kwargs`."""
+        return self._componentes(llm_kwargs).async_graph
+
+    def clear(self) -> None:
+        """Vacía el caché de componentes."""
+        with self._lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _estado_inicial(
+        documento: PdfDocument,
+        max_attempts: int,
+        pdf_corto: str | None = None,
+        **opciones,
+    ) -> StateEstructure:
+        return build_initial_state(
+            pdf=documento,
+            max_attempts=max_attempts,
+            pdf_corto=pdf_corto,
+            **opciones,
+        )
+
+    @staticmethod
+    def _optimizar(documento: PdfDocument, opciones: dict) -> tuple[PdfDocument, dict]:
+        """
+        Aplica `optimizar_pdf` al documento que se envía al modelo si está en
+        las opciones. Retorna (documento a enviar, opciones para el state, con
+        el reporte de tamaños en `optimizacion`).
+        """
+        parametros = opciones.get("optimizar_pdf")
+        opciones = {k: v for k, v in opciones.items() if k != "optimizar_pdf"}
+        if parametros is None:
+            return documento, opciones
+
+        optimizado, reporte = documento.optimizado(**parametros)
+        logger.info(
+            "[Pipeline] PDF optimizado: %d → %d bytes (cache: %s)",
+            reporte["bytes_antes"], reporte["bytes_despues"], reporte["cache_hit"],
+        )
+        return optimizado, {**opciones, "optimizacion": reporte}
+
+    def _config_hilo(self, documento: PdfDocument) -> dict | None:
+        """
+        Config de LangGraph con un hilo nuevo para el documento (solo si hay
+        checkpointer). El id es el sha256 del documento más un sufijo único:
+        los historiales son canales append-only, así que reusar el hilo de una
+        corrida anterior del mismo documento acumularía sus turnos.
+        """
+        if self._checkpointer is None:
+            return None
+        return {"configurable": {"thread_id": f"{documento.sha256()}-{uuid.uuid4().hex[:12]}"}}
+
+    # ------------------------------------------------------------------
+    # Casi-duplicados
+    # ------------------------------------------------------------------
+
+    def _buscar_duplicado(self, documento: PdfDocument, config: dict | None) -> tuple[Huella | None, dict | None]:
+        """
+        Huella del documento y, si un casi-duplicado tiene un resultado
+        reutilizable en el caché para esta configuración, la reutilización:
+        {"previo": resultado, "reporte": {...}, "validar": bool}.
+        """
+        if self._duplicados is None:
+            return None, None
+
+        huella = self._duplicados.huella(documento)
+        for coincidencia in self._duplicados.buscar(huella, excluir=documento.sha256()):
+            previo = self._result_cache.get(coincidencia.pdf_hash, config)
+            if previo is None or not _reutilizable(previo):
+                continue
+            logger.info(
+                "[Pipeline] Casi-duplicado de %s (similitud %.3f por %s)",
+                coincidencia.pdf_hash[:12], coincidencia.similitud, coincidencia.origen,
+            )
+            return huella, {
+                "previo": previo,
+                "reporte": {
+                    "de": coincidencia.pdf_hash,
+                    "similitud": coincidencia.similitud,
+                    "origen": coincidencia.origen,
+                },
+                "validar": self._duplicados.requiere_validacion(coincidencia),
+            }
+        return huella, None
+
+    def _estado_duplicado(
+        self, documento: PdfDocument, max_attempts: int, opciones: dict, reutilizacion: dict,
+    ) -> StateEstructure:
+        """Estado que entra directo al validador con la extracción del casi-duplicado."""
+        previo = reutilizacion["previo"]
+        opciones = {k: v for k, v in opciones.items() if k != "optimizar_pdf"}
+        return self._estado_inicial(
+            documento,
+            max_attempts,
+            duplicado={
+                **reutilizacion["reporte"],
+                "tipo_archivo": previo["tipo_archivo"],
+                "extracted_data": previo["extracted_data"],
+            },
+            **opciones,
+        )
+
+    @staticmethod
+    def _resultado_duplicado(reutilizacion: dict, result: dict | None = None) -> dict | None:
+        """
+        Resultado de reutilizar el casi-duplicado: el previo tal cual (sin
+        validación) o el de la pasada del validador. None si el validador la
+        rechazó y hay que procesar el documento completo.
+        """
+        if result is None:
+            return {
+                **reutilizacion["previo"],
+                "cache_hit": True,
+                "duplicado": {**reutilizacion["reporte"], "validado": False, "aceptado": True},
+            }
+        if (result.get("validation") or {}).get("validacion") != "CORRECTO":
+            logger.info("[Pipeline] Extracción del casi-duplicado rechazada por el validador")
+            return None
+        return {**result, "duplicado": {**result["duplicado"], "validado": True, "aceptado": True}}
+
+    def _guardar(self, documento: PdfDocument, config: dict | None, huella: Huella | None, result: dict) -> None:
+        """Guarda el resultado en el caché y la huella del documento en el índice de casi-duplicados."""
+        if self._result_cache is None or not _cacheable(result):
+            return
+        self._result_cache.put(documento.sha256(), config, result)
+        if huella is not None and _reutilizable(result):
+            self._duplicados.registrar(documento.sha256(), huella)
+
+    @staticmethod
+    def _invocar(graph, estado: StateEstructure, config: dict | None = None) -> dict:
+        """
+        `graph.invoke` respetando el deadline del documento: se recorre el
+        grafo paso a paso y se corta entre pasos al vencer el plazo. Una
+        llamada en curso no se interrumpe (la acota el `timeout` del LLM).
+        """
+        deadline = estado.get("deadline")
+        if deadline is None:
+            return graph.invoke(estado, config)
+
+        ultimo, cortado = estado, False
+        for valores in graph.stream(estado, config, stream_mode="values"):
+            ultimo = valores
+            if time.time() >= deadline:
+                cortado = True
+                break
+        return {**ultimo, "plazo": resumen_plazo(ultimo, cortado)}
+
+    @staticmethod
+    async def _ainvocar(graph, estado: StateEstructure, config: dict | None = None) -> dict:
+        """
+        `graph.ainvoke` respetando el deadline del documento: al vencer, la
+        llamada en curso se cancela y se retorna el último estado completo.
+        """
+        deadline = estado.get("deadline")
+        if deadline is None:
+            return await graph.ainvoke(estado, config)
+
+        ultimo, cortado = estado, False
+        try:
+            async with asyncio.timeout(max(0.0, deadline - time.time())):
+                async for valores in graph.astream(estado, config, stream_mode="values"):
+                    ultimo = valores
+        except TimeoutError:
+            logger.warning("[Pipeline] Deadline vencido — se retorna el último estado")
+            cortado = True
+        return {**ultimo, "plazo": resumen_plazo(ultimo, cortado)}
+
+    @staticmethod
+    def _log_final(result: dict) -> None:
+        logger.info(
+            "✅ [Pipeline] Finalizado — tipo: %s — intentos: %d",
+            result.get("tipo_archivo"),
+            result.get("attempts", 0),
+        )
+
+    @staticmethod
+    def _medir(result: dict) -> dict:
+        """Adjunta el resumen de métricas del documento y lo suma al agregado del proceso."""
+        resumen = resumen_documento(result)
+        METRICAS.registrar_documento(resumen)
+        return {**result, "metricas": resumen}
+
+    def run(
+        self,
+        pdf_base64: PdfDocument | str,
+        max_attempts: int = 3,
+        llm_kwargs: dict | None = None,
+        **opciones,
+    ) -> dict:
+        """
+        Ejecuta el pipeline sobre un documento reutilizando los componentes cacheados.
+        Ver `pipeline_ai.run_pipeline` para la descripción de argumentos y retorno.
+        """
+        logger.info("[Pipeline] Iniciando ejecución")
+
+        documento = PdfDocument.coerce(pdf_base64)
+        config = _config_cache(llm_kwargs, opciones)
+
+        if self._result_cache is not None:
+            cached = self._result_cache.get(documento.sha256(), config)
+            if cached is not None:
+                return {**cached, "cache_hit": True}
+
+        huella, reutilizacion = self._buscar_duplicado(documento, config)
+        if reutilizacion is not None and not reutilizacion["validar"]:
+            documento.close()
+            result = self._resultado_duplicado(reutilizacion)
+            self._guardar(documento, config, huella, result)
+            return result
+
+        graph = self.graph(llm_kwargs)
+        enviado = documento
+        try:
+            result = None
+            if reutilizacion is not None:
+                result = self._resultado_duplicado(reutilizacion, self._invocar(
+                    graph,
+                    self._estado_duplicado(documento, max_attempts, opciones, reutilizacion),
+                    self._config_hilo(documento),
+                ))
+            if result is None:
+                enviado, opciones_estado = self._optimizar(documento, opciones)
+                result = self._invocar(
+                    graph,
+                    self._estado_inicial(enviado, max_attempts, **opciones_estado),
+                    self._config_hilo(documento),
+                )
+                if reutilizacion is not None:
+                    result["duplicado"] = {**reutilizacion["reporte"], "validado": True, "aceptado": False}
+        finally:
+            documento.close()
+            enviado.close()
+        result = self._medir(result)
+        self._guardar(documento, config, huella, result)
+
+        self._log_final(result)
+        return result
+
+    def run_many(
+        self,
+        pdfs: Iterable[PdfDocument | str],
+        max_attempts: int = 3,
+        llm_kwargs: dict | None = None,
+        max_workers: int = 4,
+        **opciones,
+    ) -> list[dict]:
+        """
+        Ejecuta el pipeline sobre varios documentos en un pool de hilos.
+
+        Returns:
+            Lista de estados finales en el mismo orden que `pdfs`.
+        """
+        # Se construyen los componentes antes de lanzar los hilos.
+        self._componentes(llm_kwargs)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(
+                pool.map(
+                    lambda pdf: self.run(
+                        pdf, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones
+                    ),
+                    pdfs,
+                )
+            )
+
+    async def arun(
+        self,
+        pdf_base64: PdfDocument | str,
+        max_attempts: int = 3,
+        llm_kwargs: dict | None = None,
+        pdf_corto: str | None = None,
+        **opciones,
+    ) -> dict:
+        """
+        Versión asíncrona de `run()`: usa el grafo con nodos `ainvoke`.
+
+        `pdf_corto` permite pasar las páginas del clasificador ya recortadas
+        (p. ej. desde un pool de procesos) para no repetir ese trabajo aquí.
+        """
+        logger.info("[Pipeline] Iniciando ejecución (async)")
+
+        documento = PdfDocument.coerce(pdf_base64)
+        config = _config_cache(llm_kwargs, opciones)
+
+        if self._result_cache is not None:
+            cached = await asyncio.to_thread(
+                self._result_cache.get, documento.sha256(), config
+            )
+            if cached is not None:
+                return {**cached, "cache_hit": True}
+
+        huella, reutilizacion = await asyncio.to_thread(self._buscar_duplicado, documento, config)
+        if reutilizacion is not None and not reutilizacion["validar"]:
+            documento.close()
+            result = self._resultado_duplicado(reutilizacion)
+            await asyncio.to_thread(self._guardar, documento, config, huella, result)
+            return result
+
+        graph = self.async_graph(llm_kwargs)
+        enviado = documento
+        try:
+            result = None
+            if reutilizacion is not None:
+                result = self._resultado_duplicado(reutilizacion, await self._ainvocar(
+                    graph,
+                    self._estado_duplicado(documento, max_attempts, opciones, reutilizacion),
+                    self._config_hilo(documento),
+                ))
+            if result is None:
+                enviado, opciones_estado = await asyncio.to_thread(self._optimizar, documento, opciones)
+                if enviado is not documento:
+                    # Las páginas recortadas de antemano salieron del original.
+                    pdf_corto = None
+                result = await self._ainvocar(
+                    graph,
+                    self._estado_inicial(enviado, max_attempts, pdf_corto, **opciones_estado),
+                    self._config_hilo(documento),
+                )
+                if reutilizacion is not None:
+                    result["duplicado"] = {**reutilizacion["reporte"], "validado": True, "aceptado": False}
+        finally:
+            documento.close()
+            enviado.close()
+        result = self._medir(result)
+        await asyncio.to_thread(self._guardar, documento, config, huella, result)
+
+        self._log_final(result)
+        return result
+
+    async def arun_many(
+        self,
+        pdfs: Iterable[PdfDocument | str],
+        max_attempts: int = 3,
+        llm_kwargs: dict | None = None,
+        concurrency: int = 16,
+        **opciones,
+    ) -> list[dict]:
+        """
+        Ejecuta el pipeline sobre varios documentos en un solo event loop,
+        con a lo sumo `concurrency` documentos en vuelo a la vez.
+
+        Returns:
+            Lista de estados finales en el mismo orden que `pdfs`.
+        """
+        semaforo = asyncio.Semaphore(concurrency)
+
+        async def _uno(pdf: PdfDocument | str) -> dict:
+            async with semaforo:
+                return await self.arun(
+                    pdf, max_attempts=max_attempts, llm_kwargs=llm_kwargs, **opciones
+                )
+
+        return await asyncio.gather(*(_uno(pdf) for pdf in pdfs))
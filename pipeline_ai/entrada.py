@@ -0,0 +1,119 @@
+"""
+Construcción del contenido del documento que se envía al modelo.
+
+Modos (`modo_entrada`):
+    - "archivo": el PDF se adjunta como file part (comportamiento original).
+    - "auto":    se evalúa la capa de texto de cada página (cantidad de
+                 caracteres y proporción de basura). Las páginas con buen texto
+                 se envían como texto plano; solo las escaneadas o ilegibles se
+                 adjuntan como PDF. Para PDFs nativos esto reduce mucho los
+                 tokens y los bytes de subida.
+"""
+
+import unicodedata
+
+from utils.pdf_utils import PdfDocument
+
+MODOS_ENTRADA = ("archivo", "auto")
+
+# Umbrales de calidad de la capa de texto por página.
+MIN_CARACTERES_PAGINA = 200
+MAX_RATIO_BASURA = 0.10
+
+# Categorías Unicode que cuentan como texto legítimo (letras, números,
+# puntuación, símbolos y separadores). Lo demás (controles, uso privado,
+# U+FFFD) suele venir de fuentes mal mapeadas.
+_CATEGORIAS_VALIDAS = ("L", "N", "P", "S", "Z")
+
+
+def calidad_texto(texto: str) -> dict:
+    """
+    Evalúa la capa de texto de una página.
+
+    Returns:
+        {"caracteres": int, "ratio_basura": float, "util": bool}
+    """
+    visibles = [c for c in texto if not c.isspace()]
+    if not visibles:
+        return {"caracteres": 0, "ratio_basura": 1.0, "util": False}
+
+    basura = sum(
+        1 for c in visibles
+        if c == "�" or not unicodedata.category(c).startswith(_CATEGORIAS_VALIDAS)
+    )
+    ratio = basura / len(visibles)
+    return {
+        "caracteres": len(visibles),
+        "ratio_basura": round(ratio, 4),
+        "util": len(visibles) >= MIN_CARACTERES_PAGINA and ratio <= MAX_RATIO_BASURA,
+    }
+
+
+def _bloque_archivo(doc: PdfDocument) -> dict:
+    return {"type": "file", "base64": doc.to_base64(), "mime_type": "application/pdf"}
+
+
+def construir_contenido(
+    doc: PdfDocument,
+    modo: str = "archivo",
+    indices: list[int] | None = None,
+) -> tuple[list[dict], dict]:
+    """
+    Bloques de contenido (text/file) que representan el documento.
+
+    Args:
+        doc:     Documento a enviar.
+        modo:    "archivo" | "auto" (ver docstring del módulo).
+        indices: Páginas de `doc` a incluir (base 0). None = todas.
+
+    Returns:
+        (bloques de contenido, reporte con páginas por texto/archivo y bytes)
+    """
+    if modo not in MODOS_ENTRADA:
+        raise ValueError(f"modo_entrada inválido: {modo!r}. Opciones: {MODOS_ENTRADA}")
+
+    todas = indices is None or list(indices) == list(range(len(doc)))
+    indices = list(range(len(doc))) if indices is None else list(indices)
+
+    if modo == "archivo":
+        archivo = doc if todas else doc.paginas(indices)
+        bloque = _bloque_archivo(archivo)
+        return [bloque], {
+            "modo": modo,
+            "paginas_texto": [],
+            "paginas_archivo": [i + 1 for i in indices],
+            "bytes_texto": 0,
+            "bytes_archivo": len(bloque["base64"]),
+        }
+
+    textos = {i: doc.texto_pagina(i) for i in indices}
+    con_texto = [i for i in indices if calidad_texto(textos[i])["util"]]
+    sin_texto = sorted(set(indices) - set(con_texto))
+
+    bloques: list[dict] = []
+    bytes_texto = 0
+    if con_texto:
+        texto = "\n\n".join(f"--- Página {i + 1} ---\n{textos[i].strip()}" for i in con_texto)
+        bytes_texto = len(texto.encode("utf-8"))
+        bloques.append({"type": "text", "text": f"Texto del documento:\n{texto}"})
+
+    bytes_archivo = 0
+    if sin_texto:
+        archivo = doc if todas and not con_texto else doc.paginas(sin_texto)
+        bloque = _bloque_archivo(archivo)
+        bytes_archivo = len(bloque["base64"])
+        if con_texto:
+            paginas = ", ".join(str(i + 1) for i in sin_texto)
+            bloques.append({
+                "type": "text",
+                "text": f"Las páginas {paginas} no tienen texto legible y se adjuntan como PDF, en ese orden.",
+            })
+        bloques.append(bloque)
+
+    return bloques, {
+        "modo": modo,
+        "paginas_texto": [i + 1 for i in con_texto],
+        "paginas_archivo": [i + 1 for i in sin_texto],
+        "bytes_texto": bytes_texto,
+        "bytes_archivo": bytes_archivo,
+    }
@@ -0,0 +1,78 @@
+"""
+Política de extracción especulativa.
+
+En modo especulativo el extractor de CONTRATO arranca en paralelo con el
+clasificador. Si el clasificador confirma CONTRATO se usa ese resultado y se
+ahorra un viaje completo al LLM; si dice OTROSI u OTRO, la especulación se
+cancela (async) o se descarta (sync) y sigue la ruta normal.
+
+La política lleva la tasa de acierto (promedio móvil exponencial) y solo
+especula mientras esa tasa justifique el costo de las llamadas descartadas.
+"""
+
+import random
+import threading
+
+
+class PoliticaEspeculacion:
+    """
+    Decide si especular y registra cuántas veces valió la pena.
+
+    Uso:
+        politica = PoliticaEspeculacion(umbral=0.6)
+        engine   = ContractPipeline(especulacion=politica)
+        politica.snapshot()  # {"lanzadas": ..., "aciertos": ..., "tasa_acierto": ...}
+    """
+
+    def __init__(
+        self,
+        umbral: float = 0.6,
+        alpha: float = 0.05,
+        exploracion: float = 0.05,
+        tasa_inicial: float = 0.8,
+    ):
+        """
+        Args:
+            umbral:       Tasa de acierto mínima para seguir especulando.
+            alpha:        Peso de cada observación en el promedio móvil.
+            exploracion:  Probabilidad de especular aunque la tasa esté bajo el
+                          umbral, para detectar cuando el tráfico vuelve a cambiar.
+            tasa_inicial: Estimación inicial (≈ proporción de CONTRATO esperada).
+        """
+        self.umbral = umbral
+        self.alpha = alpha
+        self.exploracion = exploracion
+        self._tasa = tasa_inicial
+        self._lock = threading.Lock()
+        self.lanzadas = 0
+        self.aciertos = 0
+        self.omitidas = 0
+
+    def debe_especular(self) -> bool:
+        with self._lock:
+            especular = self._tasa >= self.umbral or random.random() < self.exploracion
+            if not especular:
+                self.omitidas += 1
+            return especular
+
+    def registrar(self, acierto: bool) -> None:
+        with self._lock:
+            self.lanzadas += 1
+            self.aciertos += int(acierto)
+            self._tasa += self.alpha * (float(acierto) - self._tasa)
+
+    @property
+    def tasa_acierto(self) -> float:
+        with self._lock:
+            return self._tasa
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "lanzadas": self.lanzadas,
+                "aciertos": self.aciertos,
+                "descartadas": self.lanzadas - self.aciertos,
+                "omitidas": self.omitidas,
+                "tasa_acierto": round(self._tasa, 4),
+                "umbral": self.umbral,
+            }
@@ -10,7 +10,19 @@ from functools import partial
 
 from langgraph.graph import END, START, StateGraph
 
-from pipeline_ai.nodes import nodo_clasificador, nodo_extractor, nodo_validador
+from pipeline_ai.especulacion import PoliticaEspeculacion
+from pipeline_ai.metrics import AgenteMedido, instrumentar_nodo
+from pipeline_ai.nodes import (
+    anodo_clasificador,
+    anodo_clasificador_especulativo,
+    anodo_extractor,
+    anodo_validador,
+    nodo_clasificador,
+    nodo_clasificador_especulativo,
+    nodo_extractor,
+    nodo_validador,
+)
+from pipeline_ai.plazos import alcanza_otra_ronda, tiempo_restante
 from pipeline_ai.state import StateEstructure
 
 logger = logging.getLogger(__name__)
@@ -20,12 +32,27 @@ logger = logging.getLogger(__name__)
 # Routers
 # ---------------------------------------------------------------------------
 
+def _router_inicio(state: StateEstructure) -> str:
+    """Un casi-duplicado ya trae su extracción: solo se valida."""
+    if state.get("duplicado"):
+        logger.info("🟠 [Router Inicio] → validador: extracción reutilizada de un casi-duplicado")
+        return "validador"
+    return "clasificador"
+
+
 def _router_clasificador(state: StateEstructure) -> str:
-    """Decide si el documento debe ir al extractor o terminar."""
+    """Decide si el documento debe ir al extractor, al validador o terminar."""
     tipo = state.get("tipo_archivo")
     logger.info("🟠 [Router Clasificador] tipo_archivo=%s", tipo)
 
     if tipo in ("CONTRATO", "OTROSI"):
+        restante = tiempo_restante(state)
+        if restante is not None and restante <= 0:
+            logger.warning("🟠 [Router Clasificador] → END: presupuesto de tiempo agotado")
+            return END
+        if (state.get("especulacion") or {}).get("acierto"):
+            logger.info("🟠 [Router Clasificador] → validador: extracción especulativa aceptada")
+            return "validador"
         return "extractor"
     logger.info("🟠 [Router Clasificador] → END: documento no procesable")
     return END
@@ -44,10 +71,23 @@ def _router_validador(state: StateEstructure) -> str:
         logger.info("🟠 [Router Validador] → END: extracción correcta")
         return END
 
+    if state.get("duplicado"):
+        # El motor descarta la reutilización y procesa el documento completo.
+        logger.info("🟠 [Router Validador] → END: extracción reutilizada rechazada")
+        return END
+
     if attempts >= max_attempts:
         logger.warning("🟠 [Router Validador] → END: máximos intentos alcanzados")
         return END
 
+    if not alcanza_otra_ronda(state):
+        logger.warning(
+            "🟠 [Router Validador] → END: presupuesto insuficiente para otra ronda "
+            "(restan %.1fs, la ronda toma ~%.1fs)",
+            tiempo_restante(state), state.get("duracion_ronda") or 0.0,
+        )
+        return END
+
     logger.info("🟠 [Router Validador] → extractor: se requiere corrección")
     return "extractor"
 
@@ -56,7 +96,12 @@ def _router_validador(state: StateEstructure) -> str:
 # Builder
 # ---------------------------------------------------------------------------
 
-def build_graph(agents: dict):
+def build_graph(
+    agents: dict,
+    is_async: bool = False,
+    especulacion: PoliticaEspeculacion | None = None,
+    checkpointer=None,
+):
     """
     Construye y compila el StateGraph con los agentes dados.
 
@@ -64,22 +109,39 @@ def build_graph(agents: dict):
     en globales, manteniendo los nodos testeables de forma aislada.
 
     Args:
-        agents: Diccionario retornado por `pipeline.agents_factory.build_agents()`.
+        agents:   Diccionario retornado por `pipeline.agents_factory.build_agents()`.
+        is_async: Si es True usa los nodos asíncronos (`ainvoke` sobre los agentes).
+        especulacion: Si se entrega, el extractor de CONTRATO arranca en paralelo
+                  con el clasificador según esta política.
+        checkpointer: Checkpointer de LangGraph (ver `pipeline_ai.checkpoint`).
 
     Returns:
-        CompiledGraph listo para invocar con `graph.invoke(state)`.
+        CompiledGraph listo para invocar con `graph.invoke(state)`, o con
+        `await graph.ainvoke(state)` si `is_async=True`.
     """
     builder = StateGraph(StateEstructure)
 
+    if is_async:
+        clasificador, extractor, validador = anodo_clasificador, anodo_extractor, anodo_validador
+    else:
+        clasificador, extractor, validador = nodo_clasificador, nodo_extractor, nodo_validador
+
+    if especulacion is not None:
+        especulativo = anodo_clasificador_especulativo if is_async else nodo_clasificador_especulativo
+        clasificador = partial(especulativo, politica=especulacion)
+
+    # Cada agente reporta llamadas y tokens al registro del nodo en curso.
+    agents = {nombre: AgenteMedido(agente) for nombre, agente in agents.items()}
+
     # Nodos — se inyecta `agents` vía partial para evitar globals
-    builder.add_node("clasificador", partial(nodo_clasificador, agents=agents))
-    builder.add_node("extractor",    partial(nodo_extractor,    agents=agents))
-    builder.add_node("validador",    partial(nodo_validador,    agents=agents))
+    builder.add_node("clasificador", instrumentar_nodo("clasificador", partial(clasificador, agents=agents)))
+    builder.add_node("extractor",    instrumentar_nodo("extractor",    partial(extractor,    agents=agents)))
+    builder.add_node("validador",    instrumentar_nodo("validador",    partial(validador,    agents=agents)))
 
     # Edges
-    builder.add_edge(START, "clasificador")
-    builder.add_conditional_edges("clasificador", _router_clasificador, ["extractor", END])
+    builder.add_conditional_edges(START, _router_inicio, ["clasificador", "validador"])
+    builder.add_conditional_edges("clasificador", _router_clasificador, ["extractor", "validador", END])
     builder.add_edge("extractor", "validador")
     builder.add_conditional_edges("validador", _router_validador, ["extractor", END])
 
-    return builder.compile()
\ No newline at end of file
+    return builder.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,499 @@
+"""
+Índice persistente que vincula cada contrato con sus otrosíes.
+
+El extractor de otrosíes devuelve `ident.contrato_base_id` y las `adiciones`
+(tipo, fecha_fin, valor), pero cada resultado queda suelto. `IndiceContratos`
+los une por `contrato_id` a medida que terminan y mantiene, con O(1) trabajo
+por documento nuevo, la vigencia efectiva de cada contrato:
+
+- `fecha_fin`: la más tardía entre la del contrato base y las de sus
+  otrosíes con adición en tiempo.
+- `valor`: el valor del contrato base más las adiciones en valor.
+
+Un otrosí que llega antes que su contrato base (orden del lote, reproceso
+del dead-letter) deja la fila del contrato *pendiente*: acumula sus adiciones
+y, cuando llega el contrato, la vigencia se completa sin releer nada. El
+resultado final no depende del orden de llegada.
+
+Un mismo otrosí (`contrato_id` + `otrosi_id`) registrado dos veces no se
+suma dos veces; si cambió su extracción (reproceso), se recalcula el
+agregado de ese contrato. Si el mismo archivo se re-extrae con otro
+`contrato_base_id`, sale del contrato anterior (que se recalcula) antes de
+sumarse al nuevo; si un contrato se re-extrae con otro `contrato_id`, la
+fila anterior desaparece y sus otrosíes pasan al identificador corregido.
+
+Uso:
+    indice = IndiceContratos("contratos.sqlite")
+    indice.registrar(resultado, pdf_hash)
+    indice.consultar("CW2370068")
+    indice.exportar_jsonl("vigencias.jsonl")
+
+    python -m pipeline_ai.indice_contratos contratos.sqlite --cargar resultados.jsonl --exportar vigencias.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from pipeline_ai.valores import como_fecha, como_numero, normalizar_texto, obtener
+
+logger = logging.getLogger(__name__)
+
+# Tipos de otrosí que mueven cada componente de la vigencia.
+ADICION_TIEMPO = ("ADICIÓN EN TIEMPO", "AMBAS")
+ADICION_VALOR = ("ADICIÓN EN VALOR", "AMBAS")
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9A-Z]")
+
+# Columnas de `contratos` en el orden en que se leen y exportan.
+_COLUMNAS = (
+    "contrato_id", "pdf_hash", "fecha_fin_base", "valor_base",
+    "fecha_fin_otrosies", "valor_otrosies", "num_otrosies",
+    "fecha_fin", "valor", "pendiente", "actualizado",
+)
+
+
+# ---------------------------------------------------------------------------
+# Normalización
+# ---------------------------------------------------------------------------
+
+def normalizar_id(identificador) -> str | None:
+    """
+    Clave de unión de un identificador: sin tildes, en mayúsculas y solo
+    letras y dígitos ("cw-2370068" y "CW 2370068" → "CW2370068").
+    """
+    if identificador is None:
+        return None
+    return _NO_ALFANUMERICO.sub("", normalizar_texto(str(identificador)).upper()) or None
+
+
+def _fecha(valor) -> str | None:
+    """Fecha ISO (YYYY-MM-DD) o None; en ISO el orden de texto es el cronológico."""
+    fecha = como_fecha(valor)
+    return fecha.isoformat() if fecha is not None else None
+
+
+def _mas_tardia(*fechas: str | None) -> str | None:
+    return max((f for f in fechas if f is not None), default=None)
+
+
+def _vigencia(fecha_fin_base, valor_base, fecha_fin_otrosies, valor_otrosies, pendiente: bool) -> tuple:
+    """(fecha_fin, valor) efectivos. Sin contrato base el valor total no se conoce."""
+    fecha_fin = _mas_tardia(fecha_fin_base, fecha_fin_otrosies)
+    valor = None if pendiente else (valor_base or 0.0) + valor_otrosies
+    return fecha_fin, valor
+
+
+def _adiciones(datos: dict) -> tuple[str | None, str | None, float | None]:
+    """(tipo, fecha_fin, valor) de un otrosí, con solo los componentes que su tipo adiciona."""
+    tipo = obtener(datos, "adiciones.tipo")
+    fecha_fin = _fecha(obtener(datos, "adiciones.fecha_fin"))
+    valor = como_numero(obtener(datos, "adiciones.valor"))
+    if tipo is not None:
+        fecha_fin = fecha_fin if tipo in ADICION_TIEMPO else None
+        valor = valor if tipo in ADICION_VALOR else None
+    return tipo, fecha_fin, valor
+
+
+# ---------------------------------------------------------------------------
+# Índice
+# ---------------------------------------------------------------------------
+
+class IndiceContratos:
+    """
+    Contratos y otrosíes en SQLite, con la vigencia efectiva de cada contrato
+    mantenida de forma incremental.
+
+    Uso:
+        indice = IndiceContratos("contratos.sqlite")
+        procesar_directorio(..., indice_contratos="contratos.sqlite")
+    """
+
+    def __init__(self, path: str = "contratos.sqlite"):
+        """
+        Args:
+            path: Archivo SQLite (":memory:" para un índice volátil).
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contratos (
+                contrato_id        TEXT PRIMARY KEY,
+                pdf_hash           TEXT,
+                fecha_fin_base     TEXT,
+                valor_base         REAL,
+                fecha_fin_otrosies TEXT,
+                valor_otrosies     REAL NOT NULL DEFAULT 0,
+                num_otrosies       INTEGER NOT NULL DEFAULT 0,
+                fecha_fin          TEXT,
+                valor              REAL,
+                pendiente          INTEGER NOT NULL,
+                datos              TEXT,
+                actualizado        REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS otrosies (
+                contrato_id TEXT NOT NULL,
+                otrosi_id   TEXT NOT NULL,
+                pdf_hash    TEXT,
+                tipo        TEXT,
+                fecha_fin   TEXT,
+                valor       REAL,
+                datos       TEXT NOT NULL,
+                registrado  REAL NOT NULL,
+                PRIMARY KEY (contrato_id, otrosi_id)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_contratos_pendientes ON contratos (pendiente)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_otrosies_pdf ON otrosies (pdf_hash)")
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    def registrar(self, result: dict, pdf_hash: str | None = None) -> str | None:
+        """
+        Registra un resultado del pipeline (o un registro JSONL del lote).
+
+        Returns:
+            `contrato_id` (normalizado) afectado, o None si el documento no es
+            un contrato/otrosí o no trae el identificador que lo vincula.
+        """
+        datos = result.get("extracted_data")
+        if not datos:
+            return None
+        pdf_hash = pdf_hash or result.get("sha256")
+        tipo = result.get("tipo_archivo")
+        if tipo == "CONTRATO":
+            return self.registrar_contrato(datos, pdf_hash)
+        if tipo == "OTROSI":
+            return self.registrar_otrosi(datos, pdf_hash)
+        return None
+
+    def registrar_contrato(self, datos: dict, pdf_hash: str | None = None) -> str | None:
+        """
+        Registra (o reemplaza) la extracción del contrato base.
+
+        Si el mismo archivo (`pdf_hash`) ya estaba registrado con otro
+        `contrato_id` (re-extracción que corrige el identificador), la fila
+        anterior se elimina y sus otrosíes pasan a este contrato: se habían
+        vinculado a él solo por ese identificador.
+        """
+        contrato_id = normalizar_id(datos.get("contrato_id"))
+        if contrato_id is None:
+            logger.warning("[Contratos] Contrato sin contrato_id (%s)", (pdf_hash or "")[:12])
+            return None
+
+        fecha_fin_base = _fecha(obtener(datos, "fechas.fecha_fin"))
+        valor_base = como_numero(datos.get("valor"))
+        with self._lock:
+            anteriores = [
+                anterior for (anterior,) in self._conn.execute(
+                    "SELECT contrato_id FROM contratos WHERE pdf_hash = ? AND contrato_id != ?",
+                    (pdf_hash, contrato_id),
+                )
+            ] if pdf_hash is not None else []
+            for anterior in anteriores:
+                # Un otrosí con el mismo otrosi_id en ambos contratos queda una sola vez.
+                self._conn.execute(
+                    "UPDATE OR REPLACE otrosies SET contrato_id = ? WHERE contrato_id = ?",
+                    (contrato_id, anterior),
+                )
+                self._conn.execute("DELETE FROM contratos WHERE contrato_id = ?", (anterior,))
+                logger.info("[Contratos] Contrato %s re-extraído como %s", anterior, contrato_id)
+
+            fila = self._conn.execute(
+                "SELECT fecha_fin_otrosies, valor_otrosies, num_otrosies FROM contratos WHERE contrato_id = ?",
+                (contrato_id,),
+            ).fetchone()
+            if anteriores:
+                fecha_fin_otrosies, valor_otrosies, num_otrosies = self._agregado(contrato_id)
+            else:
+                fecha_fin_otrosies, valor_otrosies, num_otrosies = fila or (None, 0.0, 0)
+            fecha_fin, valor = _vigencia(fecha_fin_base, valor_base, fecha_fin_otrosies, valor_otrosies, False)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contratos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (
+                    contrato_id, pdf_hash, fecha_fin_base, valor_base,
+                    fecha_fin_otrosies, valor_otrosies, num_otrosies,
+                    fecha_fin, valor, json.dumps(datos, ensure_ascii=False), time.time(),
+                ),
+            )
+            self._conn.commit()
+
+        if num_otrosies and (fila is not None or anteriores):
+            logger.info("[Contratos] %s vinculado con %d otrosíes previos", contrato_id, num_otrosies)
+        return contrato_id
+
+    def registrar_otrosi(self, datos: dict, pdf_hash: str | None = None) -> str | None:
+        """
+        Registra un otrosí y suma sus adiciones a su contrato base (pendiente
+        si el contrato aún no se ha registrado).
+
+        Si el mismo archivo (`pdf_hash`) ya estaba registrado como otro otrosí
+        (re-extracción con otro `contrato_base_id` u `otrosi_id`), se retira de
+        ese contrato y se recalcula su agregado antes de sumarlo al nuevo. Sin
+        `pdf_hash` no se buscan movimientos: la numeración de los otrosíes se
+        repite entre contratos ("Otrosí No. 1"), así que `otrosi_id` solo
+        identifica un otrosí dentro de su contrato.
+        """
+        contrato_id = normalizar_id(obtener(datos, "ident.contrato_base_id"))
+        if contrato_id is None:
+            logger.warning("[Contratos] Otrosí sin contrato_base_id (%s)", (pdf_hash or "")[:12])
+            return None
+
+        # Sin otrosi_id, el mismo archivo (o la misma extracción) no se cuenta dos veces.
+        serializado = json.dumps(datos, ensure_ascii=False, sort_keys=True)
+        otrosi_id = (
+            normalizar_id(obtener(datos, "ident.otrosi_id"))
+            or pdf_hash
+            or hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+        )
+        tipo, fecha_fin_otrosi, valor_otrosi = _adiciones(datos)
+
+        with self._lock:
+            previo = self._conn.execute(
+                "SELECT tipo, fecha_fin, valor FROM otrosies WHERE contrato_id = ? AND otrosi_id = ?",
+                (contrato_id, otrosi_id),
+            ).fetchone()
+            anteriores = self._conn.execute(
+                "SELECT contrato_id, otrosi_id FROM otrosies "
+                "WHERE pdf_hash = ? AND NOT (contrato_id = ? AND otrosi_id = ?)",
+                (pdf_hash, contrato_id, otrosi_id),
+            ).fetchall() if pdf_hash is not None else []
+            if previo == (tipo, fecha_fin_otrosi, valor_otrosi) and not anteriores:
+                return contrato_id
+
+            for anterior_contrato, anterior_otrosi in anteriores:
+                self._conn.execute(
+                    "DELETE FROM otrosies WHERE contrato_id = ? AND otrosi_id = ?",
+                    (anterior_contrato, anterior_otrosi),
+                )
+                if anterior_contrato != contrato_id:
+                    self._guardar_agregado(anterior_contrato, *self._agregado(anterior_contrato))
+                    logger.info(
+                        "[Contratos] Otrosí %s pasa de %s a %s", otrosi_id, anterior_contrato, contrato_id
+                    )
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO otrosies VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (contrato_id, otrosi_id, pdf_hash, tipo, fecha_fin_otrosi, valor_otrosi, serializado, time.time()),
+            )
+            fila = self._conn.execute(
+                "SELECT fecha_fin_otrosies, valor_otrosies, num_otrosies FROM contratos WHERE contrato_id = ?",
+                (contrato_id,),
+            ).fetchone()
+            if previo is None and not anteriores:
+                fecha_fin_otrosies, valor_otrosies, num_otrosies = fila or (None, 0.0, 0)
+                agregado = (
+                    _mas_tardia(fecha_fin_otrosies, fecha_fin_otrosi),
+                    valor_otrosies + (valor_otrosi or 0.0),
+                    num_otrosies + 1,
+                )
+            else:
+                # Cambió (o se movió) un otrosí ya contado: el máximo no se
+                # puede "restar", así que se recalcula solo este contrato.
+                agregado = self._agregado(contrato_id)
+            self._guardar_agregado(contrato_id, *agregado)
+            self._conn.commit()
+
+        if fila is None:
+            logger.info("[Contratos] Otrosí de %s antes que su contrato base: queda pendiente", contrato_id)
+        return contrato_id
+
+    def _agregado(self, contrato_id: str) -> tuple[str | None, float, int]:
+        """(fecha_fin más tardía, valor adicionado, cantidad) de los otrosíes de un contrato."""
+        return self._conn.execute(
+            "SELECT MAX(fecha_fin), TOTAL(valor), COUNT(*) FROM otrosies WHERE contrato_id = ?",
+            (contrato_id,),
+        ).fetchone()
+
+    def _guardar_agregado(
+        self, contrato_id: str, fecha_fin_otrosies: str | None, valor_otrosies: float, num_otrosies: int,
+    ) -> None:
+        """
+        Escribe el agregado de otrosíes de un contrato y su vigencia. Crea la
+        fila pendiente si el contrato no existe y la borra si queda pendiente
+        y sin otrosíes. Debe llamarse con el lock tomado; no hace commit.
+        """
+        fila = self._conn.execute(
+            "SELECT fecha_fin_base, valor_base, pendiente FROM contratos WHERE contrato_id = ?",
+            (contrato_id,),
+        ).fetchone()
+        fecha_fin_base, valor_base, pendiente = fila or (None, None, 1)
+        if pendiente and not num_otrosies:
+            self._conn.execute("DELETE FROM contratos WHERE contrato_id = ?", (contrato_id,))
+            return
+
+        fecha_fin, valor = _vigencia(
+            fecha_fin_base, valor_base, fecha_fin_otrosies, valor_otrosies, bool(pendiente)
+        )
+        if fila is None:
+            self._conn.execute(
+                "INSERT INTO contratos (contrato_id, fecha_fin_otrosies, valor_otrosies, num_otrosies, "
+                "fecha_fin, valor, pendiente, actualizado) VALUES (?, ?, ?, ?, ?, ?, 1, ?)",
+                (contrato_id, fecha_fin_otrosies, valor_otrosies, num_otrosies, fecha_fin, valor, time.time()),
+            )
+        else:
+            self._conn.execute(
+                "UPDATE contratos SET fecha_fin_otrosies = ?, valor_otrosies = ?, num_otrosies = ?, "
+                "fecha_fin = ?, valor = ?, actualizado = ? WHERE contrato_id = ?",
+                (fecha_fin_otrosies, valor_otrosies, num_otrosies, fecha_fin, valor, time.time(), contrato_id),
+            )
+
+    def cargar_jsonl(self, ruta: str | Path) -> int:
+        """
+        Registra los resultados válidos de un JSONL del lote (para construir el
+        índice desde corridas anteriores). Retorna cuántos se vincularon.
+        """
+        registrados = 0
+        with open(ruta, encoding="utf-8") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                registro = json.loads(linea)
+                if registro.get("error") is not None or registro.get("motivo_fallo") is not None:
+                    continue
+                registrados += self.registrar(registro) is not None
+        return registrados
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _fila(fila: tuple) -> dict:
+        vigencia = dict(zip(_COLUMNAS, fila))
+        vigencia["pendiente"] = bool(vigencia["pendiente"])
+        return vigencia
+
+    def consultar(self, contrato_id: str) -> dict | None:
+        """
+        Vigencia de un contrato:
+            {contrato_id, pdf_hash, fecha_fin_base, valor_base,
+             fecha_fin_otrosies, valor_otrosies, num_otrosies,
+             fecha_fin, valor, pendiente, actualizado}
+        `pendiente` es True si solo se han visto otrosíes (entonces `valor` es None).
+        """
+        with self._lock:
+            fila = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNAS)} FROM contratos WHERE contrato_id = ?",
+                (normalizar_id(contrato_id),),
+            ).fetchone()
+        return self._fila(fila) if fila is not None else None
+
+    def contrato(self, contrato_id: str) -> dict | None:
+        """Extracción del contrato base (None si no existe o está pendiente)."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT datos FROM contratos WHERE contrato_id = ?", (normalizar_id(contrato_id),)
+            ).fetchone()
+        return json.loads(fila[0]) if fila is not None and fila[0] is not None else None
+
+    def otrosies(self, contrato_id: str) -> list[dict]:
+        """Otrosíes registrados de un contrato, con sus adiciones y su extracción."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT otrosi_id, pdf_hash, tipo, fecha_fin, valor, datos FROM otrosies "
+                "WHERE contrato_id = ? ORDER BY registrado",
+                (normalizar_id(contrato_id),),
+            ).fetchall()
+        return [
+            {"otrosi_id": o, "pdf_hash": h, "tipo": t, "fecha_fin": f, "valor": v, "datos": json.loads(d)}
+            for o, h, t, f, v, d in filas
+        ]
+
+    def exportar(self, pendientes: bool | None = None, tanda: int = 1000) -> Iterator[dict]:
+        """
+        Vigencia de todos los contratos, en orden de `contrato_id`.
+
+        Se lee por tandas (paginando por clave), sin retener el lock entre
+        tandas ni cargar el índice completo en memoria.
+
+        Args:
+            pendientes: None = todos; True/False = solo pendientes / solo con contrato base.
+        """
+        filtro = "" if pendientes is None else f" AND pendiente = {int(pendientes)}"
+        ultimo = ""
+        while True:
+            with self._lock:
+                filas = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNAS)} FROM contratos "
+                    f"WHERE contrato_id > ?{filtro} ORDER BY contrato_id LIMIT ?",
+                    (ultimo, tanda),
+                ).fetchall()
+            if not filas:
+                return
+            for fila in filas:
+                yield self._fila(fila)
+            ultimo = filas[-1][0]
+
+    def exportar_jsonl(self, ruta: str | Path, pendientes: bool | None = None) -> int:
+        """Escribe `exportar()` a un JSONL. Retorna cuántos contratos escribió."""
+        total = 0
+        with open(ruta, "w", encoding="utf-8") as f:
+            for vigencia in self.exportar(pendientes):
+                f.write(json.dumps(vigencia, ensure_ascii=False) + "\n")
+                total += 1
+        return total
+
+    def stats(self) -> dict:
+        with self._lock:
+            contratos, pendientes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pendiente), 0) FROM contratos"
+            ).fetchone()
+            otrosies = self._conn.execute("SELECT COUNT(*) FROM otrosies").fetchone()[0]
+        return {"contratos": contratos, "pendientes": pendientes, "otrosies": otrosies}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Índice de contratos y otrosíes con su vigencia efectiva.")
+    parser.add_argument("indice", help="Archivo SQLite del índice.")
+    parser.add_argument("--cargar", action="append", default=[],
+                        help="JSONL de resultados del lote a registrar (se puede repetir).")
+    parser.add_argument("--exportar", default=None, help="JSONL donde escribir la vigencia de cada contrato.")
+    parser.add_argument("--solo-pendientes", action="store_true",
+                        help="Exporta solo los contratos de los que aún no se ha visto el contrato base.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(levelname)s - %(name)s: %(message)s")
+
+    indice = IndiceContratos(args.indice)
+    try:
+        for ruta in args.cargar:
+            logger.info("[Contratos] %d documentos registrados desde %s", indice.cargar_jsonl(ruta), ruta)
+        if args.exportar:
+            total = indice.exportar_jsonl(args.exportar, pendientes=True if args.solo_pendientes else None)
+            logger.info("[Contratos] %d contratos exportados a %s", total, args.exportar)
+        logger.info("[Contratos] %s", indice.stats())
+    finally:
+        indice.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Instrumentación de los nodos del grafo.
+
+`build_graph` envuelve cada nodo con `instrumentar_nodo` y cada agente con
+`AgenteMedido`. Por cada ejecución de nodo se agrega un registro al canal
+`metricas_nodos` del state:
+
+    {"nodo", "duracion_s", "llamadas_llm", "tokens_entrada", "tokens_salida",
+     "payload_bytes", "intento"}
+
+Los tokens salen de `usage_metadata` de las respuestas de Gemini (antes se
+descartaban). El agente medido los suma al registro del nodo en curso vía
+`contextvars`, así que también cuentan las llamadas hechas desde hilos o
+tareas lanzadas por el nodo (p. ej. la extracción especulativa).
+
+`ContractPipeline` adjunta al resultado un resumen por documento
+(`resumen_documento`) y lo acumula en `METRICAS`, que exporta p50/p95/p99 por
+nodo, distribución de intentos y tokens por documento en formato Prometheus
+(`METRICAS.prometheus()`) y JSON (`METRICAS.to_json()`), junto con los
+contadores del clasificador local (`clasificador_local.CONTADORES`).
+"""
+
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from collections import Counter, deque
+
+from pipeline_ai.clasificador_local import CONTADORES
+
+# Registro del nodo que se está ejecutando (lo completa `AgenteMedido`).
+_NODO_ACTUAL: contextvars.ContextVar[dict | None] = contextvars.ContextVar("nodo_actual", default=None)
+_LOCK_REGISTRO = threading.Lock()
+
+
+def bytes_payload(messages: list) -> int:
+    """Bytes aproximados que se envían al modelo para un historial de mensajes."""
+    total = 0
+    for msg in messages:
+        content = msg["content"] if isinstance(msg, dict) else getattr(msg, "content", "")
+        if isinstance(content, str):
+            total += len(content.encode("utf-8"))
+            continue
+        for block in content:
+            if block.get("type") == "text":
+                total += len(block["text"].encode("utf-8"))
+            elif block.get("type") == "file":
+                total += len(block["base64"])
+    return total
+
+
+def uso_tokens(respuesta) -> tuple[int, int]:
+    """(tokens de entrada, tokens de salida) según `usage_metadata` de la respuesta de un agente."""
+    entrada = salida = 0
+    if isinstance(respuesta, dict):
+        for mensaje in respuesta.get("messages", []):
+            uso = getattr(mensaje, "usage_metadata", None)
+            if uso:
+                entrada += uso.get("input_tokens", 0)
+                salida += uso.get("output_tokens", 0)
+    return entrada, salida
+
+
+# ---------------------------------------------------------------------------
+# Envolturas
+# ---------------------------------------------------------------------------
+
+class AgenteMedido:
+    """Envoltura de un agente que suma llamadas, tokens y bytes al registro del nodo en curso."""
+
+    def __init__(self, agente):
+        self.agente = agente
+
+    def invoke(self, entrada: dict, *args, **kwargs):
+        respuesta = self.agente.invoke(entrada, *args, **kwargs)
+        self._anotar(entrada, respuesta)
+        return respuesta
+
+    async def ainvoke(self, entrada: dict, *args, **kwargs):
+        respuesta = await self.agente.ainvoke(entrada, *args, **kwargs)
+        self._anotar(entrada, respuesta)
+        return respuesta
+
+    @staticmethod
+    def _anotar(entrada: dict, respuesta) -> None:
+        registro = _NODO_ACTUAL.get()
+        if registro is None:
+            return
+        tokens_entrada, tokens_salida = uso_tokens(respuesta)
+        payload = bytes_payload(entrada.get("messages", []))
+        with _LOCK_REGISTRO:
+            registro["llamadas_llm"] += 1
+            registro["tokens_entrada"] += tokens_entrada
+            registro["tokens_salida"] += tokens_salida
+            registro["payload_bytes"] += payload
+
+    def __getattr__(self, nombre):
+        return getattr(self.agente, nombre)
+
+
+def _nuevo_registro(nombre: str) -> dict:
+    return {
+        "nodo": nombre,
+        "duracion_s": 0.0,
+        "llamadas_llm": 0,
+        "tokens_entrada": 0,
+        "tokens_salida": 0,
+        "payload_bytes": 0,
+        "intento": 0,
+    }
+
+
+def _cerrar_registro(registro: dict, inicio: float, state: dict, update: dict) -> dict:
+    registro["duracion_s"] = round(time.perf_counter() - inicio, 4)
+    registro["intento"] = update.get("attempts", state.get("attempts", 0))
+    # `metricas_nodos` es un canal de solo-agregado: basta con el registro nuevo.
+    return {**update, "metricas_nodos": [registro]}
+
+
+def instrumentar_nodo(nombre: str, nodo):
+    """Envuelve un nodo (sync o async) para medirlo y agregar su registro al state."""
+    if inspect.iscoroutinefunction(nodo):
+        @functools.wraps(nodo)
+        async def _medido(state: dict) -> dict:
+            registro = _nuevo_registro(nombre)
+            token = _NODO_ACTUAL.set(registro)
+            inicio = time.perf_counter()
+            try:
+                update = await nodo(state)
+            finally:
+                _NODO_ACTUAL.reset(token)
+            return _cerrar_registro(registro, inicio, state, update)
+        return _medido
+
+    @functools.wraps(nodo)
+    def _medido(state: dict) -> dict:
+        registro = _nuevo_registro(nombre)
+        token = _NODO_ACTUAL.set(registro)
+        inicio = time.perf_counter()
+        try:
+            update = nodo(state)
+        finally:
+            _NODO_ACTUAL.reset(token)
+        return _cerrar_registro(registro, inicio, state, update)
+    return _medido
+
+
+# ---------------------------------------------------------------------------
+# Resumen por documento
+# ---------------------------------------------------------------------------
+
+def resumen_documento(state: dict) -> dict:
+    """
+    Resumen de métricas de un documento a partir de `metricas_nodos`.
+    La ruta de cada nodo es el siguiente nodo ejecutado (o END).
+    """
+    registros = state.get("metricas_nodos") or []
+    nodos = [
+        {**r, "ruta": registros[i + 1]["nodo"] if i + 1 < len(registros) else "END"}
+        for i, r in enumerate(registros)
+    ]
+    return {
+        "duracion_s": round(sum(r["duracion_s"] for r in registros), 4),
+        "llamadas_llm": sum(r["llamadas_llm"] for r in registros),
+        "tokens_entrada": sum(r["tokens_entrada"] for r in registros),
+        "tokens_salida": sum(r["tokens_salida"] for r in registros),
+        "payload_bytes": sum(r["payload_bytes"] for r in registros),
+        "intentos": state.get("attempts", 0),
+        "nodos": nodos,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Agregado del proceso
+# ---------------------------------------------------------------------------
+
+_CUANTILES = (0.5, 0.95, 0.99)
+
+
+def _cuantil(ordenadas: list[float], q: float) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+
+class _Serie:
+    """Muestras recientes (ventana acotada) más suma y conteo totales."""
+
+    def __init__(self, ventana: int):
+        self.muestras: deque[float] = deque(maxlen=ventana)
+        self.suma = 0.0
+        self.conteo = 0
+
+    def agregar(self, valor: float) -> None:
+        self.muestras.append(valor)
+        self.suma += valor
+        self.conteo += 1
+
+    def resumen(self) -> dict:
+        ordenadas = sorted(self.muestras)
+        return {
+            **{f"p{int(q * 100)}": round(_cuantil(ordenadas, q), 4) for q in _CUANTILES},
+            "suma": round(self.suma, 4),
+            "conteo": self.conteo,
+        }
+
+
+class AgregadorMetricas:
+    """
+    Histogramas del proceso: latencia y tokens por nodo, intentos y tokens
+    por documento. Los cuantiles se calculan sobre las últimas `ventana`
+    muestras de cada serie.
+    """
+
+    def __init__(self, ventana: int = 10_000):
+        self._ventana = ventana
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latencia_nodo: dict[str, _Serie] = {}
+            self._tokens_nodo: dict[str, _Serie] = {}
+            self._rutas: Counter = Counter()
+            self._intentos: Counter = Counter()
+            self._tokens_documento = _Serie(self._ventana)
+            self._duracion_documento = _Serie(self._ventana)
+            self._documentos = 0
+
+    def registrar_documento(self, resumen: dict) -> None:
+        with self._lock:
+            self._documentos += 1
+            self._intentos[resumen["intentos"]] += 1
+            self._tokens_documento.agregar(resumen["tokens_entrada"] + resumen["tokens_salida"])
+            self._duracion_documento.agregar(resumen["duracion_s"])
+            for nodo in resumen["nodos"]:
+                nombre = nodo["nodo"]
+                self._latencia_nodo.setdefault(nombre, _Serie(self._ventana)).agregar(nodo["duracion_s"])
+                self._tokens_nodo.setdefault(nombre, _Serie(self._ventana)).agregar(
+                    nodo["tokens_entrada"] + nodo["tokens_salida"]
+                )
+                self._rutas[(nombre, nodo["ruta"])] += 1
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "documentos": self._documentos,
+                "latencia_nodo_s": {n: s.resumen() for n, s in self._latencia_nodo.items()},
+                "tokens_nodo": {n: s.resumen() for n, s in self._tokens_nodo.items()},
+                "rutas": {f"{origen}->{destino}": c for (origen, destino), c in self._rutas.items()},
+                "intentos": {str(k): v for k, v in sorted(self._intentos.items())},
+                "tokens_documento": self._tokens_documento.resumen(),
+                "duracion_documento_s": self._duracion_documento.resumen(),
+                "clasificador": CONTADORES.snapshot(),
+            }
+
+    def prometheus(self, prefijo: str = "pipeline_ai") -> str:
+        """Exposición en formato de texto de Prometheus (summaries y counters)."""
+        datos = self.to_json()
+        lineas: list[str] = []
+
+        def _summary(nombre: str, ayuda: str, series: dict[str, dict], etiqueta: str | None) -> None:
+            lineas.append(f"# HELP {prefijo}_{nombre} {ayuda}")
+            lineas.append(f"# TYPE {prefijo}_{nombre} summary")
+            for valor_etiqueta, resumen in series.items():
+                base = f'{etiqueta}="{valor_etiqueta}",' if etiqueta else ""
+                for q in _CUANTILES:
+                    lineas.append(
+                        f'{prefijo}_{nombre}{{{base}quantile="{q}"}} {resumen[f"p{int(q * 100)}"]}'
+                    )
+                sufijo = f"{{{base.rstrip(',')}}}" if base else ""
+                lineas.append(f"{prefijo}_{nombre}_sum{sufijo} {resumen['suma']}")
+                lineas.append(f"{prefijo}_{nombre}_count{sufijo} {resumen['conteo']}")
+
+        _summary("nodo_duracion_segundos", "Latencia por nodo.", datos["latencia_nodo_s"], "nodo")
+        _summary("nodo_tokens", "Tokens (entrada + salida) por ejecución de nodo.", datos["tokens_nodo"], "nodo")
+        _summary("documento_tokens", "Tokens por documento.", {"": datos["tokens_documento"]}, None)
+        _summary("documento_duracion_segundos", "Duración por documento.",
+                 {"": datos["duracion_documento_s"]}, None)
+
+        lineas.append(f"# HELP {prefijo}_documento_intentos_total Documentos por cantidad de intentos.")
+        lineas.append(f"# TYPE {prefijo}_documento_intentos_total counter")
+        for intentos, conteo in datos["intentos"].items():
+            lineas.append(f'{prefijo}_documento_intentos_total{{intentos="{intentos}"}} {conteo}')
+
+        lineas.append(f"# HELP {prefijo}_ruta_total Decisiones de ruteo después de cada nodo.")
+        lineas.append(f"# TYPE {prefijo}_ruta_total counter")
+        for ruta, conteo in datos["rutas"].items():
+            origen, destino = ruta.split("->")
+            lineas.append(f'{prefijo}_ruta_total{{origen="{origen}",destino="{destino}"}} {conteo}')
+
+        clasificador = datos["clasificador"]
+        lineas.append(f"# HELP {prefijo}_clasificacion_total Clasificaciones por origen (local evita la llamada al LLM).")
+        lineas.append(f"# TYPE {prefijo}_clasificacion_total counter")
+        lineas.append(f'{prefijo}_clasificacion_total{{origen="local"}} {clasificador["llamadas_evitadas"]}')
+        lineas.append(f'{prefijo}_clasificacion_total{{origen="llm"}} {clasificador["llamadas_llm"]}')
+
+        return "\n".join(lineas) + "\n"
+
+
+# Agregado del proceso (compartido por todos los motores).
+METRICAS = AgregadorMetricas()
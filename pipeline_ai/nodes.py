@@ -3,12 +3,27 @@ Nodos del grafo LangGraph.
 
 Cada función recibe el state y retorna únicamente los campos que modifica,
 siguiendo la convención de LangGraph (retorno parcial del estado).
+
+Los nodos con prefijo `a` son las variantes asíncronas (`ainvoke`) que usa el
+grafo compilado con `build_graph(agents, is_async=True)`.
 """
 
+import asyncio
+import contextvars
 import json
 import logging
-
-from utils.pdf_utils import extraer_paginas
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline_ai.clasificador_local import CONTADORES, clasificar_localmente
+from pipeline_ai.entrada import construir_contenido
+from pipeline_ai.metrics import bytes_payload
+from pipeline_ai.plazos import cierre_ronda, inicio_ronda
+from pipeline_ai.prompts_registro import textos_del_state
+from pipeline_ai import ventanas
+from pipeline_ai.especulacion import PoliticaEspeculacion
+from pipeline_ai.reglas import validar_reglas
+from pipeline_ai.seleccion_paginas import seleccionar_paginas
+from utils.pdf_utils import PdfDocument
 
 logger = logging.getLogger(__name__)
 
@@ -21,21 +36,41 @@ _EXTRACTOR_OTROSI_PRIMER_TURNO = (
     "EPS Sura es siempre la entidad contratante"
 )
 
+# Las reglas de `pipeline_ai.reglas` ya cubren estas verificaciones antes del LLM.
+_NOTA_REGLAS = (
+    "Las fechas, el plazo, el NIT del contratista (que NUNCA sea EPS SURA / "
+    "EPS SURAMERICANA con NIT 800088702-2, ya que este es el contratante), el "
+    "dígito de verificación y los valores permitidos ya fueron verificados "
+    "automáticamente; concéntrate en la coherencia del contenido con el contexto.\n"
+)
+
 
 # ---------------------------------------------------------------------------
 # Nodo 1 — Clasificador
 # ---------------------------------------------------------------------------
 
-def nodo_clasificador(state: dict, agents: dict) -> dict:
+def _primeras_paginas_base64(pdf: PdfDocument | str, num_paginas: int = 3) -> str:
+    """Recorta las primeras páginas y las codifica para el mensaje."""
+    return PdfDocument.coerce(pdf).primeras_paginas(num_paginas).to_base64()
+
+
+def _contenido_clasificador(state: dict) -> tuple[list[dict], dict | None]:
     """
-    Clasifica el documento como CONTRATO, OTROSI u OTRO.
-    Solo envía las primeras 3 páginas para ahorrar tokens.
+    Contenido de las primeras 3 páginas según `modo_entrada`.
+    Retorna (bloques, reporte de entrada o None en modo "archivo").
     """
-    logger.info("🔵 [Clasificador] Nodo ejecutado")
+    modo = state.get("modo_entrada") or "archivo"
+    if modo == "archivo":
+        pdf_corto = state.get("pdf_corto") or _primeras_paginas_base64(state["pdf"])
+        return [{"type": "file", "base64": pdf_corto, "mime_type": "application/pdf"}], None
+
+    doc = PdfDocument.coerce(state["pdf"])
+    return construir_contenido(doc, modo, indices=list(range(min(3, len(doc)))))
 
-    pdf_corto = extraer_paginas(state["pdf"], num_paginas=3)
 
-    mensaje = {
+def _mensaje_clasificador(contenido: list[dict]) -> dict:
+    """Mensaje de usuario para el clasificador con las páginas recortadas."""
+    return {
         "messages": [
             {
                 "role": "user",
@@ -48,29 +83,214 @@ def nodo_clasificador(state: dict, agents: dict) -> dict:
                             "confianza confirmas que lo es o no."
                         ),
                     },
-                    {"type": "file", "base64": pdf_corto, "mime_type": "application/pdf"},
+                    *contenido,
                 ],
             }
         ]
     }
 
-    response = agents["clasificador"].invoke(mensaje)
+
+def _resultado_clasificador(state: dict, response: dict, entrada: dict | None) -> dict:
+    """Extrae el tipo detectado de la respuesta del agente clasificador."""
     structured = response.get("structured_response", {})
     tipo = structured.get("tipo_arch")
+    CONTADORES.registrar("llm")
 
     logger.info("🔵 [Clasificador] Tipo detectado: %s", tipo)
-    return {"tipo_archivo": tipo}
+    update = {"tipo_archivo": tipo, "clasificacion": {**structured, "origen": "llm"}}
+    if entrada is not None:
+        update["entrada"] = {**(state.get("entrada") or {}), "clasificador": entrada}
+    return update
+
+
+def _clasificacion_local(state: dict) -> dict | None:
+    """
+    Intenta clasificar con la capa de texto. Retorna la actualización del
+    state si la confianza alcanza `umbral_clasificador_local`, o None.
+    """
+    umbral = state.get("umbral_clasificador_local")
+    if umbral is None:
+        return None
+
+    textos = PdfDocument.coerce(state["pdf"]).texto_primeras_paginas(2)
+    local = clasificar_localmente(textos)
+    if local["tipo_arch"] is None or local["confianza"] < umbral:
+        logger.info("🔵 [Clasificador] Local insuficiente (%s) → LLM", local)
+        return None
+
+    CONTADORES.registrar("local")
+    logger.info("🔵 [Clasificador] Tipo detectado localmente: %s", local)
+    return {"tipo_archivo": local["tipo_arch"], "clasificacion": {**local, "origen": "local"}}
+
+
+def nodo_clasificador(state: dict, agents: dict) -> dict:
+    """
+    Clasifica el documento como CONTRATO, OTROSI u OTRO.
+    Primero intenta con el clasificador local (si hay umbral configurado);
+    si no alcanza, solo envía las primeras 3 páginas para ahorrar tokens
+    (como texto cuando `modo_entrada="auto"` y la capa de texto es buena).
+    """
+    logger.info("🔵 [Clasificador] Nodo ejecutado")
+
+    local = _clasificacion_local(state)
+    if local is not None:
+        return local
+
+    return _clasificar_llm(state, agents)
+
+
+async def anodo_clasificador(state: dict, agents: dict) -> dict:
+    """Versión asíncrona de `nodo_clasificador` (usa `ainvoke`)."""
+    logger.info("🔵 [Clasificador] Nodo ejecutado")
+
+    # La extracción de texto y el recorte con PyMuPDF son CPU: se sacan del event loop.
+    local = await asyncio.to_thread(_clasificacion_local, state)
+    if local is not None:
+        return local
+
+    return await _aclasificar_llm(state, agents)
+
+
+def _clasificar_llm(state: dict, agents: dict) -> dict:
+    contenido, entrada = _contenido_clasificador(state)
+    response = agents["clasificador"].invoke(_mensaje_clasificador(contenido))
+    return _resultado_clasificador(state, response, entrada)
+
+
+async def _aclasificar_llm(state: dict, agents: dict) -> dict:
+    contenido, entrada = await asyncio.to_thread(_contenido_clasificador, state)
+    response = await agents["clasificador"].ainvoke(_mensaje_clasificador(contenido))
+    return _resultado_clasificador(state, response, entrada)
+
+
+# ---------------------------------------------------------------------------
+# Nodo 1 (especulativo) — Clasificador + extractor de CONTRATO en paralelo
+# ---------------------------------------------------------------------------
+
+def _estado_especulativo(state: dict) -> dict:
+    """Copia del state para extraer como CONTRATO como si fuera el primer turno."""
+    return {**state, "tipo_archivo": "CONTRATO", "hist_msg_extration": []}
+
+
+def _resolver_especulacion(
+    clasificacion: dict,
+    extraccion: dict | None,
+    politica: PoliticaEspeculacion,
+) -> dict:
+    """
+    Combina clasificación y extracción especulativa, y registra el acierto.
+    La extracción ya trae su turno de historial como delta del canal.
+    """
+    acierto = clasificacion.get("tipo_archivo") == "CONTRATO" and extraccion is not None
+    politica.registrar(acierto)
+
+    if not acierto:
+        logger.info("🔵 [Especulación] Descartada — tipo: %s", clasificacion.get("tipo_archivo"))
+        return {**clasificacion, "especulacion": {"lanzada": True, "acierto": False}}
+
+    logger.info("🔵 [Especulación] Acierto — se reutiliza la extracción")
+    return {
+        **clasificacion,
+        **extraccion,
+        "entrada": {**(clasificacion.get("entrada") or {}), **(extraccion.get("entrada") or {})},
+        "especulacion": {"lanzada": True, "acierto": True},
+    }
+
+
+def nodo_clasificador_especulativo(
+    state: dict,
+    agents: dict,
+    politica: PoliticaEspeculacion,
+) -> dict:
+    """
+    Clasifica y, si la política lo indica, extrae como CONTRATO en paralelo.
+    En modo sync una extracción que ya empezó no puede cancelarse: si no era
+    CONTRATO se descarta sin esperarla (termina sola en su hilo, y su llamada
+    al modelo igual consume cuota; la versión async sí la cancela).
+    """
+    logger.info("🔵 [Clasificador] Nodo ejecutado (especulativo)")
+
+    local = _clasificacion_local(state)
+    if local is not None:
+        return {**local, "especulacion": {"lanzada": False, "acierto": None}}
+
+    if not politica.debe_especular():
+        return {**_clasificar_llm(state, agents), "especulacion": {"lanzada": False, "acierto": None}}
+
+    estado_spec = _estado_especulativo(state)
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        # Se copia el contexto para que las métricas del hilo cuenten en este nodo.
+        futuro = pool.submit(contextvars.copy_context().run, nodo_extractor, estado_spec, agents)
+        clasificacion = _clasificar_llm(state, agents)
+        if clasificacion.get("tipo_archivo") != "CONTRATO":
+            futuro.cancel()
+            extraccion = None
+        else:
+            extraccion = futuro.result()
+    finally:
+        # `with` haría shutdown(wait=True) y esperaría la extracción descartada.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return _resolver_especulacion(clasificacion, extraccion, politica)
+
+
+async def anodo_clasificador_especulativo(
+    state: dict,
+    agents: dict,
+    politica: PoliticaEspeculacion,
+) -> dict:
+    """Versión asíncrona: si el documento no es CONTRATO, la extracción se cancela."""
+    logger.info("🔵 [Clasificador] Nodo ejecutado (especulativo)")
+
+    local = await asyncio.to_thread(_clasificacion_local, state)
+    if local is not None:
+        return {**local, "especulacion": {"lanzada": False, "acierto": None}}
+
+    if not politica.debe_especular():
+        clasificacion = await _aclasificar_llm(state, agents)
+        return {**clasificacion, "especulacion": {"lanzada": False, "acierto": None}}
+
+    estado_spec = _estado_especulativo(state)
+    tarea = asyncio.create_task(anodo_extractor(estado_spec, agents))
+    try:
+        clasificacion = await _aclasificar_llm(state, agents)
+    except BaseException:
+        tarea.cancel()
+        raise
+
+    if clasificacion.get("tipo_archivo") != "CONTRATO":
+        tarea.cancel()
+        # `wait` no propaga el resultado: si la extracción ya había fallado,
+        # su error no debe tumbar un documento que sigue la ruta normal.
+        await asyncio.wait([tarea])
+        if not tarea.cancelled() and tarea.exception() is not None:
+            logger.warning("🔵 [Especulación] La extracción descartada falló: %r", tarea.exception())
+        extraccion = None
+    else:
+        extraccion = await tarea
+
+    return _resolver_especulacion(clasificacion, extraccion, politica)
 
 
 # ---------------------------------------------------------------------------
 # Nodo 2 — Extractor
 # ---------------------------------------------------------------------------
 
-def nodo_extractor(state: dict, agents: dict) -> dict:
+def _texto_primer_turno(state: dict) -> str:
+    """Prompt y contexto de la primera pasada del extractor según el tipo."""
+    textos = textos_del_state(state)
+    if state["tipo_archivo"] == "CONTRATO":
+        # FIX: se usaba state["input_data"] que no existe en el State.
+        # El contexto correcto viene de context_cont (prompt base).
+        return textos.prompt_cont + textos.context_cont
+    return _EXTRACTOR_OTROSI_PRIMER_TURNO + textos.context_cont
+
+
+def _preparar_extractor(state: dict, agents: dict):
     """
-    Extrae la información del PDF.
-    - Primera pasada: extracción inicial.
-    - Pasadas siguientes: corrección según feedback del validador.
+    Selecciona el agente y arma el turno de usuario.
+    Retorna (agente, mensaje de usuario, actualizaciones extra del state).
     """
     tipo_archivo = state["tipo_archivo"]
     es_contrato = tipo_archivo == "CONTRATO"
@@ -86,12 +306,7 @@ def nodo_extractor(state: dict, agents: dict) -> dict:
     # ── Construcción del texto de usuario ──────────────────────────────────
     if state.get("validation") is None:
         # Primera pasada: incluir contexto
-        if es_contrato:
-            # FIX: se usaba state["input_data"] que no existe en el State.
-            # El contexto correcto viene de context_cont (prompt base).
-            user_text = state["prompt_cont"] + state["context_cont"]
-        else:
-            user_text = _EXTRACTOR_OTROSI_PRIMER_TURNO + state["context_cont"]
+        user_text = _texto_primer_turno(state)
     else:
         # Pasadas de corrección: incluir feedback del validador
         fb = state["validation"].get("feedback", "")
@@ -100,55 +315,242 @@ def nodo_extractor(state: dict, agents: dict) -> dict:
             f"este feedback:\n{fb}\n"
         )
 
-    # ── Historial de mensajes (se muta in-place, LangGraph lo propaga) ────
-    hist = state["hist_msg_extration"]
-    hist["messages"].append(
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_text},
-                {"type": "file", "base64": state["pdf"], "mime_type": "application/pdf"},
-            ],
-        }
-    )
+    # ── Turno de usuario ───────────────────────────────────────────────────
+    # El documento se envía solo en el primer turno: el historial ya lo
+    # contiene, así que las correcciones llevan únicamente el feedback.
+    content = [{"type": "text", "text": user_text}]
+    extra = {}
+    if not state["hist_msg_extration"]:
+        doc = PdfDocument.coerce(state["pdf"])
+        if state.get("presupuesto_paginas"):
+            doc, extra["seleccion_paginas"] = seleccionar_paginas(
+                doc, tipo_archivo, state["presupuesto_paginas"]
+            )
+        bloques, entrada = construir_contenido(doc, state.get("modo_entrada") or "archivo")
+        content.extend(bloques)
+        extra["entrada"] = {**(state.get("entrada") or {}), "extractor": entrada}
+
+    return agente, {"role": "user", "content": content}, extra
+
 
-    response = agente.invoke(hist)
+def _mensajes(state: dict, canal: str, user_msg: dict) -> dict:
+    """Entrada del agente: historial acumulado más el turno nuevo (sin mutar el state)."""
+    return {"messages": [*state[canal], user_msg]}
+
+
+def _resultado_extractor(state: dict, user_msg: dict, response: dict, extra: dict) -> dict:
+    """Arma la actualización del state; el historial recibe solo el turno nuevo."""
     structured = response.get("structured_response", {})
 
-    hist["messages"].append(
-        {"role": "assistant", "content": json.dumps(structured)}
-    )
+    # Tamaño del request de este turno (todo el historial hasta el mensaje de usuario).
+    payload = bytes_payload([*state["hist_msg_extration"], user_msg])
 
     logger.info("🟢 [Extractor] Resultado: %s", structured)
+    logger.info("🟢 [Extractor] Payload del turno: %d bytes", payload)
 
     return {
+        **extra,
         "extracted_data": structured,
         "attempts": state.get("attempts", 0) + 1,
+        "payload_extractor": [payload],
+        "hist_msg_extration": [
+            user_msg,
+            {"role": "assistant", "content": json.dumps(structured)},
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Nodo 2 (documento largo) — Extracción por ventanas
+# ---------------------------------------------------------------------------
+
+def _plan_ventanas(state: dict) -> tuple[PdfDocument, dict, list[list[int]]] | None:
+    """
+    (documento, configuración, ventanas) si corresponde extraer por ventanas:
+    modo `documento_largo` activo, primera pasada y documento sobre el umbral.
+    """
+    config = ventanas.configuracion(state.get("documento_largo"))
+    if config is None or state["hist_msg_extration"]:
+        return None
+    doc = PdfDocument.coerce(state["pdf"])
+    if len(doc) <= config["umbral_paginas"]:
+        return None
+    return doc, config, ventanas.ventanas_paginas(len(doc), config["paginas_ventana"], config["solapamiento"])
+
+
+def _mensaje_ventana(state: dict, doc: PdfDocument, indices: list[int]) -> tuple[dict, dict]:
+    """Turno de usuario de una ventana y su reporte de entrada."""
+    texto = _texto_primer_turno(state) + ventanas.instruccion_ventana(indices, len(doc))
+    bloques, entrada = construir_contenido(doc, state.get("modo_entrada") or "archivo", indices)
+    return {"role": "user", "content": [{"type": "text", "text": texto}, *bloques]}, entrada
+
+
+def _extraer_ventana(state: dict, agente, doc: PdfDocument, indices: list[int]) -> tuple[dict, int, dict]:
+    """Extrae una ventana. Retorna (respuesta, bytes enviados, reporte de entrada)."""
+    mensaje, entrada = _mensaje_ventana(state, doc, indices)
+    return agente.invoke({"messages": [mensaje]}), bytes_payload([mensaje]), entrada
+
+
+async def _aextraer_ventana(state: dict, agente, doc: PdfDocument, indices: list[int]) -> tuple[dict, int, dict]:
+    mensaje, entrada = await asyncio.to_thread(_mensaje_ventana, state, doc, indices)
+    return await agente.ainvoke({"messages": [mensaje]}), bytes_payload([mensaje]), entrada
+
+
+def _entrada_ventanas(entradas: list[dict]) -> dict:
+    """Reporte de entrada del extractor sumando todas las ventanas."""
+    return {
+        "modo": entradas[0]["modo"],
+        "paginas_texto": sorted({p for e in entradas for p in e["paginas_texto"]}),
+        "paginas_archivo": sorted({p for e in entradas for p in e["paginas_archivo"]}),
+        "bytes_texto": sum(e["bytes_texto"] for e in entradas),
+        "bytes_archivo": sum(e["bytes_archivo"] for e in entradas),
+    }
+
+
+def _paginas_fuente(lista: list[list[int]], fuentes: dict[str, int]) -> list[int]:
+    """Páginas (base 0) de las ventanas de las que salió algún campo combinado."""
+    usadas = set(fuentes.values()) or {1}
+    return sorted({p for ventana in usadas for p in lista[ventana - 1]})
+
+
+def _resultado_ventanas(state: dict, doc: PdfDocument, lista: list[list[int]], resultados: list[tuple]) -> dict:
+    """
+    Combina las ventanas y arma la actualización del state.
+
+    El historial recibe un turno equivalente al de la extracción normal: el
+    prompt con las páginas de las ventanas de las que salió cada campo
+    combinado y la extracción combinada como respuesta. Así una corrección
+    del validador se hace sobre las mismas páginas que respaldan los valores.
+    """
+    candidatos = [r.get("structured_response", {}) for r, _, _ in resultados]
+    combinado, fuentes = ventanas.combinar(state["tipo_archivo"], candidatos)
+    logger.info("🟢 [Extractor] Resultado combinado de %d ventanas: %s", len(lista), combinado)
+
+    paginas = _paginas_fuente(lista, fuentes)
+    bloques, _ = construir_contenido(doc, state.get("modo_entrada") or "archivo", paginas)
+    texto = (
+        _texto_primer_turno(state)
+        + f"\nEl documento tiene {len(doc)} páginas y se extrajo por partes; se adjuntan "
+        + "las páginas de las que sale la extracción.\n"
+    )
+    return {
+        "extracted_data": combinado,
+        "attempts": state.get("attempts", 0) + 1,
+        "payload_extractor": [sum(payload for _, payload, _ in resultados)],
+        "hist_msg_extration": [
+            {"role": "user", "content": [{"type": "text", "text": texto}, *bloques]},
+            {"role": "assistant", "content": json.dumps(combinado)},
+        ],
+        "entrada": {**(state.get("entrada") or {}), "extractor": _entrada_ventanas([e for _, _, e in resultados])},
+        "extraccion_ventanas": {
+            "paginas_totales": len(doc),
+            "ventanas": [[v[0] + 1, v[-1] + 1] for v in lista],
+            "fuentes": fuentes,
+        },
     }
 
 
+def _agente_ventana(state: dict, agents: dict):
+    return agents["extractor_ventana"] if state["tipo_archivo"] == "CONTRATO" else agents["extractor_otrosi_ventana"]
+
+
+def _extraer_por_ventanas(state: dict, agents: dict, plan: tuple) -> dict:
+    doc, config, lista = plan
+    logger.info("🟢 [Extractor] Documento largo — %d páginas en %d ventanas", len(doc), len(lista))
+    agente = _agente_ventana(state, agents)
+    with ThreadPoolExecutor(max_workers=config["concurrencia"]) as pool:
+        # Se copia el contexto para que las métricas de cada hilo cuenten en este nodo.
+        futuros = [
+            pool.submit(contextvars.copy_context().run, _extraer_ventana, state, agente, doc, indices)
+            for indices in lista
+        ]
+        resultados = [f.result() for f in futuros]
+    return _resultado_ventanas(state, doc, lista, resultados)
+
+
+async def _aextraer_por_ventanas(state: dict, agents: dict, plan: tuple) -> dict:
+    doc, config, lista = plan
+    logger.info("🟢 [Extractor] Documento largo — %d páginas en %d ventanas", len(doc), len(lista))
+    agente = _agente_ventana(state, agents)
+    semaforo = asyncio.Semaphore(config["concurrencia"])
+
+    async def _una(indices: list[int]) -> tuple:
+        async with semaforo:
+            return await _aextraer_ventana(state, agente, doc, indices)
+
+    resultados = await asyncio.gather(*(_una(indices) for indices in lista))
+    return await asyncio.to_thread(_resultado_ventanas, state, doc, lista, resultados)
+
+
+# ---------------------------------------------------------------------------
+# Nodo 2 — Extractor (ejecución)
+# ---------------------------------------------------------------------------
+
+def nodo_extractor(state: dict, agents: dict) -> dict:
+    """
+    Extrae la información del PDF.
+    - Primera pasada: extracción inicial (por ventanas si el documento es
+      largo y está activo `documento_largo`).
+    - Pasadas siguientes: corrección según feedback del validador.
+    """
+    ronda = inicio_ronda()
+    plan = _plan_ventanas(state)
+    if plan is not None:
+        return {**_extraer_por_ventanas(state, agents, plan), **ronda}
+    agente, user_msg, extra = _preparar_extractor(state, agents)
+    response = agente.invoke(_mensajes(state, "hist_msg_extration", user_msg))
+    return {**_resultado_extractor(state, user_msg, response, extra), **ronda}
+
+
+async def anodo_extractor(state: dict, agents: dict) -> dict:
+    """Versión asíncrona de `nodo_extractor` (usa `ainvoke`)."""
+    ronda = inicio_ronda()
+    plan = await asyncio.to_thread(_plan_ventanas, state)
+    if plan is not None:
+        return {**await _aextraer_por_ventanas(state, agents, plan), **ronda}
+    # Selección de páginas y base64 son CPU: se sacan del event loop.
+    agente, user_msg, extra = await asyncio.to_thread(_preparar_extractor, state, agents)
+    response = await agente.ainvoke(_mensajes(state, "hist_msg_extration", user_msg))
+    return {**_resultado_extractor(state, user_msg, response, extra), **ronda}
+
+
 # ---------------------------------------------------------------------------
 # Nodo 3 — Validador
 # ---------------------------------------------------------------------------
 
-def nodo_validador(state: dict, agents: dict) -> dict:
+def _validacion_por_reglas(state: dict) -> dict | None:
     """
-    Valida la coherencia de la extracción.
-    Retorna:
-        validacion: 'CORRECTO' | 'CORREGIR'
-        feedback:   'OK' | descripción del error
+    Ejecuta el validador por reglas. Retorna la actualización del state si las
+    reglas deciden (errores mecánicos, o todo correcto sin LLM configurado),
+    o None si hace falta la revisión semántica del LLM.
     """
-    logger.info("🟣 [Validador] Nodo ejecutado")
+    reglas = validar_reglas(state.get("extracted_data", {}), state["tipo_archivo"])
 
+    if reglas["validacion"] == "CORREGIR":
+        logger.info("🟣 [Validador] Reglas → CORREGIR (sin LLM): %s", reglas["feedback"])
+        return {"validation": {**reglas, "origen": "reglas"}}
+
+    if not state.get("validador_llm", True):
+        logger.info("🟣 [Validador] Reglas → CORRECTO (validador LLM desactivado)")
+        return {"validation": {**reglas, "origen": "reglas"}}
+
+    return None
+
+
+def _preparar_validador(state: dict) -> dict:
+    """Arma el turno de usuario del validador."""
     extracted = state.get("extracted_data", {})
+    textos = textos_del_state(state)
     contexto = (
-        state["context_cont"]
+        textos.context_cont
         if state["tipo_archivo"] == "CONTRATO"
-        else state["context_otrosi"]
+        else textos.context_otrosi
     )
 
     # ── Texto de usuario según turno ───────────────────────────────────────
-    if state.get("validation") is None:
+    # Se usa el historial (no `validation`) porque las reglas pueden haber
+    # resuelto turnos anteriores sin que el LLM viera el contexto.
+    if not state["hist_msg_validation"]:
         user_text = (
             "Valida la siguiente extracción que se realizó de un PDF y valida "
             "la coherencia del resultado según las definiciones para cada campo:\n\n"
@@ -156,8 +558,7 @@ def nodo_validador(state: dict, agents: dict) -> dict:
             f"Información extraída del PDF: \n{extracted}\n\n"
             "No des corrección sobre lo que se clasifica como null; "
             "si envía un string 'null' igual se tomará como campo vacío.\n"
-            "Importante validar que el contratista NUNCA sea EPS SURA / "
-            "EPS SURAMERICANA con NIT 800088702-2, ya que este es el contratante.\n"
+            f"{_NOTA_REGLAS}"
             "Si está todo bien → validacion='CORRECTO' y feedback='OK'.\n"
             "Si hay errores → validacion='CORREGIR' y en feedback explica qué corregir y por qué."
         )
@@ -171,15 +572,52 @@ def nodo_validador(state: dict, agents: dict) -> dict:
             "Si hay errores → validacion='CORREGIR' y en feedback explica qué corregir y por qué."
         )
 
-    hist = state["hist_msg_validation"]
-    hist["messages"].append({"role": "user", "content": user_text})
+    return {"role": "user", "content": user_text}
 
-    response = agents["validador"].invoke(hist)
-    structured = response.get("structured_response", {})
 
-    hist["messages"].append(
-        {"role": "assistant", "content": json.dumps(structured)}
-    )
+def _resultado_validador(user_msg: dict, response: dict) -> dict:
+    """Arma la actualización del state; el historial recibe solo el turno nuevo."""
+    structured = response.get("structured_response", {})
 
     logger.info("🟣 [Validador] Resultado: %s", structured)
-    return {"validation": structured}
\ No newline at end of file
+    return {
+        "validation": {**structured, "origen": "llm"},
+        "hist_msg_validation": [
+            user_msg,
+            {"role": "assistant", "content": json.dumps(structured)},
+        ],
+    }
+
+
+def nodo_validador(state: dict, agents: dict) -> dict:
+    """
+    Valida la coherencia de la extracción.
+    Primero aplica las reglas deterministas (`pipeline_ai.reglas`); el LLM solo
+    se llama para la revisión semántica cuando las reglas no encuentran errores.
+    Retorna:
+        validacion: 'CORRECTO' | 'CORREGIR'
+        feedback:   'OK' | descripción del error
+        origen:     'reglas' | 'llm'
+    """
+    logger.info("🟣 [Validador] Nodo ejecutado")
+
+    por_reglas = _validacion_por_reglas(state)
+    if por_reglas is not None:
+        return {**por_reglas, **cierre_ronda(state)}
+
+    user_msg = _preparar_validador(state)
+    response = agents["validador"].invoke(_mensajes(state, "hist_msg_validation", user_msg))
+    return {**_resultado_validador(user_msg, response), **cierre_ronda(state)}
+
+
+async def anodo_validador(state: dict, agents: dict) -> dict:
+    """Versión asíncrona de `nodo_validador` (usa `ainvoke`)."""
+    logger.info("🟣 [Validador] Nodo ejecutado")
+
+    por_reglas = _validacion_por_reglas(state)
+    if por_reglas is not None:
+        return {**por_reglas, **cierre_ronda(state)}
+
+    user_msg = _preparar_validador(state)
+    response = await agents["validador"].ainvoke(_mensajes(state, "hist_msg_validation", user_msg))
+    return {**_resultado_validador(user_msg, response), **cierre_ronda(state)}
@@ -0,0 +1,82 @@
+"""
+Presupuesto de tiempo por documento.
+
+`build_initial_state(presupuesto_segundos=...)` fija `deadline` (epoch, en
+segundos) en el state. El extractor marca el inicio de cada ronda
+extractor → validador y el validador registra su duración; con eso
+`_router_validador` decide si el tiempo restante alcanza para otra ronda o
+si conviene terminar con la mejor extracción disponible.
+
+El límite por llamada al modelo es el `timeout` de `build_llm`; el motor
+además corta la ejecución completa al vencer el deadline (ver
+`ContractPipeline.run` / `arun`).
+"""
+
+import time
+
+
+def calcular_deadline(presupuesto_segundos: float | None) -> float | None:
+    """Deadline absoluto para un presupuesto relativo (None = sin límite)."""
+    if presupuesto_segundos is None:
+        return None
+    return time.time() + presupuesto_segundos
+
+
+def tiempo_restante(state: dict) -> float | None:
+    """Segundos hasta el deadline del documento (None si no tiene)."""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def inicio_ronda() -> dict:
+    """Actualización del state que marca el inicio de una ronda (la emite el extractor)."""
+    return {"inicio_ronda": time.time()}
+
+
+def cierre_ronda(state: dict) -> dict:
+    """
+    Actualización del state con la duración de la ronda que termina (la emite
+    el validador). Se guarda la mayor observada: es la estimación conservadora
+    de lo que costará la siguiente.
+    """
+    inicio = state.get("inicio_ronda")
+    if inicio is None:
+        return {}
+    duracion = time.time() - inicio
+    return {"duracion_ronda": max(duracion, state.get("duracion_ronda") or 0.0)}
+
+
+def alcanza_otra_ronda(state: dict) -> bool:
+    """True si el tiempo restante cubre otra ronda extractor + validador."""
+    restante = tiempo_restante(state)
+    if restante is None:
+        return True
+    return restante > (state.get("duracion_ronda") or 0.0)
+
+
+def resumen_plazo(state: dict, cortado: bool = False) -> dict | None:
+    """
+    Resumen del presupuesto para el resultado final.
+
+    `agotado` es True si el documento terminó por tiempo: quedó sin clasificar
+    porque se cortó la ejecución (`cortado`), o quedó sin validar como
+    CORRECTO con intentos disponibles.
+    """
+    deadline = state.get("deadline")
+    if deadline is None:
+        return None
+
+    tipo = state.get("tipo_archivo")
+    validacion = (state.get("validation") or {}).get("validacion", "")
+    sin_terminar = (
+        tipo in ("CONTRATO", "OTROSI")
+        and validacion.upper() != "CORRECTO"
+        and state.get("attempts", 0) < state.get("max_attempts", 3)
+    )
+    return {
+        "restante_s": round(deadline - time.time(), 3),
+        "duracion_ronda_s": round(state.get("duracion_ronda") or 0.0, 3),
+        "agotado": sin_terminar or (cortado and tipo is None),
+    }
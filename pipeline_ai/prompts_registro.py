@@ -0,0 +1,75 @@
+"""
+Registro versionado de los textos estáticos del pipeline.
+
+Los prompts y contextos (`prompt_cont`, `context_cont`, `context_otrosi`) ya
+no viajan en el state de cada ejecución: el state guarda solo
+`version_prompts` y los nodos resuelven el texto aquí al momento de armar el
+mensaje. La versión es el hash del contenido, así que registrar dos veces los
+mismos textos retorna la misma versión y un cambio de textos produce una
+versión nueva (útil para la clave del caché y para auditar resultados).
+
+Uso:
+    version = REGISTRO_PROMPTS.registrar(prompt_cont=..., context_cont=..., context_otrosi=...)
+    state   = build_initial_state(pdf, version_prompts=version)
+"""
+
+import hashlib
+import json
+import threading
+from dataclasses import asdict, dataclass
+
+from configuraciones_IA import prompts
+
+
+@dataclass(frozen=True)
+class TextosPrompts:
+    """Juego de textos estáticos que usan extractor y validador."""
+    prompt_cont: str
+    context_cont: str
+    context_otrosi: str
+
+    def version(self) -> str:
+        """Hash del contenido (estable entre procesos)."""
+        datos = json.dumps(asdict(self), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(datos.encode("utf-8")).hexdigest()[:16]
+
+
+class RegistroPrompts:
+    """Textos estáticos por versión. Seguro para usar desde varios hilos."""
+
+    def __init__(self):
+        self._versiones: dict[str, TextosPrompts] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, prompt_cont: str, context_cont: str, context_otrosi: str) -> str:
+        """Registra un juego de textos y retorna su versión."""
+        textos = TextosPrompts(prompt_cont, context_cont, context_otrosi)
+        version = textos.version()
+        with self._lock:
+            self._versiones.setdefault(version, textos)
+        return version
+
+    def obtener(self, version: str) -> TextosPrompts:
+        with self._lock:
+            textos = self._versiones.get(version)
+        if textos is None:
+            raise KeyError(f"Versión de prompts {version} no registrada")
+        return textos
+
+    def versiones(self) -> list[str]:
+        with self._lock:
+            return list(self._versiones)
+
+
+# Registro del proceso, con los textos de `configuraciones_IA.prompts` como versión por defecto.
+REGISTRO_PROMPTS = RegistroPrompts()
+VERSION_POR_DEFECTO = REGISTRO_PROMPTS.registrar(
+    prompt_cont=prompts.prompt_cont,
+    context_cont=prompts.context_cont,
+    context_otrosi=prompts.context_otrosi,
+)
+
+
+def textos_del_state(state: dict) -> TextosPrompts:
+    """Textos de la versión indicada en el state (o la versión por defecto)."""
+    return REGISTRO_PROMPTS.obtener(state.get("version_prompts") or VERSION_POR_DEFECTO)
@@ -0,0 +1,344 @@
+"""
+Limitador de cuota compartido para las llamadas al LLM.
+
+Con muchos documentos en paralelo, cada agente reintentaba por su cuenta y
+las ráfagas de 429 / RESOURCE_EXHAUSTED se retroalimentaban. Aquí hay un
+`LimitadorModelo` por modelo, compartido por todo el proceso, que combina:
+
+- Token bucket de solicitudes por minuto (RPM) y tokens de entrada por minuto (TPM).
+- Concurrencia adaptativa AIMD: +1 por cada "ventana" de respuestas exitosas,
+  ×0.5 cuando el proveedor responde con throttling.
+- Reintentos con backoff exponencial y jitter completo ante 429.
+
+`build_agents(llm, limitador)` envuelve cada agente con `AgenteLimitado`, así
+que clasificador, extractores y validador consumen del mismo presupuesto.
+
+Uso:
+    configurar_limites("gemini-2.5-flash", rpm=600, tpm=2_000_000)
+    limitador_para("gemini-2.5-flash").snapshot()
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from pipeline_ai.metrics import uso_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LimitesModelo:
+    """Cuota y rango de concurrencia de un modelo."""
+    rpm: int
+    tpm: int
+    concurrencia_inicial: int = 16
+    concurrencia_min: int = 1
+    concurrencia_max: int = 256
+
+
+# Valores por defecto; se ajustan a la cuota real del proyecto con `configurar_limites`.
+LIMITES_POR_MODELO = {
+    "gemini-2.5-flash": LimitesModelo(rpm=1000, tpm=4_000_000),
+    "gemini-2.5-flash-lite": LimitesModelo(rpm=2000, tpm=4_000_000),
+    "gemini-2.5-pro": LimitesModelo(rpm=300, tpm=2_000_000, concurrencia_inicial=8),
+}
+_LIMITES_DEFECTO = LimitesModelo(rpm=300, tpm=1_000_000, concurrencia_inicial=8)
+
+# Estimación de tokens de entrada cuando no se conoce la respuesta del proveedor.
+_BYTES_POR_TOKEN_TEXTO = 4
+_TOKENS_POR_PAGINA_PDF = 258
+
+
+def es_throttling(exc: BaseException) -> bool:
+    """True si la excepción corresponde a un 429 / RESOURCE_EXHAUSTED del proveedor."""
+    for atributo in ("code", "status_code", "status"):
+        if getattr(exc, atributo, None) in (429, "RESOURCE_EXHAUSTED"):
+            return True
+    texto = f"{type(exc).__name__} {exc}"
+    return "429" in texto or "RESOURCE_EXHAUSTED" in texto or "ResourceExhausted" in texto
+
+
+def estimar_tokens(entrada: dict) -> int:
+    """
+    Tokens de entrada aproximados de una invocación de agente
+    (`{"messages": [...]}`): texto a ~4 bytes por token y ~258 tokens por
+    página de PDF adjunto. El bucket se corrige luego con `usage_metadata`.
+    """
+    total = 0
+    for mensaje in entrada.get("messages", []):
+        contenido = mensaje.get("content") if isinstance(mensaje, dict) else getattr(mensaje, "content", "")
+        if isinstance(contenido, str):
+            total += len(contenido.encode("utf-8")) // _BYTES_POR_TOKEN_TEXTO
+            continue
+        for bloque in contenido or []:
+            if bloque.get("type") == "text":
+                total += len(bloque["text"].encode("utf-8")) // _BYTES_POR_TOKEN_TEXTO
+            elif bloque.get("type") == "file":
+                # ~3 KB de PDF por página como aproximación, sin decodificar el base64.
+                paginas = max(1, len(bloque["base64"]) * 3 // 4 // 3000)
+                total += paginas * _TOKENS_POR_PAGINA_PDF
+    return max(total, 1)
+
+
+def _tokens_reales(respuesta) -> int | None:
+    """Tokens de entrada reportados por el proveedor (`usage_metadata`), si vienen."""
+    return uso_tokens(respuesta)[0] or None
+
+
+# ---------------------------------------------------------------------------
+# Limitador
+# ---------------------------------------------------------------------------
+
+class LimitadorModelo:
+    """
+    Token bucket (RPM + TPM) con concurrencia AIMD. Seguro entre hilos y
+    utilizable desde corrutinas: la espera se calcula bajo el lock y se duerme
+    fuera de él (`time.sleep` o `asyncio.sleep`).
+    """
+
+    def __init__(
+        self,
+        modelo: str,
+        limites: LimitesModelo,
+        max_reintentos: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.modelo = modelo
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.configurar(limites)
+
+        self._en_vuelo = 0
+        self._ultimo_recorte = 0.0
+        self.solicitudes = 0
+        self.throttles = 0
+        self.reintentos = 0
+        self.tokens_consumidos = 0
+        self.espera_total = 0.0
+
+    def configurar(self, limites: LimitesModelo) -> None:
+        """Cambia la cuota en caliente; los buckets arrancan llenos."""
+        with self._lock:
+            self.limites = limites
+            self._solicitudes_disp = float(limites.rpm)
+            self._tokens_disp = float(limites.tpm)
+            self._recarga = time.monotonic()
+            self._concurrencia = float(limites.concurrencia_inicial)
+
+    # ── Buckets ────────────────────────────────────────────────────────────
+
+    def _recargar(self, ahora: float) -> None:
+        transcurrido = ahora - self._recarga
+        self._recarga = ahora
+        self._solicitudes_disp = min(
+            self.limites.rpm, self._solicitudes_disp + transcurrido * self.limites.rpm / 60
+        )
+        self._tokens_disp = min(
+            self.limites.tpm, self._tokens_disp + transcurrido * self.limites.tpm / 60
+        )
+
+    def _intentar(self, tokens: int) -> float:
+        """Adquiere un cupo si hay; si no, retorna cuántos segundos esperar."""
+        # Una solicitud más grande que el TPM completo esperaría para siempre.
+        tokens = min(tokens, self.limites.tpm)
+        with self._lock:
+            if self._en_vuelo >= int(self._concurrencia):
+                return 0.05
+
+            ahora = time.monotonic()
+            self._recargar(ahora)
+            faltan_sol = 1 - self._solicitudes_disp
+            faltan_tok = tokens - self._tokens_disp
+            if faltan_sol > 0 or faltan_tok > 0:
+                return max(
+                    faltan_sol * 60 / self.limites.rpm,
+                    faltan_tok * 60 / self.limites.tpm,
+                    0.01,
+                )
+
+            self._solicitudes_disp -= 1
+            self._tokens_disp -= tokens
+            self._en_vuelo += 1
+            self.solicitudes += 1
+            self.tokens_consumidos += tokens
+            return 0.0
+
+    def adquirir(self, tokens: int) -> None:
+        while (espera := self._intentar(tokens)) > 0:
+            self._registrar_espera(espera)
+            time.sleep(espera)
+
+    async def aadquirir(self, tokens: int) -> None:
+        while (espera := self._intentar(tokens)) > 0:
+            self._registrar_espera(espera)
+            await asyncio.sleep(espera)
+
+    def _registrar_espera(self, espera: float) -> None:
+        with self._lock:
+            self.espera_total += espera
+
+    # ── AIMD ───────────────────────────────────────────────────────────────
+
+    def liberar(self, throttled: bool = False, estimados: int = 0, reales: int | None = None) -> None:
+        """
+        Devuelve el cupo de concurrencia y ajusta el límite (AIMD).
+
+        Args:
+            throttled: El proveedor respondió 429.
+            estimados: Tokens cobrados al adquirir.
+            reales:    Tokens reportados por el proveedor (corrige el bucket).
+        """
+        with self._lock:
+            self._en_vuelo -= 1
+            if reales is not None:
+                ajuste = reales - min(estimados, self.limites.tpm)
+                self._tokens_disp -= ajuste
+                self.tokens_consumidos += ajuste
+
+            if not throttled:
+                # +1 por cada ventana completa de respuestas exitosas.
+                self._concurrencia = min(
+                    self.limites.concurrencia_max,
+                    self._concurrencia + 1 / max(self._concurrencia, 1),
+                )
+                return
+
+            self.throttles += 1
+            ahora = time.monotonic()
+            # Una ráfaga de 429 simultáneos cuenta como una sola señal de congestión.
+            if ahora - self._ultimo_recorte >= 1.0:
+                self._ultimo_recorte = ahora
+                self._concurrencia = max(self.limites.concurrencia_min, self._concurrencia / 2)
+                logger.warning(
+                    "[RateLimit] %s: throttling — concurrencia reducida a %d",
+                    self.modelo, int(self._concurrencia),
+                )
+
+    def espera_backoff(self, intento: int) -> float:
+        """Backoff exponencial con jitter completo."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+
+    def registrar_reintento(self, intento: int) -> float:
+        """Cuenta un reintento tras un 429 y retorna cuántos segundos esperar antes de él."""
+        with self._lock:
+            self.reintentos += 1
+        return self.espera_backoff(intento)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "modelo": self.modelo,
+                "rpm": self.limites.rpm,
+                "tpm": self.limites.tpm,
+                "concurrencia": int(self._concurrencia),
+                "en_vuelo": self._en_vuelo,
+                "solicitudes": self.solicitudes,
+                "throttles": self.throttles,
+                "reintentos": self.reintentos,
+                "tokens_consumidos": self.tokens_consumidos,
+                "espera_total_s": round(self.espera_total, 3),
+            }
+
+
+# ---------------------------------------------------------------------------
+# Agente envuelto
+# ---------------------------------------------------------------------------
+
+class AgenteLimitado:
+    """
+    Envoltura de un agente de `create_agent` que pasa cada `invoke` /
+    `ainvoke` por el limitador y reintenta los 429 con backoff.
+    """
+
+    def __init__(self, agente, limitador: LimitadorModelo):
+        self.agente = agente
+        self.limitador = limitador
+
+    def invoke(self, entrada: dict, *args, **kwargs):
+        lim = self.limitador
+        tokens = estimar_tokens(entrada)
+        for intento in range(lim.max_reintentos + 1):
+            lim.adquirir(tokens)
+            try:
+                respuesta = self.agente.invoke(entrada, *args, **kwargs)
+            except BaseException as exc:
+                # BaseException: una interrupción también debe devolver el cupo.
+                throttled = isinstance(exc, Exception) and es_throttling(exc)
+                lim.liberar(throttled=throttled)
+                if not throttled or intento == lim.max_reintentos:
+                    raise
+                self._esperar_reintento(intento, time.sleep)
+                continue
+            lim.liberar(estimados=tokens, reales=_tokens_reales(respuesta))
+            return respuesta
+
+    async def ainvoke(self, entrada: dict, *args, **kwargs):
+        lim = self.limitador
+        tokens = estimar_tokens(entrada)
+        for intento in range(lim.max_reintentos + 1):
+            await lim.aadquirir(tokens)
+            try:
+                respuesta = await self.agente.ainvoke(entrada, *args, **kwargs)
+            except BaseException as exc:
+                # Incluye CancelledError (deadline del documento): el cupo se devuelve.
+                throttled = isinstance(exc, Exception) and es_throttling(exc)
+                lim.liberar(throttled=throttled)
+                if not throttled or intento == lim.max_reintentos:
+                    raise
+                await self._esperar_reintento(intento, asyncio.sleep)
+                continue
+            lim.liberar(estimados=tokens, reales=_tokens_reales(respuesta))
+            return respuesta
+
+    def _esperar_reintento(self, intento: int, dormir):
+        espera = self.limitador.registrar_reintento(intento)
+        logger.info("[RateLimit] 429 — reintento %d en %.2fs", intento + 1, espera)
+        return dormir(espera)
+
+    def __getattr__(self, nombre):
+        return getattr(self.agente, nombre)
+
+
+# ---------------------------------------------------------------------------
+# Registro del proceso
+# ---------------------------------------------------------------------------
+
+_LIMITADORES: dict[str, LimitadorModelo] = {}
+_REGISTRO_LOCK = threading.Lock()
+
+
+def limitador_para(modelo: str) -> LimitadorModelo:
+    """Limitador compartido del proceso para `modelo` (se crea la primera vez)."""
+    with _REGISTRO_LOCK:
+        limitador = _LIMITADORES.get(modelo)
+        if limitador is None:
+            limites = LIMITES_POR_MODELO.get(modelo, _LIMITES_DEFECTO)
+            limitador = _LIMITADORES[modelo] = LimitadorModelo(modelo, limites)
+        return limitador
+
+
+def configurar_limites(modelo: str, **limites) -> LimitadorModelo:
+    """
+    Ajusta la cuota de `modelo` (rpm, tpm, concurrencia_*), incluso si su
+    limitador ya está en uso.
+    """
+    base = LIMITES_POR_MODELO.get(modelo, _LIMITES_DEFECTO)
+    nuevos = LimitesModelo(**{**base.__dict__, **limites})
+    LIMITES_POR_MODELO[modelo] = nuevos
+    limitador = limitador_para(modelo)
+    limitador.configurar(nuevos)
+    return limitador
+
+
+def snapshot_limitadores() -> dict:
+    """Estado de todos los limitadores del proceso, por modelo."""
+    with _REGISTRO_LOCK:
+        limitadores = list(_LIMITADORES.values())
+    return {lim.modelo: lim.snapshot() for lim in limitadores}
@@ -0,0 +1,176 @@
+"""
+Validador determinista por reglas.
+
+Revisa las condiciones mecánicas que antes solo verificaba el LLM validador
+(fechas, plazo, NIT del contratante, dígito de verificación y enums de los
+schemas) y retorna la misma estructura `{validacion, feedback}`.
+`nodo_validador` lo ejecuta antes del LLM: si las reglas encuentran errores
+se pide la corrección sin gastar una llamada al modelo.
+"""
+
+from datetime import date
+
+from configuraciones_IA.schemas import SCHEMA_OUTPUT_EXTRACTOR, SCHEMA_OUTPUT_EXTRACTOR_OTROSI
+from pipeline_ai.valores import como_entero, obtener
+
+# Versión de las reglas: forma parte de la huella del caché de resultados
+# (`pipeline_ai.cache`). Subirla al cambiar cualquier regla de este módulo.
+VERSION_REGLAS = 2
+
+# NIT de EPS Suramericana: es siempre la contratante, nunca el contratista.
+NIT_CONTRATANTE = 800088702
+
+# Pesos DIAN para el dígito de verificación, aplicados de derecha a izquierda.
+_PESOS_DV = (3, 7, 13, 17, 19, 23, 29, 37, 41, 43, 47, 53, 59, 67, 71)
+
+
+def _enum(schema: dict, *ruta: str) -> tuple:
+    nodo = schema
+    for clave in ruta:
+        nodo = nodo["properties"][clave]
+    return tuple(nodo["enum"])
+
+
+_ENUMS_CONTRATO = {
+    "contratista.tipo_persona": _enum(SCHEMA_OUTPUT_EXTRACTOR, "contratista", "tipo_persona"),
+    "contratista.tipo_documento": _enum(SCHEMA_OUTPUT_EXTRACTOR, "contratista", "tipo_documento"),
+    "clase_contrato": _enum(SCHEMA_OUTPUT_EXTRACTOR, "clase_contrato"),
+}
+_ENUMS_OTROSI = {
+    "adiciones.tipo": _enum(SCHEMA_OUTPUT_EXTRACTOR_OTROSI, "adiciones", "tipo"),
+}
+
+
+def dias_plazo(inicio: date, fin: date) -> int:
+    """
+    `plazo_contrato` esperado: días entre fecha_inicio y fecha_fin, como lo
+    definen el prompt y el schema del extractor (sin contar el día inicial).
+    """
+    return (fin - inicio).days
+
+
+def digito_verificacion(nit: int | str) -> int:
+    """Dígito de verificación (módulo 11) de un NIT colombiano."""
+    digitos = str(int(nit))[::-1]
+    suma = sum(int(d) * peso for d, peso in zip(digitos, _PESOS_DV))
+    residuo = suma % 11
+    return residuo if residuo in (0, 1) else 11 - residuo
+
+
+# ---------------------------------------------------------------------------
+# Utilidades
+# ---------------------------------------------------------------------------
+
+def _fecha(data: dict, ruta: str, errores: list[str]) -> date | None:
+    """Fecha en formato estricto YYYY-MM-DD; si no lo cumple, registra el error."""
+    valor = obtener(data, ruta)
+    if valor is None:
+        return None
+    try:
+        return date.fromisoformat(str(valor))
+    except ValueError:
+        errores.append(f"{ruta} debe tener formato YYYY-MM-DD (se recibió '{valor}').")
+        return None
+
+
+def _validar_enums(data: dict, enums: dict, errores: list[str]) -> None:
+    for ruta, permitidos in enums.items():
+        valor = obtener(data, ruta)
+        if valor is not None and valor not in permitidos:
+            errores.append(f"{ruta}='{valor}' no es un valor permitido: {list(permitidos)}.")
+
+
+# ---------------------------------------------------------------------------
+# Reglas por tipo de documento
+# ---------------------------------------------------------------------------
+
+def _reglas_contrato(data: dict, errores: list[str]) -> None:
+    _validar_enums(data, _ENUMS_CONTRATO, errores)
+
+    valor = obtener(data, "valor")
+    if valor is not None and (not isinstance(valor, (int, float)) or valor < 0):
+        errores.append(f"valor debe ser un número mayor o igual a 0 (se recibió '{valor}').")
+
+    # ── Fechas y plazo ─────────────────────────────────────────────────────
+    suscripcion = _fecha(data, "fechas.fecha_suscripcion", errores)
+    inicio = _fecha(data, "fechas.fecha_inicio", errores)
+    fin = _fecha(data, "fechas.fecha_fin", errores)
+
+    if suscripcion and inicio and suscripcion > inicio:
+        errores.append(
+            f"fecha_suscripcion ({suscripcion}) no puede ser posterior a fecha_inicio ({inicio})."
+        )
+    if inicio and fin and fin < inicio:
+        errores.append(f"fecha_fin ({fin}) no puede ser anterior a fecha_inicio ({inicio}).")
+
+    plazo = obtener(data, "plazo_contrato")
+    if plazo is not None:
+        if obtener(data, "fechas.fecha_fin") is None and plazo != 0:
+            errores.append(f"plazo_contrato debe ser 0 cuando no hay fecha_fin (se recibió {plazo}).")
+        elif inicio and fin:
+            dias = dias_plazo(inicio, fin)
+            if plazo != dias:
+                errores.append(
+                    f"plazo_contrato ({plazo}) no coincide con los días entre "
+                    f"fecha_inicio y fecha_fin ({dias})."
+                )
+
+    # ── Contratista ────────────────────────────────────────────────────────
+    numero = obtener(data, "contratista.numero_documento")
+    if numero is None:
+        return
+    try:
+        numero = int(numero)
+    except (TypeError, ValueError):
+        errores.append(f"contratista.numero_documento debe ser numérico (se recibió '{numero}').")
+        return
+
+    if numero == NIT_CONTRATANTE:
+        errores.append(
+            "El contratista no puede ser EPS SURA / EPS SURAMERICANA (NIT 800088702), "
+            "ya que es la entidad contratante."
+        )
+
+    dv = obtener(data, "contratista.digito_verificación")
+    if dv is not None and obtener(data, "contratista.tipo_documento") == "NIT":
+        esperado = digito_verificacion(numero)
+        if como_entero(dv) != esperado:
+            errores.append(
+                f"digito_verificación ({dv}) no corresponde al NIT {numero} "
+                f"(el dígito correcto es {esperado}). Verifica el número o el dígito."
+            )
+
+
+def _reglas_otrosi(data: dict, errores: list[str]) -> None:
+    _validar_enums(data, _ENUMS_OTROSI, errores)
+    _fecha(data, "adiciones.fecha_fin", errores)
+
+    tipo = obtener(data, "adiciones.tipo")
+    valor = obtener(data, "adiciones.valor")
+    if valor is not None and (not isinstance(valor, (int, float)) or valor < 0):
+        errores.append(f"adiciones.valor debe ser un número mayor o igual a 0 (se recibió '{valor}').")
+
+    if tipo == "NINGUNA" and valor:
+        errores.append("adiciones.tipo es 'NINGUNA' pero se reportó un valor adicionado.")
+    if tipo == "ADICIÓN EN TIEMPO" and valor:
+        errores.append("adiciones.tipo es 'ADICIÓN EN TIEMPO' pero se reportó un valor; ¿es 'AMBAS'?")
+
+
+def validar_reglas(extracted: dict, tipo_archivo: str) -> dict:
+    """
+    Aplica las reglas mecánicas a una extracción.
+
+    Returns:
+        {"validacion": 'CORRECTO' | 'CORREGIR', "feedback": 'OK' | errores encontrados}
+    """
+    errores: list[str] = []
+    if not isinstance(extracted, dict) or not extracted:
+        errores.append("La extracción está vacía; extrae nuevamente todos los campos.")
+    elif tipo_archivo == "CONTRATO":
+        _reglas_contrato(extracted, errores)
+    else:
+        _reglas_otrosi(extracted, errores)
+
+    if errores:
+        return {"validacion": "CORREGIR", "feedback": "\n".join(f"- {e}" for e in errores)}
+    return {"validacion": "CORRECTO", "feedback": "OK"}
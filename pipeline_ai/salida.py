@@ -0,0 +1,181 @@
+"""
+Salida incremental y reanudable para corridas por lotes.
+
+- `ArchivoJSONL`: agrega registros a un JSONL y hace `fsync` por tandas (cada
+  N registros o cada T segundos) en vez de uno por línea.
+- `Checkpoint`: huellas sha256 de los documentos ya terminados. Se guarda como
+  un archivo de texto con una huella por línea y en memoria como digests de 32
+  bytes, de modo que al reiniciar se saltan los documentos terminados.
+- `SalidaLote`: coordina el JSONL de resultados, el dead-letter y el
+  checkpoint. Sincroniza siempre resultados y dead-letter *antes* que el
+  checkpoint: un documento nunca queda marcado como terminado sin que su
+  registro esté en disco.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Archivos append-only
+# ---------------------------------------------------------------------------
+
+class ArchivoJSONL:
+    """Archivo JSONL en modo append con `fsync` explícito."""
+
+    def __init__(self, ruta: str | Path):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.ruta, "a", encoding="utf-8")
+        self._pendientes = 0
+
+    def escribir(self, registro: dict) -> None:
+        self._f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._pendientes += 1
+
+    def sincronizar(self) -> None:
+        """Vacía el buffer y fuerza la escritura a disco."""
+        if not self._pendientes:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._pendientes = 0
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self.sincronizar()
+        self._f.close()
+
+
+class Checkpoint:
+    """
+    Conjunto persistente de huellas (sha256 hex) de documentos terminados.
+
+    Las huellas nuevas se guardan en memoria y recién se escriben al archivo
+    en `sincronizar`: así el buffer del archivo no puede vaciarse a disco
+    antes de que `SalidaLote` sincronice los registros correspondientes.
+    """
+
+    def __init__(self, ruta: str | Path):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._hechos: set[bytes] = set()
+        if self.ruta.exists():
+            with open(self.ruta, encoding="ascii") as f:
+                for linea in f:
+                    linea = linea.strip()
+                    # Una línea truncada (corte de luz a mitad de escritura) se ignora.
+                    if len(linea) == 64:
+                        self._hechos.add(bytes.fromhex(linea))
+        self._f = open(self.ruta, "a", encoding="ascii")
+        self._pendientes: list[str] = []
+
+    def __contains__(self, huella: str) -> bool:
+        return bytes.fromhex(huella) in self._hechos
+
+    def __len__(self) -> int:
+        return len(self._hechos)
+
+    def marcar(self, huella: str) -> None:
+        digest = bytes.fromhex(huella)
+        if digest in self._hechos:
+            return
+        self._hechos.add(digest)
+        self._pendientes.append(huella)
+
+    def sincronizar(self) -> None:
+        if not self._pendientes:
+            return
+        self._f.write("".join(h + "\n" for h in self._pendientes))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._pendientes = []
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self.sincronizar()
+        self._f.close()
+
+
+# ---------------------------------------------------------------------------
+# Coordinación
+# ---------------------------------------------------------------------------
+
+class SalidaLote:
+    """
+    Resultados + dead-letter + checkpoint de una corrida por lotes.
+
+    Uso:
+        with SalidaLote("resultados.jsonl") as salida:
+            if huella not in salida:
+                ...
+                salida.registrar(registro, huella, fallido=False)
+    """
+
+    def __init__(
+        self,
+        resultados: str | Path,
+        dead_letter: str | Path | None = None,
+        checkpoint: str | Path | None = None,
+        fsync_cada: int = 64,
+        fsync_segundos: float = 2.0,
+    ):
+        """
+        Args:
+            resultados:     JSONL de salida.
+            dead_letter:    JSONL de documentos fallidos (por defecto `<resultados>.dead.jsonl`).
+            checkpoint:     Archivo de huellas terminadas (por defecto `<resultados>.ckpt`).
+            fsync_cada:     Registros entre cada `fsync`.
+            fsync_segundos: Tiempo máximo entre `fsync` mientras lleguen registros.
+        """
+        resultados = Path(resultados)
+        self.resultados = ArchivoJSONL(resultados)
+        self.dead_letter = ArchivoJSONL(dead_letter or resultados.with_suffix(".dead.jsonl"))
+        self.checkpoint = Checkpoint(checkpoint or resultados.with_suffix(".ckpt"))
+        self.fsync_cada = fsync_cada
+        self.fsync_segundos = fsync_segundos
+        self._sin_sincronizar = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def __contains__(self, huella: str) -> bool:
+        return huella in self.checkpoint
+
+    def registrar(self, registro: dict, huella: str | None, fallido: bool = False) -> None:
+        """Escribe el registro en resultados o dead-letter y marca la huella como terminada."""
+        (self.dead_letter if fallido else self.resultados).escribir(registro)
+        if huella is not None:
+            self.checkpoint.marcar(huella)
+
+        self._sin_sincronizar += 1
+        if (
+            self._sin_sincronizar >= self.fsync_cada
+            or time.monotonic() - self._ultimo_fsync >= self.fsync_segundos
+        ):
+            self.sincronizar()
+
+    def sincronizar(self) -> None:
+        # Orden importante: primero los registros, después el checkpoint.
+        self.resultados.sincronizar()
+        self.dead_letter.sincronizar()
+        self.checkpoint.sincronizar()
+        self._sin_sincronizar = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def close(self) -> None:
+        self.sincronizar()
+        self.resultados.close()
+        self.dead_letter.close()
+        self.checkpoint.close()
+
+    def __enter__(self) -> "SalidaLote":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,115 @@
+"""
+Selección de páginas relevantes para el extractor.
+
+Indexa el texto de cada página con PyMuPDF, la puntúa contra palabras clave
+de los campos a extraer (valor, plazo, fechas, NIT, objeto, firmas) y arma un
+PDF reducido con las top-k páginas más la primera y la última. Así un contrato
+de 60 páginas con anexos no se envía completo al modelo.
+"""
+
+import logging
+import re
+
+from pipeline_ai.valores import normalizar_texto
+from utils.pdf_utils import PdfDocument
+
+logger = logging.getLogger(__name__)
+
+# Páginas (además de la primera y la última) que se envían por tipo de documento.
+PRESUPUESTO_PAGINAS = {"CONTRATO": 8, "OTROSI": 4}
+
+_MESES = r"(?:enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)"
+
+# Patrones sobre texto normalizado (minúsculas, sin tildes), agrupados por campo.
+_PATRONES_CAMPOS = {
+    "contrato_id": (re.compile(r"\bcw\s?-?\d+"),),
+    "valor": (re.compile(r"\bvalor\b"), re.compile(r"\$\s?\d"), re.compile(r"\bpesos\b")),
+    "plazo": (re.compile(r"\bplazo\b"), re.compile(r"\bvigencia\b"), re.compile(r"\bduracion\b")),
+    "fecha": (
+        re.compile(r"\bfecha\b"),
+        re.compile(rf"\b\d{{1,2}}\s+(?:dias\s+del\s+mes\s+)?de\s+{_MESES}\b"),
+        re.compile(r"\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}/\d{1,2}/\d{4}\b"),
+    ),
+    "nit": (re.compile(r"\bnit\b"), re.compile(r"\bcedula\b")),
+    "objeto": (re.compile(r"\bobjeto\b"),),
+    "firma": (re.compile(r"\bfirma"), re.compile(r"\bsuscri"), re.compile(r"\brepresentante\s+legal\b")),
+    "adicion": (re.compile(r"\badicion"), re.compile(r"\bprorroga\b"), re.compile(r"\bmodifica")),
+}
+
+# Por debajo de estos caracteres por página se asume que no hay capa de texto útil.
+_MIN_CARACTERES_PROMEDIO = 80
+
+
+def puntaje_pagina(texto: str) -> float:
+    """
+    Relevancia de una página: cada campo suma según sus coincidencias (hasta 3),
+    de modo que pesan más las páginas que cubren varios campos.
+    """
+    texto = normalizar_texto(texto)
+    puntaje = 0.0
+    for patrones in _PATRONES_CAMPOS.values():
+        hits = sum(len(p.findall(texto)) for p in patrones)
+        puntaje += min(hits, 3)
+    return puntaje
+
+
+def seleccionar_paginas(
+    doc: PdfDocument,
+    tipo_archivo: str,
+    presupuesto: dict | None = None,
+) -> tuple[PdfDocument, dict]:
+    """
+    Arma un PDF reducido con las páginas más relevantes.
+
+    Args:
+        doc:          Documento completo.
+        tipo_archivo: 'CONTRATO' | 'OTROSI' (define el presupuesto de páginas).
+        presupuesto:  Páginas top-k por tipo (por defecto `PRESUPUESTO_PAGINAS`).
+
+    Returns:
+        (documento a enviar, reporte con páginas y bytes ahorrados)
+    """
+    presupuesto = presupuesto or PRESUPUESTO_PAGINAS
+    top_k = presupuesto.get(tipo_archivo, max(presupuesto.values()))
+    total = len(doc)
+
+    reporte = {
+        "paginas_totales": total,
+        "paginas_enviadas": list(range(1, total + 1)),
+        "paginas_ahorradas": 0,
+        "bytes_originales": len(doc.datos),
+        "bytes_enviados": len(doc.datos),
+        "bytes_ahorrados": 0,
+        "motivo": None,
+    }
+
+    if total <= top_k + 2:
+        reporte["motivo"] = "documento dentro del presupuesto"
+        return doc, reporte
+
+    textos = [doc.texto_pagina(i) for i in range(total)]
+    if sum(len(t.strip()) for t in textos) / total < _MIN_CARACTERES_PROMEDIO:
+        reporte["motivo"] = "sin capa de texto útil"
+        return doc, reporte
+
+    puntajes = {i: puntaje_pagina(textos[i]) for i in range(1, total - 1)}
+    intermedias = sorted(
+        (i for i, p in puntajes.items() if p > 0),
+        key=lambda i: puntajes[i],
+        reverse=True,
+    )[:top_k]
+    indices = sorted({0, total - 1, *intermedias})
+
+    reducido = doc.paginas(indices)
+    reporte.update(
+        paginas_enviadas=[i + 1 for i in indices],
+        paginas_ahorradas=total - len(indices),
+        bytes_enviados=len(reducido.datos),
+        bytes_ahorrados=len(doc.datos) - len(reducido.datos),
+    )
+
+    logger.info(
+        "[Páginas] %d/%d páginas enviadas — %d bytes ahorrados",
+        len(indices), total, reporte["bytes_ahorrados"],
+    )
+    return reducido, reporte
@@ -1,50 +1,140 @@
-from typing import TypedDict
+import operator
+from typing import Annotated, TypedDict
 
+from pipeline_ai.plazos import calcular_deadline
+from pipeline_ai.prompts_registro import REGISTRO_PROMPTS, VERSION_POR_DEFECTO, textos_del_state
+from utils.pdf_utils import PdfDocument
 
+
+# Los historiales y registros por turno son canales de solo-agregado: cada
+# nodo retorna únicamente los elementos nuevos y LangGraph los concatena
+# (`operator.add`), en lugar de reescribir la lista completa en cada paso.
 class StateEstructure(TypedDict):
-    prompt_cont: dict | str
-    context_cont: str
-    context_otrosi: str
-    pdf: str
+    version_prompts: str
+    pdf: PdfDocument | str
+    pdf_corto: str | None
     tipo_archivo: str | None
+    clasificacion: dict | None
+    umbral_clasificador_local: float | None
+    especulacion: dict | None
+    duplicado: dict | None
     extracted_data: dict | str
-    hist_msg_extration: dict
+    hist_msg_extration: Annotated[list[dict], operator.add]
+    payload_extractor: Annotated[list[int], operator.add]
+    presupuesto_paginas: dict | None
+    documento_largo: dict | None
+    optimizacion: dict | None
+    extraccion_ventanas: dict | None
+    modo_entrada: str
+    entrada: dict | None
+    seleccion_paginas: dict | None
     validation: dict | None
-    hist_msg_validation: dict
+    validador_llm: bool
+    hist_msg_validation: Annotated[list[dict], operator.add]
     attempts: int
     max_attempts: int
+    deadline: float | None
+    inicio_ronda: float | None
+    duracion_ronda: float | None
+    metricas_nodos: Annotated[list[dict], operator.add]
 
 
 def build_initial_state(
-    pdf: str,
-    prompt_cont: dict | str,
-    context_cont: str,
-    context_otrosi: str,
+    pdf: PdfDocument | str,
+    prompt_cont: str | None = None,
+    context_cont: str | None = None,
+    context_otrosi: str | None = None,
     max_attempts: int = 3,
+    pdf_corto: str | None = None,
+    umbral_clasificador_local: float | None = None,
+    validador_llm: bool = True,
+    presupuesto_paginas: dict | None = None,
+    modo_entrada: str = "archivo",
+    presupuesto_segundos: float | None = None,
+    version_prompts: str | None = None,
+    documento_largo: dict | None = None,
+    optimizacion: dict | None = None,
+    duplicado: dict | None = None,
 ) -> StateEstructure:
     """
     Construye el estado inicial limpio para una nueva ejecución del grafo.
 
     Args:
-        pdf:            PDF en base64.
+        pdf:            Documento (`PdfDocument`) o PDF en base64.
         prompt_cont:    Prompt/contexto base del contrato.
         context_cont:   Contexto adicional para contratos.
         context_otrosi: Contexto adicional para otrosíes.
+                        Los tres son opcionales: si se pasa alguno, el juego
+                        completo (los faltantes salen de la versión por
+                        defecto) se registra en `REGISTRO_PROMPTS` y el state
+                        guarda solo su versión.
         max_attempts:   Máximo de intentos de corrección entre extractor y validador.
+        pdf_corto:      Primeras páginas ya recortadas (base64) para el clasificador.
+                        Si es None, el clasificador las recorta a partir de `pdf`.
+        umbral_clasificador_local: Confianza mínima del clasificador local para
+                        no llamar al LLM. None desactiva el clasificador local.
+        validador_llm:  Si es False, una extracción que pasa las reglas
+                        deterministas se da por CORRECTA sin llamar al LLM.
+        presupuesto_paginas: Páginas relevantes a enviar al extractor por tipo
+                        (ej. {"CONTRATO": 8, "OTROSI": 4}). None envía el PDF completo.
+        modo_entrada:   "archivo" (PDF adjunto) | "auto" (texto plano para las páginas
+                        con buena capa de texto, PDF solo para las escaneadas).
+        presupuesto_segundos: Tiempo máximo para el documento completo. Cuando no
+                        alcanza para otra ronda extractor + validador se termina
+                        con la mejor extracción disponible. None = sin límite.
+        version_prompts: Versión ya registrada en `REGISTRO_PROMPTS` (None = la
+                        versión por defecto de `configuraciones_IA.prompts`).
+        documento_largo: Extracción por ventanas para documentos largos, p. ej.
+                        {"umbral_paginas": 80, "paginas_ventana": 20} (las claves
+                        faltantes salen de `ventanas.DOCUMENTO_LARGO`; {} usa
+                        todos los valores por defecto). None la desactiva.
+        optimizacion:   Reporte de `PdfDocument.optimizado` si `pdf` es la
+                        versión optimizada (lo completa el motor).
+        duplicado:      Extracción de un casi-duplicado a reutilizar (lo completa
+                        el motor, ver `pipeline_ai.duplicados`): {"tipo_archivo",
+                        "extracted_data", "de", "similitud", "origen"}. El grafo
+                        va directo al validador.
 
     Returns:
         StateEstructure lista para pasarle a graph.invoke().
     """
+    if any(t is not None for t in (prompt_cont, context_cont, context_otrosi)):
+        base = textos_del_state({"version_prompts": version_prompts})
+        version_prompts = REGISTRO_PROMPTS.registrar(
+            prompt_cont=base.prompt_cont if prompt_cont is None else prompt_cont,
+            context_cont=base.context_cont if context_cont is None else context_cont,
+            context_otrosi=base.context_otrosi if context_otrosi is None else context_otrosi,
+        )
+
     return StateEstructure(
-        prompt_cont=prompt_cont,
-        context_cont=context_cont,
-        context_otrosi=context_otrosi,
+        version_prompts=version_prompts or VERSION_POR_DEFECTO,
         pdf=pdf,
-        tipo_archivo=None,
-        extracted_data={},
-        hist_msg_extration={"messages": []},
+        pdf_corto=pdf_corto,
+        tipo_archivo=duplicado["tipo_archivo"] if duplicado else None,
+        clasificacion=None,
+        umbral_clasificador_local=umbral_clasificador_local,
+        especulacion=None,
+        duplicado=(
+            {k: v for k, v in duplicado.items() if k not in ("tipo_archivo", "extracted_data")}
+            if duplicado else None
+        ),
+        extracted_data=duplicado["extracted_data"] if duplicado else {},
+        hist_msg_extration=[],
+        payload_extractor=[],
+        presupuesto_paginas=presupuesto_paginas,
+        documento_largo=documento_largo,
+        extraccion_ventanas=None,
+        optimizacion=optimizacion,
+        seleccion_paginas=None,
+        modo_entrada=modo_entrada,
+        entrada=None,
         validation=None,
-        hist_msg_validation={"messages": []},
+        validador_llm=validador_llm,
+        hist_msg_validation=[],
         attempts=0,
         max_attempts=max_attempts,
+        deadline=calcular_deadline(presupuesto_segundos),
+        inicio_ronda=None,
+        duracion_ronda=None,
+        metricas_nodos=[],
     )
\ No newline at end of file
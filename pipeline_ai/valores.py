@@ -0,0 +1,59 @@
+"""
+Lectura de los valores que devuelve el extractor y normalización de texto.
+
+El extractor puede devolver null o el string "null" para un campo vacío, y
+números o fechas como texto. Estas funciones las comparten las reglas, la
+combinación por ventanas, el índice de contratos y los clasificadores de
+texto, para que todos interpreten un mismo valor de la misma forma.
+"""
+
+import re
+import unicodedata
+from datetime import date
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def vacio(valor) -> bool:
+    """True para None y para los strings vacíos o "null"."""
+    return valor is None or (isinstance(valor, str) and valor.strip().lower() in ("", "null"))
+
+
+def obtener(data: dict, ruta: str):
+    """Valor en `ruta` ("fechas.fecha_fin"); None si falta o está vacío."""
+    nodo = data
+    for clave in ruta.split("."):
+        if not isinstance(nodo, dict):
+            return None
+        nodo = nodo.get(clave)
+    return None if vacio(nodo) else nodo
+
+
+def como_fecha(valor) -> date | None:
+    """Fecha de un valor "YYYY-MM-DD" (se ignora una hora a continuación) o None."""
+    try:
+        return date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        return None
+
+
+def como_numero(valor) -> float | None:
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def como_entero(valor) -> int | None:
+    """Entero de un valor como 8, 8.0, "8" o " 08" (None si no es un entero)."""
+    try:
+        convertido = float(str(valor).strip())
+    except ValueError:
+        return None
+    return int(convertido) if convertido.is_integer() else None
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas, sin tildes (solo ASCII) y con los espacios colapsados."""
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return _ESPACIOS.sub(" ", sin_tildes.lower())
@@ -0,0 +1,239 @@
+"""
+Extracción por ventanas (map-reduce) para contratos muy largos.
+
+Un contrato marco de cientos de páginas enviado completo al extractor es
+lento y puede truncar la respuesta. Con `documento_largo` en el state, si el
+documento supera `umbral_paginas` el extractor:
+
+1. Parte el PDF en ventanas de `paginas_ventana` páginas (con `solapamiento`
+   páginas compartidas entre ventanas consecutivas).
+2. Extrae cada ventana en paralelo (hasta `concurrencia` a la vez) con un
+   schema parcial: los mismos campos, todos anulables, porque cada ventana
+   solo ve una parte del documento.
+3. Combina los candidatos con reglas deterministas (`combinar`): el primer
+   identificador explícito, la fecha de suscripción e inicio más temprana,
+   la fecha fin más tardía, el mayor valor (el valor global del contrato),
+   etc.
+
+Solo el resultado combinado llega a `nodo_validador`. Si este pide una
+corrección, el extractor la hace sobre las páginas de las ventanas de las
+que salió algún campo combinado (`fuentes`), no sobre una selección distinta:
+el turno del historial adjunta exactamente esas páginas, así el modelo no
+pierde valores que vio en otra ventana.
+"""
+
+import copy
+from collections import Counter
+
+from configuraciones_IA.schemas import SCHEMA_OUTPUT_EXTRACTOR, SCHEMA_OUTPUT_EXTRACTOR_OTROSI
+from pipeline_ai.reglas import dias_plazo
+from pipeline_ai.valores import como_fecha, como_numero, obtener
+
+# Versión de la política de combinación (`combinar`) y de `esquema_parcial`:
+# forma parte de la huella del caché de resultados. Subirla al cambiarlas.
+VERSION_COMBINACION = 2
+
+# Configuración por defecto del modo documento largo (se completa con la del state).
+DOCUMENTO_LARGO = {
+    "umbral_paginas": 80,
+    "paginas_ventana": 20,
+    "solapamiento": 1,
+    "concurrencia": 4,
+}
+
+
+# ---------------------------------------------------------------------------
+# Ventanas
+# ---------------------------------------------------------------------------
+
+def configuracion(documento_largo: dict | None) -> dict | None:
+    """Configuración completa (None si el modo está desactivado)."""
+    if documento_largo is None:
+        return None
+    config = {**DOCUMENTO_LARGO, **documento_largo}
+    if config["paginas_ventana"] < 1 or not 0 <= config["solapamiento"] < config["paginas_ventana"]:
+        raise ValueError(f"documento_largo inválido: {documento_largo!r}")
+    return config
+
+
+def ventanas_paginas(total: int, paginas_ventana: int, solapamiento: int = 0) -> list[list[int]]:
+    """Índices (base 0) de cada ventana; la última puede ser más corta."""
+    paso = paginas_ventana - solapamiento
+    ventanas = []
+    for inicio in range(0, total, paso):
+        ventanas.append(list(range(inicio, min(inicio + paginas_ventana, total))))
+        if inicio + paginas_ventana >= total:
+            break
+    return ventanas
+
+
+def instruccion_ventana(indices: list[int], total: int) -> str:
+    """Texto que acompaña a cada ventana en el mensaje de usuario."""
+    return (
+        f"\nEste fragmento contiene las páginas {indices[0] + 1} a {indices[-1] + 1} de un "
+        f"documento de {total} páginas. Extrae solo lo que aparezca en estas páginas; "
+        "los campos que no aparezcan aquí devuélvelos en null.\n"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Schema parcial
+# ---------------------------------------------------------------------------
+
+def esquema_parcial(schema: dict) -> dict:
+    """Copia de `schema` con todos los campos anulables y sin `required`."""
+    def _anulable(nodo: dict) -> dict:
+        nodo = dict(nodo)
+        nodo.pop("required", None)
+        if "properties" in nodo:
+            nodo["properties"] = {k: _anulable(v) for k, v in nodo["properties"].items()}
+            return nodo
+        tipo = nodo.get("type")
+        if isinstance(tipo, str):
+            nodo["type"] = [tipo, "null"]
+        if "enum" in nodo and None not in nodo["enum"]:
+            nodo["enum"] = [*nodo["enum"], None]
+        nodo["nullable"] = True
+        return nodo
+
+    parcial = _anulable(copy.deepcopy(schema))
+    parcial["title"] = f"{schema['title']}Parcial"
+    return parcial
+
+
+SCHEMA_PARCIAL_EXTRACTOR = esquema_parcial(SCHEMA_OUTPUT_EXTRACTOR)
+SCHEMA_PARCIAL_EXTRACTOR_OTROSI = esquema_parcial(SCHEMA_OUTPUT_EXTRACTOR_OTROSI)
+
+
+# ---------------------------------------------------------------------------
+# Combinación de candidatos
+# ---------------------------------------------------------------------------
+
+def _valores(candidatos: list[dict], ruta: str) -> list[tuple[int, object]]:
+    """(índice de ventana, valor) no vacíos, en orden de ventana."""
+    return [
+        (i, v) for i, c in enumerate(candidatos)
+        if (v := obtener(c, ruta)) is not None
+    ]
+
+
+class _Combinacion:
+    """Resultado combinado más la ventana (base 1) de la que salió cada campo."""
+
+    def __init__(self, candidatos: list[dict]):
+        self.candidatos = candidatos
+        self.datos: dict = {}
+        self.fuentes: dict[str, int] = {}
+
+    def poner(self, ruta: str, valor, ventana: int | None) -> None:
+        destino = self.datos
+        *padres, hoja = ruta.split(".")
+        for parte in padres:
+            destino = destino.setdefault(parte, {})
+        destino[hoja] = valor
+        if ventana is not None:
+            self.fuentes[ruta] = ventana + 1
+
+    def primero(self, ruta: str, defecto=None) -> None:
+        valores = _valores(self.candidatos, ruta)
+        self.poner(ruta, *(valores[0][::-1] if valores else (defecto, None)))
+
+    def fecha(self, ruta: str, mas_tardia: bool = False) -> None:
+        fechas = [(f, i, v) for i, v in _valores(self.candidatos, ruta) if (f := como_fecha(v))]
+        if not fechas:
+            self.poner(ruta, None, None)
+            return
+        # En empates gana la primera ventana.
+        if mas_tardia:
+            f, i, _ = max(fechas, key=lambda t: (t[0], -t[1]))
+        else:
+            f, i, _ = min(fechas, key=lambda t: (t[0], t[1]))
+        self.poner(ruta, f.isoformat(), i)
+
+    def mayor(self, ruta: str, defecto=None) -> None:
+        """Mayor valor numérico distinto de 0 (0 significa "no aparece")."""
+        numeros = [(n, i, v) for i, v in _valores(self.candidatos, ruta) if (n := como_numero(v))]
+        if not numeros:
+            self.poner(ruta, defecto, None)
+            return
+        n, i, v = max(numeros, key=lambda t: (t[0], -t[1]))
+        self.poner(ruta, v, i)
+
+    def mas_frecuente(self, ruta: str, menos_preferido: str | None = None) -> None:
+        valores = _valores(self.candidatos, ruta)
+        conteo = Counter(v for _, v in valores if v != menos_preferido) or Counter(v for _, v in valores)
+        if not conteo:
+            self.poner(ruta, None, None)
+            return
+        valor = conteo.most_common(1)[0][0]
+        self.poner(ruta, valor, next(i for i, v in valores if v == valor))
+
+
+def _combinar_contrato(comb: _Combinacion) -> None:
+    comb.primero("contrato_id")
+    comb.mayor("valor", defecto=0)
+    comb.primero("objeto_contrato")
+    comb.fecha("fechas.fecha_suscripcion")
+    comb.fecha("fechas.fecha_inicio")
+    comb.fecha("fechas.fecha_fin", mas_tardia=True)
+
+    # El contratista sale de la primera ventana que lo identifica (NIT/cédula);
+    # los campos que esa ventana no trae se completan con la primera que sí.
+    con_documento = _valores(comb.candidatos, "contratista.numero_documento")
+    base = con_documento[0][0] if con_documento else None
+    for campo in ("tipo_persona", "tipo_documento", "numero_documento", "digito_verificación", "nombre_persona"):
+        ruta = f"contratista.{campo}"
+        valor = obtener(comb.candidatos[base], ruta) if base is not None else None
+        if valor is None:
+            comb.primero(ruta)
+        else:
+            comb.poner(ruta, valor, base)
+
+    # El plazo debe corresponder a las fechas combinadas (con la misma
+    # definición que `reglas`): se prefiere un candidato coherente y, si no hay, se calcula.
+    inicio = como_fecha(obtener(comb.datos, "fechas.fecha_inicio"))
+    fin = como_fecha(obtener(comb.datos, "fechas.fecha_fin"))
+    if fin is None:
+        comb.poner("plazo_contrato", 0, None)
+    elif inicio is not None:
+        dias = dias_plazo(inicio, fin)
+        coherentes = [(i, v) for i, v in _valores(comb.candidatos, "plazo_contrato") if como_numero(v) == dias]
+        comb.poner("plazo_contrato", *(coherentes[0][::-1] if coherentes else (dias, None)))
+    else:
+        comb.primero("plazo_contrato", defecto=0)
+
+    comb.mas_frecuente("clase_contrato", menos_preferido="OTRO")
+
+
+def _combinar_otrosi(comb: _Combinacion) -> None:
+    comb.primero("ident.contrato_base_id")
+    comb.primero("ident.otrosi_id")
+    comb.fecha("adiciones.fecha_fin", mas_tardia=True)
+    comb.mayor("adiciones.valor")
+
+    # El tipo se deriva de lo que encontraron todas las ventanas.
+    tipos = {v for _, v in _valores(comb.candidatos, "adiciones.tipo")}
+    en_tiempo = bool(tipos & {"ADICIÓN EN TIEMPO", "AMBAS"}) or obtener(comb.datos, "adiciones.fecha_fin") is not None
+    en_valor = bool(tipos & {"ADICIÓN EN VALOR", "AMBAS"}) or obtener(comb.datos, "adiciones.valor") is not None
+    tipo = {
+        (True, True): "AMBAS",
+        (True, False): "ADICIÓN EN TIEMPO",
+        (False, True): "ADICIÓN EN VALOR",
+        (False, False): "NINGUNA",
+    }[(en_tiempo, en_valor)]
+    comb.poner("adiciones.tipo", tipo, None)
+
+
+def combinar(tipo_archivo: str, candidatos: list[dict]) -> tuple[dict, dict[str, int]]:
+    """
+    Combina las extracciones parciales de cada ventana.
+
+    Returns:
+        (extracción combinada, ventana (base 1) de la que salió cada campo)
+    """
+    comb = _Combinacion(candidatos)
+    if tipo_archivo == "CONTRATO":
+        _combinar_contrato(comb)
+    else:
+        _combinar_otrosi(comb)
+    return comb.datos, comb.fuentes
@@ -0,0 +1,57 @@
+"""Caché de resultados: clave por configuración e invalidación por prompts, reglas y ventanas."""
+
+import pytest
+
+from pipeline_ai import reglas, ventanas
+from pipeline_ai.cache import ResultCache
+from pipeline_ai.engine import _config_cache
+
+_RESULTADO = {"tipo_archivo": "CONTRATO", "extracted_data": {"contrato_id": "CW1"}}
+_NORMAL = {"model": "fake"}
+_LARGO = {"llm_kwargs": {"model": "fake"}, "opciones": {"documento_largo": {}}}
+
+
+@pytest.fixture
+def cache():
+    cache = ResultCache(":memory:")
+    cache.put("a", _NORMAL, _RESULTADO)
+    cache.put("a", _LARGO, _RESULTADO)
+    yield cache
+    cache.close()
+
+
+def test_entradas_vigentes(cache):
+    assert cache.get("a", _NORMAL)["extracted_data"] == _RESULTADO["extracted_data"]
+    assert cache.get("a", _LARGO) is not None
+    assert cache.purge_stale() == 0
+
+
+def test_cambio_de_reglas_invalida_todo(cache, monkeypatch):
+    monkeypatch.setattr(reglas, "VERSION_REGLAS", reglas.VERSION_REGLAS + 1)
+    assert cache.get("a", _NORMAL) is None
+    assert cache.get("a", _LARGO) is None
+
+
+def test_cambio_de_combinacion_solo_invalida_documento_largo(cache, monkeypatch):
+    monkeypatch.setattr(ventanas, "VERSION_COMBINACION", ventanas.VERSION_COMBINACION + 1)
+    assert cache.purge_stale() == 1
+    assert cache.get("a", _NORMAL) is not None
+    assert cache.get("a", _LARGO) is None
+
+
+def test_cambio_de_schema_parcial_invalida_documento_largo(cache, monkeypatch):
+    parcial = {**ventanas.SCHEMA_PARCIAL_EXTRACTOR, "title": "Otro"}
+    monkeypatch.setattr(ventanas, "SCHEMA_PARCIAL_EXTRACTOR", parcial)
+    assert cache.get("a", _NORMAL) is not None
+    assert cache.get("a", _LARGO) is None
+
+
+def test_opciones_por_defecto_no_cambian_la_clave():
+    # Lo que envía el CLI del lote sin flags frente a `run_pipeline` sin opciones.
+    lote = {"umbral_clasificador_local": None, "modo_entrada": "archivo", "presupuesto_segundos": None}
+    assert _config_cache(None, lote) == _config_cache(None, {})
+    assert _config_cache(None, {**lote, "modo_entrada": "auto"}) == _config_cache(None, {"modo_entrada": "auto"})
+    assert _config_cache(None, {"optimizar_pdf": {}}) == _config_cache(
+        None, {"optimizar_pdf": {"dpi_objetivo": 150}}
+    )
+    assert _config_cache(None, {"optimizar_pdf": None}) == _config_cache(None, {})
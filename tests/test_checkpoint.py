@@ -0,0 +1,25 @@
+"""Serializador de checkpoints: el PDF va por referencia y sin copias."""
+
+from benchmarks.synthetic import pdf_sintetico_bytes
+from pipeline_ai.checkpoint import AlmacenBlobs, SerializadorConBlobs
+from utils.pdf_utils import PdfDocument
+
+
+def test_pdf_por_referencia_sin_copiar_sus_bytes(tmp_path):
+    blobs = AlmacenBlobs(str(tmp_path / "checkpoints.sqlite"))
+    serde = SerializadorConBlobs(blobs)
+    doc = PdfDocument.from_bytes(pdf_sintetico_bytes(3))
+
+    recibidos = []
+    guardar = blobs.guardar
+    blobs.guardar = lambda datos, huella=None: recibidos.append(type(datos)) or guardar(datos, huella)
+
+    # LangGraph serializa el canal en cada superstep.
+    serializados = [serde.dumps_typed({"pdf": doc, "intentos": i}) for i in range(3)]
+
+    assert recibidos == [memoryview] * 3
+    assert blobs.stats() == {"blobs": 1, "bytes": len(doc.datos)}
+    restaurado = serde.loads_typed(serializados[-1])
+    assert restaurado["intentos"] == 2
+    assert restaurado["pdf"].sha256() == doc.sha256()
+    blobs.close()
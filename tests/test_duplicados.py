@@ -0,0 +1,95 @@
+"""Casi-duplicados: copia firmada, contratos de la misma plantilla y documentos largos."""
+
+import random
+
+import fitz
+import pytest
+
+from pipeline_ai.duplicados import PAGINAS_FIN, PAGINAS_INICIO, IndiceDuplicados, calcular_huella
+from utils.pdf_utils import PdfDocument
+
+_VOCABULARIO = [f"termino{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}{chr(97 + i // 676)}" for i in range(3000)]
+
+
+def _paginas(num_paginas: int, semilla: int = 1) -> list[str]:
+    rng = random.Random(semilla)
+    paginas = [" ".join(rng.choice(_VOCABULARIO) for _ in range(300)) for _ in range(num_paginas)]
+    paginas[0] = "CONTRATO No. CW2370068 NIT 900123456-8 valor 125000000 fecha 2024-01-15 " + paginas[0]
+    return paginas
+
+
+def _pdf(paginas: list[str], reemplazos: dict | None = None, extra_ultima: str = "") -> PdfDocument:
+    with fitz.open() as doc:
+        for i, texto in enumerate(paginas):
+            for viejo, nuevo in (reemplazos or {}).items():
+                texto = texto.replace(viejo, nuevo)
+            if i == len(paginas) - 1:
+                texto += extra_ultima
+            doc.new_page().insert_textbox(fitz.Rect(36, 36, 560, 800), texto, fontsize=7)
+        return PdfDocument.from_bytes(doc.tobytes())
+
+
+@pytest.fixture
+def indice():
+    indice = IndiceDuplicados(":memory:")
+    yield indice
+    indice.close()
+
+
+def _registrar(indice: IndiceDuplicados, doc: PdfDocument) -> None:
+    indice.registrar(doc.sha256(), indice.huella(doc))
+
+
+def test_copia_firmada_coincide_sin_validacion(indice):
+    paginas = _paginas(10)
+    _registrar(indice, _pdf(paginas))
+
+    firmado = _pdf(paginas, extra_ultima=" Firmado digitalmente por JUAN PEREZ 2024-02-01 ")
+    coincidencias = indice.buscar(indice.huella(firmado), excluir=firmado.sha256())
+
+    assert len(coincidencias) == 1
+    assert coincidencias[0].origen == "texto" and coincidencias[0].similitud >= indice.umbral
+    assert not indice.requiere_validacion(coincidencias[0])
+
+
+def test_misma_plantilla_con_otros_numeros_no_coincide(indice):
+    paginas = _paginas(10)
+    _registrar(indice, _pdf(paginas))
+
+    otro = _pdf(paginas, {"CW2370068": "CW9999999", "900123456-8": "811222333-1", "125000000": "98000000"})
+    assert indice.buscar(indice.huella(otro)) == []
+
+
+def test_documento_distinto_no_coincide(indice):
+    _registrar(indice, _pdf(_paginas(10)))
+    assert indice.buscar(indice.huella(_pdf(_paginas(10, semilla=2)))) == []
+
+
+def test_numeros_de_paginas_intermedias_cuentan(indice):
+    paginas = _paginas(PAGINAS_INICIO + PAGINAS_FIN + 10)
+    medio = PAGINAS_INICIO + 5
+    paginas[medio] = "Valor adicional 4500000 " + paginas[medio]
+    _registrar(indice, _pdf(paginas))
+
+    otra_version = _pdf(paginas, {"4500000": "7800000"})
+    assert indice.buscar(indice.huella(otra_version)) == []
+
+
+def test_coincidencia_de_documento_largo_pasa_por_el_validador(indice):
+    paginas = _paginas(PAGINAS_INICIO + PAGINAS_FIN + 10)
+    _registrar(indice, _pdf(paginas))
+
+    # Cambia solo texto sin números de una página que el MinHash no lee.
+    medio = PAGINAS_INICIO + 5
+    otra_version = list(paginas)
+    otra_version[medio] = " ".join(reversed(paginas[medio].split()))
+    coincidencias = indice.buscar(indice.huella(_pdf(otra_version)))
+
+    assert len(coincidencias) == 1 and not coincidencias[0].completa
+    assert indice.requiere_validacion(coincidencias[0])
+
+
+def test_huella_completa_por_tamano():
+    corto = calcular_huella(_pdf(_paginas(3)))
+    largo = calcular_huella(_pdf(_paginas(PAGINAS_INICIO + PAGINAS_FIN + 1)))
+    assert corto.completa and not largo.completa
@@ -0,0 +1,77 @@
+"""Clasificador especulativo: una extracción descartada no decide el documento."""
+
+import asyncio
+
+from pipeline_ai import nodes
+from pipeline_ai.especulacion import PoliticaEspeculacion
+
+# Con `pdf_corto` el clasificador no necesita abrir el PDF.
+_STATE = {"pdf": b"", "pdf_corto": "cGRm", "modo_entrada": "archivo"}
+
+
+class _Clasificador:
+    def __init__(self, tipo: str):
+        self._respuesta = {"structured_response": {"tipo_arch": tipo, "confianza": 0.9}}
+
+    def invoke(self, _mensaje):
+        return self._respuesta
+
+    async def ainvoke(self, _mensaje):
+        await asyncio.sleep(0.01)
+        return self._respuesta
+
+
+def _extractor_fallido(*_args):
+    raise RuntimeError("boom")
+
+
+async def _aextractor_fallido(*_args):
+    raise RuntimeError("boom")
+
+
+def _politica() -> PoliticaEspeculacion:
+    return PoliticaEspeculacion(umbral=0.0, exploracion=0.0)
+
+
+def test_extraccion_fallida_y_otrosi_sync(monkeypatch):
+    monkeypatch.setattr(nodes, "nodo_extractor", _extractor_fallido)
+    politica = _politica()
+
+    update = nodes.nodo_clasificador_especulativo(_STATE, {"clasificador": _Clasificador("OTROSI")}, politica)
+
+    assert update["tipo_archivo"] == "OTROSI"
+    assert update["especulacion"] == {"lanzada": True, "acierto": False}
+    assert politica.snapshot()["descartadas"] == 1
+
+
+def test_extraccion_fallida_y_otrosi_async(monkeypatch):
+    monkeypatch.setattr(nodes, "anodo_extractor", _aextractor_fallido)
+    politica = _politica()
+
+    update = asyncio.run(
+        nodes.anodo_clasificador_especulativo(_STATE, {"clasificador": _Clasificador("OTROSI")}, politica)
+    )
+
+    assert update["tipo_archivo"] == "OTROSI"
+    assert "extracted_data" not in update
+    assert update["especulacion"] == {"lanzada": True, "acierto": False}
+    assert politica.snapshot()["descartadas"] == 1
+
+
+def test_extraccion_en_curso_se_cancela_async(monkeypatch):
+    canceladas = []
+
+    async def extractor_lento(*_args):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            canceladas.append(True)
+            raise
+
+    monkeypatch.setattr(nodes, "anodo_extractor", extractor_lento)
+    update = asyncio.run(
+        nodes.anodo_clasificador_especulativo(_STATE, {"clasificador": _Clasificador("OTRO")}, _politica())
+    )
+
+    assert update["tipo_archivo"] == "OTRO"
+    assert canceladas == [True]
@@ -0,0 +1,132 @@
+"""Índice de contratos y otrosíes: orden de llegada, reproceso y re-vinculación."""
+
+import itertools
+
+import pytest
+
+from pipeline_ai.indice_contratos import IndiceContratos
+
+
+def _contrato(contrato_id="CW-2370068", valor=100, fecha_fin="2025-01-31", sha256=None) -> dict:
+    return {
+        "tipo_archivo": "CONTRATO",
+        "sha256": sha256 or f"contrato-{contrato_id}",
+        "extracted_data": {"contrato_id": contrato_id, "valor": valor, "fechas": {"fecha_fin": fecha_fin}},
+    }
+
+
+def _otrosi(otrosi_id, contrato_base_id="cw 2370068", tipo="AMBAS", fecha_fin=None, valor=None, sha256=None) -> dict:
+    return {
+        "tipo_archivo": "OTROSI",
+        "sha256": sha256 or f"otrosi-{otrosi_id}",
+        "extracted_data": {
+            "ident": {"contrato_base_id": contrato_base_id, "otrosi_id": otrosi_id},
+            "adiciones": {"tipo": tipo, "fecha_fin": fecha_fin, "valor": valor},
+        },
+    }
+
+
+_DOCUMENTOS = [
+    _contrato(),
+    _otrosi("OT1", fecha_fin="2025-06-30", valor=50),
+    _otrosi("OT2", tipo="ADICIÓN EN VALOR", fecha_fin="2030-01-01", valor=25),
+    _otrosi("OT3", tipo="ADICIÓN EN TIEMPO", fecha_fin="2025-03-01"),
+]
+
+
+@pytest.fixture
+def indice():
+    indice = IndiceContratos(":memory:")
+    yield indice
+    indice.close()
+
+
+def _vigencia(indice, contrato_id="CW2370068") -> tuple:
+    v = indice.consultar(contrato_id)
+    return v["fecha_fin"], v["valor"], v["num_otrosies"], v["pendiente"]
+
+
+def test_vigencia_no_depende_del_orden_de_llegada():
+    vigencias = set()
+    for orden in itertools.permutations(_DOCUMENTOS):
+        indice = IndiceContratos(":memory:")
+        for documento in orden:
+            indice.registrar(documento)
+        vigencias.add(_vigencia(indice))
+        indice.close()
+    # La fecha de OT2 no cuenta (solo adiciona valor) ni el valor de OT3 (solo tiempo).
+    assert vigencias == {("2025-06-30", 175.0, 3, False)}
+
+
+def test_otrosi_antes_que_su_contrato_queda_pendiente(indice):
+    indice.registrar(_otrosi("OT1", fecha_fin="2025-06-30", valor=50))
+    assert _vigencia(indice) == ("2025-06-30", None, 1, True)
+    assert indice.contrato("CW2370068") is None
+    assert [v["contrato_id"] for v in indice.exportar(pendientes=True)] == ["CW2370068"]
+
+    indice.registrar(_contrato())
+    assert _vigencia(indice) == ("2025-06-30", 150.0, 1, False)
+    assert list(indice.exportar(pendientes=True)) == []
+
+
+def test_registro_repetido_es_idempotente(indice):
+    for documento in [*_DOCUMENTOS, *_DOCUMENTOS]:
+        indice.registrar(documento)
+    assert _vigencia(indice) == ("2025-06-30", 175.0, 3, False)
+    assert indice.stats() == {"contratos": 1, "pendientes": 0, "otrosies": 3}
+
+
+def test_reextraccion_con_otros_valores_recalcula(indice):
+    indice.registrar(_contrato())
+    indice.registrar(_otrosi("OT1", fecha_fin="2025-06-30", valor=50))
+    indice.registrar(_otrosi("OT1", fecha_fin="2025-02-15", valor=10))
+    assert _vigencia(indice) == ("2025-02-15", 110.0, 1, False)
+
+
+def test_reextraccion_con_otro_contrato_base_mueve_el_otrosi(indice):
+    indice.registrar(_contrato("CW1"))
+    indice.registrar(_contrato("CW2", valor=200))
+    indice.registrar(_otrosi("OT1", contrato_base_id="CW1", fecha_fin="2026-01-01", valor=50, sha256="pdf-ot1"))
+
+    # El mismo archivo, re-extraído con el contrato base corregido.
+    indice.registrar(_otrosi("OT1", contrato_base_id="CW2", fecha_fin="2026-01-01", valor=50, sha256="pdf-ot1"))
+
+    assert _vigencia(indice, "CW1") == ("2025-01-31", 100.0, 0, False)
+    assert _vigencia(indice, "CW2") == ("2026-01-01", 250.0, 1, False)
+    assert indice.stats()["otrosies"] == 1
+
+
+def test_contrato_reextraido_con_otro_id_mueve_sus_otrosies(indice):
+    indice.registrar(_contrato("CW1", sha256="pdf-contrato"))
+    indice.registrar(_otrosi("OT1", contrato_base_id="CW1", fecha_fin="2026-01-01", valor=50))
+    indice.registrar(_otrosi("OT2", contrato_base_id="CW2", tipo="ADICIÓN EN VALOR", valor=25))
+
+    # El mismo archivo, re-extraído con el contrato_id corregido.
+    indice.registrar(_contrato("CW2", valor=200, sha256="pdf-contrato"))
+
+    assert indice.consultar("CW1") is None
+    assert _vigencia(indice, "CW2") == ("2026-01-01", 275.0, 2, False)
+    assert [o["otrosi_id"] for o in indice.otrosies("CW2")] == ["OT1", "OT2"]
+    assert indice.stats() == {"contratos": 1, "pendientes": 0, "otrosies": 2}
+
+
+def test_otrosi_movido_desde_un_contrato_pendiente_lo_elimina(indice):
+    indice.registrar(_otrosi("OT1", contrato_base_id="CW9", valor=50, sha256="pdf-ot1"))
+    indice.registrar(_otrosi("OT1", contrato_base_id="CW1", valor=50, sha256="pdf-ot1"))
+    assert indice.consultar("CW9") is None
+    assert _vigencia(indice, "CW1") == (None, None, 1, True)
+
+
+def test_misma_numeracion_en_contratos_distintos(indice):
+    indice.registrar(_otrosi("1", contrato_base_id="CW1", valor=10, sha256="a"))
+    indice.registrar(_otrosi("1", contrato_base_id="CW2", valor=20, sha256="b"))
+    assert indice.consultar("CW1")["valor_otrosies"] == 10
+    assert indice.consultar("CW2")["valor_otrosies"] == 20
+
+
+def test_exportar_jsonl(indice, tmp_path):
+    for documento in _DOCUMENTOS:
+        indice.registrar(documento)
+    indice.registrar(_contrato("CW3"))
+    assert indice.exportar_jsonl(tmp_path / "vigencias.jsonl") == 2
+    assert [v["contrato_id"] for v in indice.exportar(tanda=1)] == ["CW2370068", "CW3"]
@@ -0,0 +1,26 @@
+"""Exposición de métricas: contadores del clasificador local junto al resto."""
+
+import pipeline_ai
+from pipeline_ai.clasificador_local import ContadoresClasificador
+from pipeline_ai.metrics import AgregadorMetricas
+
+
+def test_contadores_del_clasificador_en_json_y_prometheus(monkeypatch):
+    contadores = ContadoresClasificador()
+    for origen in ("local", "local", "local", "llm"):
+        contadores.registrar(origen)
+    monkeypatch.setattr("pipeline_ai.metrics.CONTADORES", contadores)
+    metricas = AgregadorMetricas()
+
+    assert metricas.to_json()["clasificador"] == {
+        "llamadas_evitadas": 3, "llamadas_llm": 1, "tasa_evitadas": 0.75,
+    }
+    texto = metricas.prometheus()
+    assert 'pipeline_ai_clasificacion_total{origen="local"} 3' in texto
+    assert 'pipeline_ai_clasificacion_total{origen="llm"} 1' in texto
+
+
+def test_contadores_exportados_en_la_api():
+    assert pipeline_ai.CONTADORES_CLASIFICADOR.snapshot().keys() == {
+        "llamadas_evitadas", "llamadas_llm", "tasa_evitadas",
+    }
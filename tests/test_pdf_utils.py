@@ -0,0 +1,59 @@
+"""Conversión a PDF con caché en memoria y en disco, y acceso a MuPDF entre hilos."""
+
+import os
+import threading
+
+import fitz
+import pytest
+
+from utils import pdf_utils
+from utils.pdf_utils import LOCK_MUPDF, CachePdf, PdfDocument, configurar_store_mupdf, convertir_a_pdf
+
+
+@pytest.fixture(scope="module")
+def png() -> bytes:
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 30), False)
+    pixmap.clear_with(200)
+    return pixmap.tobytes("png")
+
+
+def test_conversion_en_memoria_no_deja_temporales(png, tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    pdf = convertir_a_pdf(png, "png", cache=CachePdf())
+    assert isinstance(pdf, bytes)
+    assert len(PdfDocument(pdf)) == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_conversion_en_disco_no_reemplaza_un_pdf_instalado(png, tmp_path):
+    pdf = convertir_a_pdf(png, "png", cache=CachePdf(directorio=str(tmp_path)))
+    instalado = next(tmp_path.glob("*.pdf"))
+    inodo = instalado.stat().st_ino
+
+    # Otro proceso (otro caché sobre el mismo directorio) con el primer PDF aún mapeado.
+    cache = CachePdf(directorio=str(tmp_path))
+    clave = instalado.name[:-len(".pdf")]
+    cache.put(clave, bytes(pdf), {"extension": "png"})
+    assert convertir_a_pdf(png, "png", cache=cache)[:] == pdf[:]
+
+    assert instalado.stat().st_ino == inodo
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == [".json", ".pdf"]
+
+
+@pytest.mark.parametrize("operacion", ["render", "cierre"])
+def test_mupdf_se_usa_desde_un_hilo_a_la_vez(png, operacion):
+    limite = pdf_utils.LIMITE_STORE_MUPDF
+    doc = PdfDocument(convertir_a_pdf(png, "png", cache=CachePdf()))
+    doc.texto_pagina(0)
+    configurar_store_mupdf(0)  # El cierre vacía el store de MuPDF.
+    try:
+        with LOCK_MUPDF:
+            destino = (lambda: doc.miniatura(0, 8, 8)) if operacion == "render" else doc.close
+            hilo = threading.Thread(target=destino)
+            hilo.start()
+            hilo.join(0.2)
+            assert hilo.is_alive()
+        hilo.join(5)
+        assert not hilo.is_alive()
+    finally:
+        configurar_store_mupdf(limite)
@@ -0,0 +1,179 @@
+"""Limitador de cuota contra el modelo falso que inyecta 429."""
+
+import asyncio
+
+import pytest
+
+from benchmarks.fake_llm import ErrorCuotaSimulada, ErrorModeloSimulado, build_fake_llm
+from pipeline_ai import rate_limit
+from pipeline_ai.agents_factory import build_agents
+from pipeline_ai.rate_limit import LimitadorModelo, LimitesModelo
+
+_ENTRADA = {"messages": [{"role": "user", "content": "Clasifica este documento."}]}
+
+
+class _Reloj:
+    """Sustituto de `time` para el limitador: el tiempo solo avanza con `avanzar`."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self) -> float:
+        return self.ahora
+
+    def avanzar(self, segundos: float) -> None:
+        self.ahora += segundos
+
+
+def _limitador(**limites) -> LimitadorModelo:
+    limites = {"rpm": 10_000, "tpm": 10_000_000, "concurrencia_inicial": 16, **limites}
+    return LimitadorModelo("fake", LimitesModelo(**limites), max_reintentos=8, backoff_base=0.0)
+
+
+def _agente(limitador: LimitadorModelo, **llm_kwargs):
+    return build_agents(build_fake_llm(**llm_kwargs), limitador)["clasificador"]
+
+
+# ── AIMD ───────────────────────────────────────────────────────────────
+
+def test_throttle_reduce_a_la_mitad_y_recupera_aditivamente(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(rate_limit, "time", reloj)
+    lim = _limitador()
+
+    lim.adquirir(1)
+    lim.liberar(throttled=True)
+    assert lim.snapshot()["concurrencia"] == 8
+
+    # Una ráfaga de 429 dentro del mismo segundo cuenta una sola vez.
+    lim.adquirir(1)
+    lim.liberar(throttled=True)
+    assert lim.snapshot()["concurrencia"] == 8
+
+    # +1/concurrencia por respuesta exitosa: ~+1 por ventana, no un salto.
+    for _ in range(8):
+        lim.adquirir(1)
+        lim.liberar()
+    assert lim.snapshot()["concurrencia"] == 8
+    lim.adquirir(1)
+    lim.liberar()
+    assert lim.snapshot()["concurrencia"] == 9
+
+    reloj.avanzar(1.0)
+    lim.adquirir(1)
+    lim.liberar(throttled=True)
+    assert lim.snapshot()["concurrencia"] == 4
+    assert lim.snapshot()["throttles"] == 3
+
+
+def test_concurrencia_no_baja_del_minimo(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(rate_limit, "time", reloj)
+    lim = _limitador(concurrencia_inicial=2, concurrencia_min=1)
+    for _ in range(4):
+        lim.adquirir(1)
+        lim.liberar(throttled=True)
+        reloj.avanzar(1.0)
+    assert lim.snapshot()["concurrencia"] == 1
+
+
+# ── Buckets ────────────────────────────────────────────────────────────
+
+def test_bucket_rpm_se_recarga(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(rate_limit, "time", reloj)
+    lim = _limitador(rpm=60)
+
+    for _ in range(60):
+        assert lim._intentar(1) == 0.0
+        lim.liberar()
+    assert lim._intentar(1) == pytest.approx(1.0)
+
+    reloj.avanzar(1.0)
+    assert lim._intentar(1) == 0.0
+
+
+def test_bucket_tpm_se_recarga(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(rate_limit, "time", reloj)
+    lim = _limitador(tpm=6000)
+
+    assert lim._intentar(6000) == 0.0
+    lim.liberar()
+    assert lim._intentar(600) == pytest.approx(6.0)
+
+    reloj.avanzar(3.0)
+    assert lim._intentar(600) == pytest.approx(3.0)
+    reloj.avanzar(3.0)
+    assert lim._intentar(600) == 0.0
+
+
+def test_tokens_reales_corrigen_el_bucket(monkeypatch):
+    monkeypatch.setattr(rate_limit, "time", _Reloj())
+    lim = _limitador(tpm=1000)
+    lim.adquirir(100)
+    lim.liberar(estimados=100, reales=400)
+    assert lim.snapshot()["tokens_consumidos"] == 400
+    assert lim._intentar(600) == 0.0
+    assert lim._intentar(1) > 0
+
+
+# ── AgenteLimitado ─────────────────────────────────────────────────────
+
+def test_reintenta_los_429_hasta_responder():
+    lim = _limitador()
+    respuesta = _agente(lim, tasa_429=0.5, semilla=3).invoke(_ENTRADA)
+
+    snapshot = lim.snapshot()
+    assert respuesta["structured_response"]["tipo_arch"] == "CONTRATO"
+    assert snapshot["reintentos"] > 0
+    assert snapshot["throttles"] == snapshot["reintentos"]
+    assert snapshot["en_vuelo"] == 0
+
+
+def test_agota_los_reintentos_y_relanza_el_429():
+    lim = _limitador()
+    with pytest.raises(ErrorCuotaSimulada):
+        _agente(lim, tasa_429=1.0).invoke(_ENTRADA)
+
+    snapshot = lim.snapshot()
+    assert snapshot["reintentos"] == lim.max_reintentos
+    assert snapshot["throttles"] == lim.max_reintentos + 1
+    assert snapshot["en_vuelo"] == 0
+
+
+def test_otros_errores_no_se_reintentan():
+    lim = _limitador()
+    with pytest.raises(ErrorModeloSimulado):
+        _agente(lim, tasa_fallo=1.0).invoke(_ENTRADA)
+
+    snapshot = lim.snapshot()
+    assert snapshot["reintentos"] == 0
+    assert snapshot["throttles"] == 0
+    assert snapshot["en_vuelo"] == 0
+    assert snapshot["concurrencia"] == 16
+
+
+def test_ainvoke_reintenta_los_429():
+    lim = _limitador()
+    respuesta = asyncio.run(_agente(lim, tasa_429=0.5, semilla=3).ainvoke(_ENTRADA))
+    assert respuesta["structured_response"]["tipo_arch"] == "CONTRATO"
+    assert lim.snapshot()["reintentos"] > 0
+    assert lim.snapshot()["en_vuelo"] == 0
+
+
+def test_cancelacion_libera_el_cupo():
+    lim = _limitador()
+    agente = _agente(lim, latencia=5.0)
+
+    async def _cancelar():
+        tarea = asyncio.create_task(agente.ainvoke(_ENTRADA))
+        await asyncio.sleep(0.05)
+        assert lim.snapshot()["en_vuelo"] == 1
+        tarea.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarea
+
+    asyncio.run(_cancelar())
+    assert lim.snapshot()["en_vuelo"] == 0
+    assert lim.snapshot()["throttles"] == 0
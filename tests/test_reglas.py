@@ -0,0 +1,54 @@
+"""Validador por reglas: plazo y dígito de verificación."""
+
+import copy
+
+import pytest
+
+from benchmarks.fake_llm import RESPUESTAS_POR_SCHEMA
+from pipeline_ai import ventanas
+from pipeline_ai.reglas import validar_reglas
+
+_CONTRATO = RESPUESTAS_POR_SCHEMA["EstructuracionInformacion"]
+
+
+def _contrato(**campos) -> dict:
+    data = copy.deepcopy(_CONTRATO)
+    for ruta, valor in campos.items():
+        nodo = data
+        *padres, hoja = ruta.split("__")
+        for parte in padres:
+            nodo = nodo[parte]
+        nodo[hoja] = valor
+    return data
+
+
+def test_contrato_coherente_es_correcto():
+    assert validar_reglas(_contrato(), "CONTRATO")["validacion"] == "CORRECTO"
+
+
+@pytest.mark.parametrize("desfase", [1, -1])
+def test_plazo_con_un_dia_de_diferencia_se_corrige(desfase):
+    data = _contrato(plazo_contrato=_CONTRATO["plazo_contrato"] + desfase)
+    resultado = validar_reglas(data, "CONTRATO")
+    assert resultado["validacion"] == "CORREGIR"
+    assert "plazo_contrato" in resultado["feedback"]
+
+
+@pytest.mark.parametrize("dv", [8, 8.0, "8", " 08"])
+def test_digito_de_verificacion_normalizado(dv):
+    data = _contrato(contratista__digito_verificación=dv)
+    assert validar_reglas(data, "CONTRATO")["validacion"] == "CORRECTO"
+
+
+@pytest.mark.parametrize("dv", [9, "9", "x", 8.5])
+def test_digito_de_verificacion_incorrecto(dv):
+    data = _contrato(contratista__digito_verificación=dv)
+    assert "digito_verificación" in validar_reglas(data, "CONTRATO")["feedback"]
+
+
+def test_ventanas_prefieren_el_plazo_de_la_misma_definicion():
+    plazo = _CONTRATO["plazo_contrato"]
+    inclusivo = _contrato(plazo_contrato=plazo + 1)
+    combinado, fuentes = ventanas.combinar("CONTRATO", [inclusivo, _contrato()])
+    assert combinado["plazo_contrato"] == plazo
+    assert fuentes["plazo_contrato"] == 2
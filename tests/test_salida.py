@@ -0,0 +1,169 @@
+"""Salida reanudable del lote: orden de sincronización, dead-letter y reproceso."""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from benchmarks.synthetic import pdf_sintetico_bytes
+from pipeline_ai import salida as modulo_salida
+from pipeline_ai.batch import _registro, huella_archivo, motivo_fallo, procesar_directorio
+from pipeline_ai.salida import Checkpoint, SalidaLote
+
+_HUELLAS = [f"{i:064x}" for i in range(1, 6)]
+
+
+def _leer_jsonl(ruta) -> list[dict]:
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def _leer_checkpoint(ruta) -> list[str]:
+    with open(ruta, encoding="ascii") as f:
+        return [linea.strip() for linea in f if linea.strip()]
+
+
+# ── SalidaLote ─────────────────────────────────────────────────────────
+
+def test_registros_se_sincronizan_antes_que_el_checkpoint(tmp_path, monkeypatch):
+    sincronizados = []
+    fsync = os.fsync
+    monkeypatch.setattr(modulo_salida.os, "fsync", lambda fd: (sincronizados.append(fd), fsync(fd)))
+
+    with SalidaLote(tmp_path / "r.jsonl", fsync_cada=2, fsync_segundos=3600) as salida:
+        archivos = {
+            salida.resultados._f.fileno(): "resultados",
+            salida.dead_letter._f.fileno(): "dead_letter",
+            salida.checkpoint._f.fileno(): "checkpoint",
+        }
+        salida.registrar({"n": 0}, _HUELLAS[0])
+        salida.registrar({"n": 1}, _HUELLAS[1], fallido=True)
+        orden = [archivos[fd] for fd in sincronizados]
+
+    assert orden == ["resultados", "dead_letter", "checkpoint"]
+
+
+def test_checkpoint_en_disco_nunca_adelanta_a_los_resultados(tmp_path):
+    # Sin cerrar la salida (simula una caída): lo que el checkpoint tiene en
+    # disco debe tener su registro en disco.
+    salida = SalidaLote(tmp_path / "r.jsonl", fsync_cada=2, fsync_segundos=3600)
+    for i, huella in enumerate(_HUELLAS):
+        salida.registrar({"huella": huella}, huella, fallido=i == 3)
+        en_disco = {r["huella"] for r in _leer_jsonl(tmp_path / "r.jsonl") + _leer_jsonl(tmp_path / "r.dead.jsonl")}
+        assert set(_leer_checkpoint(tmp_path / "r.ckpt")) <= en_disco
+
+    # Antes del cierre, el último registro (impar) aún no está marcado en disco.
+    assert len(_leer_checkpoint(tmp_path / "r.ckpt")) == 4
+    salida.close()
+    assert _leer_checkpoint(tmp_path / "r.ckpt") == _HUELLAS
+
+
+def test_checkpoint_se_recarga_e_ignora_lineas_truncadas(tmp_path):
+    ruta = tmp_path / "r.ckpt"
+    ruta.write_text(_HUELLAS[0] + "\n" + _HUELLAS[1][:20], encoding="ascii")
+    checkpoint = Checkpoint(ruta)
+    assert _HUELLAS[0] in checkpoint and _HUELLAS[1] not in checkpoint
+    checkpoint.close()
+
+
+# ── Lote completo ──────────────────────────────────────────────────────
+
+class _MotorFalso:
+    """Motor con la interfaz de `ContractPipeline.arun` que falla en los archivos de `fallan`."""
+
+    def __init__(self, fallan: set[int]):
+        self.fallan = fallan
+        self.procesados: list[int] = []
+
+    async def arun(self, documento, **kwargs) -> dict:
+        paginas = len(documento)
+        self.procesados.append(paginas)
+        if paginas in self.fallan:
+            raise RuntimeError("fallo simulado")
+        return {
+            "tipo_archivo": "CONTRATO",
+            "extracted_data": {"contrato_id": f"CW{paginas}"},
+            "validation": {"validacion": "CORRECTO", "feedback": "OK"},
+            "attempts": 1,
+        }
+
+
+@pytest.fixture
+def directorio(tmp_path):
+    documentos = tmp_path / "documentos"
+    documentos.mkdir()
+    # La cantidad de páginas identifica a cada documento en el motor falso.
+    for paginas in (1, 2, 3):
+        (documentos / f"doc{paginas}.pdf").write_bytes(pdf_sintetico_bytes(paginas))
+    return documentos
+
+
+def _procesar(directorio, salida, motor, **kwargs) -> dict:
+    return asyncio.run(procesar_directorio(directorio, salida, workers=1, engine=motor, **kwargs))
+
+
+def test_fallidos_van_al_dead_letter_y_se_saltan_al_reanudar(directorio, tmp_path):
+    salida = tmp_path / "r.jsonl"
+
+    motor = _MotorFalso(fallan={2})
+    assert _procesar(directorio, salida, motor) == {"procesados": 3, "fallidos": 1, "saltados": 0}
+    assert sorted(r["archivo"] for r in _leer_jsonl(salida)) == ["doc1.pdf", "doc3.pdf"]
+    dead = _leer_jsonl(tmp_path / "r.dead.jsonl")
+    assert [(r["archivo"], r["motivo_fallo"]) for r in dead] == [("doc2.pdf", "excepcion")]
+    assert len(_leer_checkpoint(tmp_path / "r.ckpt")) == 3
+
+    # Al relanzar, nada se procesa ni se duplica.
+    motor = _MotorFalso(fallan=set())
+    assert _procesar(directorio, salida, motor) == {"procesados": 0, "fallidos": 0, "saltados": 3}
+    assert motor.procesados == []
+    assert len(_leer_jsonl(salida)) == 2
+
+
+def test_reanuda_solo_lo_que_falta(directorio, tmp_path):
+    salida = tmp_path / "r.jsonl"
+    with SalidaLote(salida) as sumidero:
+        ruta = directorio / "doc1.pdf"
+        sumidero.registrar({"archivo": ruta.name}, huella_archivo(ruta))
+
+    motor = _MotorFalso(fallan=set())
+    assert _procesar(directorio, salida, motor)["saltados"] == 1
+    assert sorted(motor.procesados) == [2, 3]
+    assert sorted(r["archivo"] for r in _leer_jsonl(salida)) == ["doc1.pdf", "doc2.pdf", "doc3.pdf"]
+
+
+def test_reprocesar_solo_procesa_el_dead_letter(directorio, tmp_path):
+    salida = tmp_path / "r.jsonl"
+    _procesar(directorio, salida, _MotorFalso(fallan={2, 3}))
+
+    motor = _MotorFalso(fallan={3})
+    conteo = _procesar(directorio, salida, motor, reprocesar=tmp_path / "r.dead.jsonl")
+    assert conteo == {"procesados": 2, "fallidos": 1, "saltados": 0}
+    assert sorted(motor.procesados) == [2, 3]
+    # Los recuperados se agregan a los resultados; los que vuelven a fallar,
+    # a un dead-letter propio del reproceso (el original no se toca).
+    assert sorted(r["archivo"] for r in _leer_jsonl(salida)) == ["doc1.pdf", "doc2.pdf"]
+    assert [r["archivo"] for r in _leer_jsonl(tmp_path / "r.reproceso.dead.jsonl")] == ["doc3.pdf"]
+    assert len(_leer_jsonl(tmp_path / "r.dead.jsonl")) == 2
+
+    # Un segundo reproceso salta lo que ya se reprocesó.
+    motor = _MotorFalso(fallan=set())
+    assert _procesar(directorio, salida, motor, reprocesar=tmp_path / "r.dead.jsonl")["saltados"] == 2
+    assert motor.procesados == []
+
+
+# ── Motivo de fallo ────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("resultado, motivo", [
+    ({"tipo_archivo": "CONTRATO", "extracted_data": {"contrato_id": "CW1"},
+      "validation": {"validacion": "CORREGIR"}, "plazo": {"agotado": True}}, "plazo_agotado"),
+    ({"tipo_archivo": None, "plazo": {"agotado": True}}, "plazo_agotado"),
+    ({"tipo_archivo": "CONTRATO", "extracted_data": {"contrato_id": "CW1"},
+      "validation": {"validacion": "CORREGIR"}, "plazo": {"agotado": False}}, "max_intentos"),
+    ({"tipo_archivo": "CONTRATO", "extracted_data": None}, "sin_structured_response"),
+    ({"tipo_archivo": "OTRO"}, None),
+])
+def test_motivo_fallo(tmp_path, resultado, motivo):
+    assert motivo_fallo(_registro(tmp_path / "doc.pdf", resultado)) == motivo
@@ -1,48 +1,51 @@
 import base64
+import hashlib
 import io
+import json
+import time
 import fitz  # PyMuPDF
 
 import tempfile
 import subprocess
 import mimetypes
+import mmap
 import os
+import shutil
+import stat
+import threading
+from collections import OrderedDict
+from typing import BinaryIO
 
 
 
 def convertir_a_pdf_base64(file_base64: str, filename: str) -> str:
     """
-    Convierte cualquier archivo (en base64) a PDF (en base64), todo en memoria.
-    No guarda nada en disco.
+    Convierte cualquier archivo (en base64) a PDF (en base64).
+    La conversión se cachea por contenido (ver `convertir_a_pdf`).
     """
     file_bytes = base64.b64decode(file_base64)
     extension = filename.rsplit(".", 1)[-1].lower()
-    
-    doc = fitz.open(stream=file_bytes, filetype=extension)
-    pdf_bytes = doc.convert_to_pdf()
-    doc.close()
-    
+    pdf_bytes = convertir_a_pdf(file_bytes, extension)
     return base64.b64encode(pdf_bytes).decode("utf-8")
 
 
 def extraer_paginas(pdf_base64: str, num_paginas: int = 3, filename: str = "archivo.pdf") -> str:
     """
-    Extrae las primeras N páginas. Si el archivo no es PDF, lo convierte primero.
-    Entrada y salida en base64, sin tocar el disco.
+    Extrae las primeras N páginas. Si el archivo no es PDF, lo convierte primero
+    (una sola vez por contenido). Entrada y salida en base64.
     """
     extension = filename.rsplit(".", 1)[-1].lower()
+    pdf_bytes = base64.b64decode(pdf_base64)
 
     # Si no es PDF, convertir primero
     if extension != "pdf":
-        pdf_base64 = convertir_a_pdf_base64(pdf_base64, filename)
-
-    pdf_bytes = base64.b64decode(pdf_base64)
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-    new_doc = fitz.open()
-    for i in range(min(num_paginas, len(doc))):
-        new_doc.insert_pdf(doc, from_page=i, to_page=i)
+        pdf_bytes = convertir_a_pdf(pdf_bytes, extension)
 
-    output_buffer = new_doc.tobytes()
+    with LOCK_MUPDF, fitz.open(stream=memoryview(pdf_bytes), filetype="pdf") as doc, fitz.open() as new_doc:
+        for i in range(min(num_paginas, len(doc))):
+            new_doc.insert_pdf(doc, from_page=i, to_page=i)
+        output_buffer = new_doc.tobytes()
+    _registrar_uso_store(len(pdf_bytes))
     return base64.b64encode(output_buffer).decode("utf-8")
 
 
@@ -72,4 +75,563 @@ def base64_a_pdf(base64_str, ruta_salida):
 
     print(f"PDF guardado en: {ruta_salida}")
     
-    
\ No newline at end of file
+    
+
+
+
+# ── Acceso a MuPDF ───────────────────────────────────────────────────────
+
+# PyMuPDF no es thread-safe: el contexto de MuPDF (store, fuentes, manejo de
+# errores) es global del proceso, así que un lock por documento no basta.
+# Toda llamada a `fitz` de este módulo pasa por este lock (reentrante, para
+# que un método pueda llamar a otro). Los nodos async y las ventanas usan
+# hilos, así que en un mismo proceso el trabajo de PyMuPDF se serializa; el
+# paralelismo real de CPU lo da el pool de procesos de `pipeline_ai.batch`.
+LOCK_MUPDF = threading.RLock()
+
+
+# ── Store de MuPDF ───────────────────────────────────────────────────────
+
+# MuPDF guarda los recursos decodificados (imágenes, fuentes) en un store
+# global del proceso, de hasta 256 MB, que sobrevive al cierre de los
+# documentos: un worker que procesa miles de escaneos lo mantiene lleno.
+# PyMuPDF no permite fijar su máximo ni consultar su tamaño, así que el límite
+# se aplica por estimación: cada documento cerrado suma sus bytes y, al
+# superar `LIMITE_STORE_MUPDF`, el store se vacía (solo se liberan los
+# recursos que ningún documento abierto está usando).
+LIMITE_STORE_MUPDF = 32 * 1024 * 1024
+
+_uso_store = 0
+_lock_store = threading.Lock()
+
+
+def configurar_store_mupdf(max_bytes: int | None) -> None:
+    """
+    Bytes de documentos procesados entre vaciados del store de MuPDF.
+    0 lo vacía después de cada documento; None desactiva el límite (solo
+    aplica el máximo propio de MuPDF).
+    """
+    global LIMITE_STORE_MUPDF, _uso_store
+    with _lock_store:
+        LIMITE_STORE_MUPDF = max_bytes
+        _uso_store = 0
+
+
+def _registrar_uso_store(num_bytes: int) -> None:
+    """Suma un documento procesado y vacía el store si se superó el límite."""
+    global _uso_store
+    with _lock_store:
+        if LIMITE_STORE_MUPDF is None:
+            return
+        _uso_store += num_bytes
+        if _uso_store < LIMITE_STORE_MUPDF:
+            return
+        _uso_store = 0
+    with LOCK_MUPDF:
+        fitz.TOOLS.store_shrink(100)
+
+
+class PdfDocument:
+    """
+    Documento PDF que guarda sus bytes una sola vez.
+
+    - Los bytes se mantienen como `memoryview` (sobre un mmap si viene de disco),
+      sin copias intermedias ni el string base64 de por medio.
+    - El documento de PyMuPDF se abre de forma perezosa y una única vez.
+    - El base64 se genera solo al momento de armar un mensaje (`to_base64()`).
+    - Toda llamada a PyMuPDF toma `LOCK_MUPDF`: se puede usar desde varios hilos.
+
+    Uso:
+        doc = PdfDocument.from_path("contratos/CW2370068.pdf")
+        primeras = doc.primeras_paginas(3).to_base64()
+    """
+
+    def __init__(self, datos: bytes | memoryview, ruta: str | None = None):
+        self._datos = memoryview(datos)
+        self._ruta = ruta
+        self._fitz_doc = None
+        self._recortes: dict[int, PdfDocument] = {}
+        self._textos: dict[int, str] = {}
+        self._sha256: str | None = None
+
+    # ── Constructores ──────────────────────────────────────────────────────
+
+    @classmethod
+    def from_path(cls, path: str) -> "PdfDocument":
+        """
+        Mapea el archivo en memoria (sin leerlo a un string de Python).
+        Si no es PDF, lo convierte primero (ver `convertir_a_pdf`).
+        """
+        extension = path.rsplit(".", 1)[-1].lower()
+
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"Archivo vacío: {path}")
+            datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if extension != "pdf":
+            return cls(_convertir_mapa(datos, extension), ruta=path)
+        return cls(datos, ruta=path)
+
+    @classmethod
+    def from_stream(cls, stream: BinaryIO, extension: str = "pdf") -> "PdfDocument":
+        """
+        Documento a partir de un archivo abierto o un stream binario.
+
+        Un archivo regular al inicio se mapea directo (como `from_path`). Otro
+        stream (socket, respuesta HTTP, `BytesIO`) se copia por bloques a un
+        archivo temporal anónimo y se mapea: nunca se arma el documento
+        completo como objeto de Python.
+        """
+        if _es_archivo_mapeable(stream):
+            datos = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with tempfile.TemporaryFile() as tmp:
+                shutil.copyfileobj(stream, tmp, _BLOQUE_COPIA)
+                tmp.flush()
+                if tmp.tell() == 0:
+                    raise ValueError("Stream vacío")
+                datos = mmap.mmap(tmp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        ruta = getattr(stream, "name", None)
+        ruta = ruta if isinstance(ruta, str) else None
+        if extension.lower() != "pdf":
+            return cls(_convertir_mapa(datos, extension.lower()), ruta=ruta)
+        return cls(datos, ruta=ruta)
+
+    @classmethod
+    def from_bytes(cls, datos: bytes | memoryview) -> "PdfDocument":
+        return cls(datos)
+
+    @classmethod
+    def from_base64(cls, pdf_base64: str) -> "PdfDocument":
+        return cls(base64.b64decode(pdf_base64))
+
+    @classmethod
+    def coerce(cls, pdf: "PdfDocument | str") -> "PdfDocument":
+        """Acepta un `PdfDocument` o un PDF en base64 (API anterior)."""
+        return pdf if isinstance(pdf, cls) else cls.from_base64(pdf)
+
+    # ── Acceso ─────────────────────────────────────────────────────────────
+
+    @property
+    def datos(self) -> memoryview:
+        """Bytes del PDF (sin copia)."""
+        return self._datos
+
+    @property
+    def ruta(self) -> str | None:
+        return self._ruta
+
+    @property
+    def fitz_doc(self) -> fitz.Document:
+        """Documento de PyMuPDF, abierto una sola vez al primer uso."""
+        with LOCK_MUPDF:
+            if self._fitz_doc is None:
+                self._fitz_doc = fitz.open(stream=self._datos, filetype="pdf")
+            return self._fitz_doc
+
+    def __len__(self) -> int:
+        with LOCK_MUPDF:
+            return len(self.fitz_doc)
+
+    def sha256(self) -> str:
+        """Hash SHA-256 de los bytes del PDF (calculado una sola vez)."""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self._datos).hexdigest()
+        return self._sha256
+
+    def to_base64(self) -> str:
+        """Codifica el PDF en base64. Llamarlo solo al enviar el mensaje."""
+        return base64.b64encode(self._datos).decode("utf-8")
+
+    def texto_pagina(self, indice: int) -> str:
+        """Texto de la capa de texto de una página (cacheado). Vacío si es escaneada."""
+        if indice not in self._textos:
+            with LOCK_MUPDF:
+                self._textos[indice] = self.fitz_doc[indice].get_text("text")
+        return self._textos[indice]
+
+    def texto_primeras_paginas(self, num_paginas: int = 2) -> list[str]:
+        """Texto de las primeras N páginas."""
+        return [self.texto_pagina(i) for i in range(min(num_paginas, len(self)))]
+
+    def miniatura(self, indice: int, ancho: int, alto: int) -> bytes:
+        """Render de una página en escala de grises a `ancho` x `alto` píxeles (un byte por píxel)."""
+        with LOCK_MUPDF:
+            pagina = self.fitz_doc[indice]
+            escala = fitz.Matrix(ancho / pagina.rect.width, alto / pagina.rect.height)
+            pixmap = pagina.get_pixmap(matrix=escala, colorspace=fitz.csGRAY, alpha=False)
+            if (pixmap.width, pixmap.height) == (ancho, alto):
+                return pixmap.samples
+            # El redondeo del render puede dejar un píxel de más o de menos.
+            return bytes(
+                pixmap.samples[min(y, pixmap.height - 1) * pixmap.stride + min(x, pixmap.width - 1)]
+                for y in range(alto) for x in range(ancho)
+            )
+
+    # ── Recortes ───────────────────────────────────────────────────────────
+
+    def paginas(self, indices: list[int]) -> "PdfDocument":
+        """Nuevo `PdfDocument` con las páginas indicadas (base 0), en ese orden."""
+        with LOCK_MUPDF, fitz.open() as new_doc:
+            src = self.fitz_doc
+            for i in indices:
+                new_doc.insert_pdf(src, from_page=i, to_page=i)
+            return PdfDocument(new_doc.tobytes())
+
+    def primeras_paginas(self, num_paginas: int = 3) -> "PdfDocument":
+        """Primeras N páginas (cacheado por documento)."""
+        if num_paginas >= len(self):
+            return self
+        if num_paginas not in self._recortes:
+            self._recortes[num_paginas] = self.paginas(list(range(num_paginas)))
+        return self._recortes[num_paginas]
+
+    # ── Optimización ───────────────────────────────────────────────────────
+
+    def optimizado(
+        self,
+        cache: "CacheOptimizacion | None" = None,
+        **parametros,
+    ) -> tuple["PdfDocument", dict]:
+        """
+        Versión reducida del documento para enviar al modelo (ver `optimizar_pdf`).
+        El resultado se cachea por el sha256 de este documento y los parámetros.
+
+        Returns:
+            (documento optimizado, reporte de tamaños)
+        """
+        cache = CACHE_OPTIMIZACION if cache is None else cache
+        clave = cache.clave(self.sha256(), parametros)
+        guardado = cache.get(clave)
+        if guardado is not None:
+            datos, reporte = guardado
+            return PdfDocument(datos, ruta=self._ruta), {**reporte, "cache_hit": True}
+
+        datos, reporte = optimizar_pdf(self._datos, **parametros)
+        if reporte["bytes_despues"] >= reporte["bytes_antes"]:
+            # No hubo ganancia: se envía el original.
+            datos = bytes(self._datos)
+            reporte = {**reporte, "bytes_despues": reporte["bytes_antes"], "aplicada": False}
+        cache.put(clave, datos, reporte)
+        return PdfDocument(datos, ruta=self._ruta), {**reporte, "cache_hit": False}
+
+    # ── Ciclo de vida ──────────────────────────────────────────────────────
+
+    def close(self) -> None:
+        """Libera el documento de PyMuPDF. Los bytes siguen disponibles."""
+        with LOCK_MUPDF:
+            abierto, self._fitz_doc = self._fitz_doc, None
+            if abierto is not None:
+                abierto.close()
+            recortes, self._recortes = list(self._recortes.values()), {}
+        for recorte in recortes:
+            recorte.close()
+        if abierto is not None:
+            _registrar_uso_store(len(self._datos))
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"PdfDocument(bytes={len(self._datos)}, ruta={self._ruta!r})"
+
+
+# ── Optimización del payload ─────────────────────────────────────────────
+
+# Parámetros por defecto de `optimizar_pdf` (legible para el modelo y mucho más liviano).
+OPTIMIZACION_POR_DEFECTO = {
+    "dpi_objetivo": 150,
+    "calidad_jpeg": 75,
+    "escala_grises": False,
+}
+
+
+def optimizar_pdf(
+    datos: bytes | memoryview,
+    dpi_objetivo: int = 150,
+    calidad_jpeg: int = 75,
+    escala_grises: bool = False,
+) -> tuple[bytes, dict]:
+    """
+    Reduce el tamaño de un PDF antes de subirlo al modelo.
+
+    - Reescala las imágenes con más de `dpi_objetivo` DPI a esa resolución y
+      las recomprime (JPEG con `calidad_jpeg`; las bitonales conservan su
+      compresión sin pérdida).
+    - `escala_grises=True` convierte el documento a grises (escaneos en color
+      de documentos en blanco y negro).
+    - Elimina metadatos, XMP y miniaturas. La capa de texto (incluido el OCR
+      oculto de los escaneos) no se toca.
+    - Guarda con recolección de objetos sin uso y streams comprimidos.
+
+    Returns:
+        (bytes optimizados, reporte con tamaños antes/después y segundos)
+    """
+    inicio = time.perf_counter()
+    with LOCK_MUPDF, fitz.open(stream=datos, filetype="pdf") as doc:
+        doc.rewrite_images(
+            dpi_threshold=dpi_objetivo + 1,
+            dpi_target=dpi_objetivo,
+            quality=calidad_jpeg,
+            set_to_gray=escala_grises,
+        )
+        doc.scrub(
+            attached_files=False, clean_pages=False, embedded_files=False,
+            hidden_text=False, javascript=False, metadata=True, redactions=False,
+            remove_links=False, reset_fields=False, reset_responses=False,
+            thumbnails=True, xml_metadata=True,
+        )
+        optimizados = doc.tobytes(garbage=4, deflate=True, deflate_images=True, deflate_fonts=True, use_objstms=1)
+    _registrar_uso_store(len(datos))
+
+    antes, despues = len(datos), len(optimizados)
+    return optimizados, {
+        "bytes_antes": antes,
+        "bytes_despues": despues,
+        "reduccion_pct": round((antes - despues) * 100 / antes, 1) if antes else 0.0,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "aplicada": True,
+    }
+
+
+class CachePdf:
+    """
+    PDFs derivados de otro documento (convertidos, optimizados) por
+    (sha256 del original, parámetros), en memoria con desalojo LRU por bytes
+    y, si se indica `directorio`, también en disco. Desde disco se leen
+    mapeados en memoria, así que varios procesos pueden compartir el directorio.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, directorio: str | None = None):
+        self._max_bytes = max_bytes
+        self._directorio = directorio
+        self._entradas: OrderedDict[str, tuple[bytes | mmap.mmap, dict]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    @property
+    def directorio(self) -> str | None:
+        return self._directorio
+
+    def clave(self, sha256: str, parametros: dict) -> str:
+        sufijo = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return f"{sha256}-{sufijo}"
+
+    def get(self, clave: str) -> tuple[bytes | mmap.mmap, dict] | None:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                return entrada
+        if not self._directorio:
+            return None
+        ruta = os.path.join(self._directorio, clave)
+        try:
+            with open(f"{ruta}.json", encoding="utf-8") as f_json, open(f"{ruta}.pdf", "rb") as f_pdf:
+                reporte = json.load(f_json)
+                entrada = (mmap.mmap(f_pdf.fileno(), 0, access=mmap.ACCESS_READ), reporte)
+        except (OSError, ValueError):
+            return None
+        self._recordar(clave, entrada)
+        return entrada
+
+    def put(self, clave: str, datos: bytes | mmap.mmap, reporte: dict) -> None:
+        self._recordar(clave, (datos, reporte))
+        if self._directorio:
+            # Cada archivo se escribe aparte y se instala con un rename (otro
+            # proceso puede estar escribiendo la misma clave).
+            temporal = f"{os.path.join(self._directorio, clave)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporal, "wb") as f:
+                f.write(datos)
+            self._instalar(clave, temporal, reporte)
+
+    def put_archivo(self, clave: str, temporal: str, reporte: dict) -> mmap.mmap:
+        """
+        Instala un PDF ya escrito en `temporal` (dentro de `directorio`) y lo
+        retorna mapeado, sin pasarlo por memoria. Requiere `directorio`.
+        """
+        self._instalar(clave, temporal, reporte)
+        with open(f"{os.path.join(self._directorio, clave)}.pdf", "rb") as f:
+            datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._recordar(clave, (datos, reporte))
+        return datos
+
+    def _instalar(self, clave: str, temporal: str, reporte: dict) -> None:
+        """
+        Mueve `temporal` a `<clave>.pdf` y escribe el reporte después: su
+        presencia indica un PDF completo. Un archivo ya instalado no se
+        reemplaza: misma clave es mismo contenido, y otro `PdfDocument` (de
+        este u otro proceso) puede tenerlo mapeado, lo que en Windows impide
+        reemplazarlo o borrarlo.
+        """
+        ruta = os.path.join(self._directorio, clave)
+        _instalar_si_no_existe(temporal, f"{ruta}.pdf")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(reporte, f)
+        _instalar_si_no_existe(temporal, f"{ruta}.json")
+
+    def _recordar(self, clave: str, entrada: tuple[bytes | mmap.mmap, dict]) -> None:
+        with self._lock:
+            if clave in self._entradas:
+                return
+            self._entradas[clave] = entrada
+            self._bytes += len(entrada[0])
+            while self._bytes > self._max_bytes and len(self._entradas) > 1:
+                _, (datos, _) = self._entradas.popitem(last=False)
+                self._bytes -= len(datos)
+
+
+def _instalar_si_no_existe(temporal: str, destino: str) -> None:
+    """Renombra `temporal` a `destino`, o lo descarta si `destino` ya existe."""
+    try:
+        if not os.path.exists(destino):
+            os.replace(temporal, destino)
+            return
+    except PermissionError:
+        # Otro proceso lo instaló (y lo abrió) entre la comprobación y el rename.
+        pass
+    os.unlink(temporal)
+
+
+class CacheOptimizacion(CachePdf):
+    """PDFs optimizados por (sha256 del original, parámetros de `optimizar_pdf`)."""
+
+    def clave(self, sha256: str, parametros: dict) -> str:
+        return super().clave(sha256, {**OPTIMIZACION_POR_DEFECTO, **parametros})
+
+
+# Caché del proceso (solo en memoria).
+CACHE_OPTIMIZACION = CacheOptimizacion()
+
+
+# Tamaño de bloque al copiar un stream al archivo temporal.
+_BLOQUE_COPIA = 1024 * 1024
+
+
+def _es_archivo_mapeable(stream) -> bool:
+    """True si el stream es un archivo regular posicionado al inicio (se puede mapear)."""
+    try:
+        info = os.fstat(stream.fileno())
+        return stream.tell() == 0 and stat.S_ISREG(info.st_mode) and info.st_size > 0
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+
+
+# ── Conversión a PDF ─────────────────────────────────────────────────────
+
+# Caché de conversiones del proceso (ver `configurar_cache_conversion`).
+CACHE_CONVERSION = CachePdf()
+
+# Extensiones equivalentes (misma clave de caché).
+_ALIAS_EXTENSION = {"tiff": "tif", "jpeg": "jpg"}
+
+
+def configurar_cache_conversion(
+    directorio: str | None = None,
+    max_bytes: int = 256 * 1024 * 1024,
+) -> CachePdf:
+    """
+    Reemplaza el caché de conversiones del proceso. Con `directorio`, los
+    workers de un lote y el proceso principal comparten las conversiones en
+    disco (se usa como `initializer` del pool en `pipeline_ai.batch`).
+    """
+    global CACHE_CONVERSION
+    CACHE_CONVERSION = CachePdf(max_bytes=max_bytes, directorio=directorio)
+    return CACHE_CONVERSION
+
+
+def convertir_a_pdf(
+    datos: bytes | memoryview,
+    extension: str,
+    cache: CachePdf | None = None,
+) -> bytes | mmap.mmap:
+    """
+    Convierte imágenes (TIFF multipágina, PNG, JPG), XPS o EPUB a PDF.
+
+    - Se convierte una sola vez por contenido: el resultado se cachea por el
+      sha256 de `datos` y la extensión.
+    - Las páginas se escriben una por una directo a un archivo temporal: un
+      TIFF de cientos de páginas no se decodifica completo ni se arma el PDF
+      en PyMuPDF.
+    - Con un caché en disco, el temporal se instala en el directorio del
+      caché y se mapea desde ahí; nunca se borra un archivo mapeado (en
+      Windows no se puede). Sin directorio, el PDF resultante se lee a `bytes`
+      y el temporal se borra.
+    - Todos los documentos de PyMuPDF se cierran antes de retornar.
+
+    Returns:
+        Los bytes del PDF: `bytes`, o un mmap de solo lectura si el caché
+        tiene directorio (PyMuPDF lo abre envuelto en `memoryview`).
+    """
+    cache = CACHE_CONVERSION if cache is None else cache
+    extension = _ALIAS_EXTENSION.get(extension.lower(), extension.lower())
+    clave = cache.clave(hashlib.sha256(datos).hexdigest(), {"extension": extension})
+    guardado = cache.get(clave)
+    if guardado is not None:
+        return guardado[0]
+
+    inicio = time.perf_counter()
+    descriptor, ruta = tempfile.mkstemp(suffix=".tmp", dir=cache.directorio)
+    os.close(descriptor)
+    try:
+        with LOCK_MUPDF, fitz.open(stream=datos, filetype=extension) as origen:
+            paginas = origen.page_count
+            _escribir_pdf_por_pagina(origen, ruta)
+        reporte = {
+            "extension": extension,
+            "paginas": paginas,
+            "bytes_origen": len(datos),
+            "bytes_pdf": os.path.getsize(ruta),
+            "segundos": round(time.perf_counter() - inicio, 3),
+        }
+        if cache.directorio:
+            pdf = cache.put_archivo(clave, ruta, reporte)
+        else:
+            with open(ruta, "rb") as f:
+                pdf = f.read()
+            cache.put(clave, pdf, reporte)
+    finally:
+        # `put_archivo` ya movió o descartó el temporal.
+        if os.path.exists(ruta):
+            os.unlink(ruta)
+    _registrar_uso_store(len(datos))
+    return pdf
+
+
+def _escribir_pdf_por_pagina(origen: fitz.Document, ruta: str) -> None:
+    """
+    Escribe `origen` como PDF en `ruta`, una página a la vez.
+
+    Usa el `DocumentWriter` de MuPDF directamente: en PyMuPDF `Page.run` no
+    acepta el dispositivo de `DocumentWriter` y `convert_to_pdf` falla con
+    `from_page > 0`, así que no hay forma de hacerlo por página con la API alta.
+    """
+    mupdf = fitz.mupdf
+    escritor = mupdf.FzDocumentWriter(ruta, "compress", mupdf.FzDocumentWriter.PathType_PDF)
+    try:
+        for i in range(origen.page_count):
+            pagina = origen.load_page(i)
+            dispositivo = escritor.fz_begin_page(mupdf.FzRect(*pagina.rect))
+            mupdf.fz_run_page(pagina.this, dispositivo, mupdf.FzMatrix(), mupdf.FzCookie())
+            escritor.fz_end_page()
+        escritor.fz_close_document_writer()
+    finally:
+        # Si hubo error, el traceback retiene este frame: se suelta el
+        # escritor aquí para no esperar al GC.
+        del escritor
+
+
+def _convertir_mapa(datos: mmap.mmap, extension: str) -> bytes | mmap.mmap:
+    """Convierte un archivo mapeado y libera el mapa del original."""
+    try:
+        with memoryview(datos) as vista:
+            return convertir_a_pdf(vista, extension)
+    finally:
+        datos.close()